@@ -0,0 +1,144 @@
+"""`POST /api/batch`: several GET requests in one round-trip.
+
+The admin cabinet loads projects, users, products, tasks and documents at
+once. A batch carries those as
+`{"requests": [{"id": "projects", "url": "/api/admin/projects?limit=50"}, ...]}`
+and is answered with
+`{"responses": [{"id": "projects", "status": 200, "body": [...]}, ...]}`,
+in request order.
+
+The bearer token of the batch is checked once. Every sub-request then runs
+inside this process, straight through the app's router with the batch's
+headers, and `utils.get_current_user` takes the already loaded principal from
+the sub-request's scope instead of decoding the token and reading the user
+again. Up to BATCH_CONCURRENCY sub-requests run at a time, each with its own
+database session. Each item has its own status code, so a 403 or 404 in one
+leaves the others intact. JSON bodies are embedded as the routes rendered
+them, without being parsed again.
+
+Sub-requests skip the rate and concurrency limiters and profiling; they are
+counted in the route metrics like any other request.
+"""
+from typing import List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+import asyncio
+import os
+
+import orjson
+from fastapi import HTTPException
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+from . import metrics, serialization
+
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# Headers of the batch that do not apply to its bodiless GET sub-requests
+_DROPPED_HEADERS = {
+    b"content-length", b"content-type", b"transfer-encoding", b"expect",
+    # Sub-responses are embedded uncompressed; the batch response is compressed as a whole
+    b"accept-encoding",
+    b"if-none-match", b"if-modified-since", b"range",
+}
+# Set by the routing of the batch itself
+_ROUTE_KEYS = ("route", "endpoint", "path_params", "router")
+
+
+def _error(status: int, detail) -> dict:
+    return {"status": status, "body": orjson.dumps({"detail": detail})}
+
+
+def _target(url: str) -> Optional[Tuple[str, str]]:
+    """(path, query) of a sub-request url, or None unless it is a path below /api/."""
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path.startswith("/api/"):
+        return None
+    if parts.path.rstrip("/") == "/api/batch":
+        return None
+    return parts.path, parts.query
+
+
+def _body(headers, body: bytes) -> bytes:
+    """The body as JSON: JSON as it is, anything else as a string."""
+    if not body:
+        return b"null"
+    content_type = dict(headers).get(b"content-type", b"")
+    if content_type.startswith(b"application/json"):
+        return body
+    return orjson.dumps(body.decode("utf-8", "replace"))
+
+
+class BatchJSONResponse(serialization.FastJSONResponse):
+    """`{"responses": [...]}` with every item's `body` spliced in as the rendered JSON bytes."""
+
+    def render(self, content) -> bytes:
+        items = (
+            orjson.dumps({"id": item["id"], "status": item["status"]})[:-1] + b',"body":' + item["body"] + b"}"
+            for item in content
+        )
+        return b'{"responses":[' + b",".join(items) + b"]}"
+
+
+async def _run(dispatch, scope, principal: dict, url: str) -> dict:
+    target = _target(url)
+    if target is None:
+        return _error(400, "url must be a path below /api/, other than /api/batch")
+    path, query = target
+    sub_scope = {key: value for key, value in scope.items() if key not in _ROUTE_KEYS}
+    sub_scope.update(
+        method="GET",
+        path=unquote(path),
+        raw_path=path.encode("latin-1"),
+        query_string=query.encode("latin-1"),
+        headers=[(name, value) for name, value in scope["headers"] if name not in _DROPPED_HEADERS],
+        state={**scope.get("state", {}), "batch_principal": principal},
+    )
+
+    finished = asyncio.Event()
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Streaming responses listen for a disconnect until they are done
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    status, headers, chunks = 500, [], []
+
+    async def send(message):
+        nonlocal status, headers
+        if message["type"] == "http.response.start":
+            status, headers = message["status"], message.get("headers", [])
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await dispatch(sub_scope, receive, send)
+    except StarletteHTTPException as e:
+        # Raised by the router itself, e.g. 404 for an unknown path
+        return _error(e.status_code, e.detail)
+    except Exception as e:
+        print(f"Error in batch sub-request {path}: {e}")
+        return _error(500, "Internal Server Error")
+    finally:
+        finished.set()
+    return {"status": status, "body": _body(headers, b"".join(chunks))}
+
+
+async def execute(request, urls: List[Tuple[Optional[str], str]], principal: dict) -> List[dict]:
+    """Run the `(id, url)` sub-requests of a batch for the authenticated `principal`."""
+    if not urls:
+        raise HTTPException(status_code=400, detail="No requests given")
+    if len(urls) > BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_REQUESTS} requests per batch")
+    dispatch = metrics.MetricsMiddleware(request.app.router)
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(item_id, url):
+        async with slots:
+            return {"id": item_id, **await _run(dispatch, request.scope, principal, url)}
+
+    return list(await asyncio.gather(*(run(item_id, url) for item_id, url in urls)))
@@ -0,0 +1,47 @@
+"""Sync (threadpool) vs async (AsyncEngine) database mode at high concurrency.
+
+    python -m backend.benchmarks.async_concurrency --concurrency 256 --duration 10
+
+The gap is widest when queries wait on I/O rather than CPU, e.g. against
+Postgres over the network: pass `--database-url postgresql://...` (the table
+is seeded first, so point it at a scratch database).
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from backend import models
+from .common import run_server, temp_database_url, seed, drive, report
+from .deep_pages import project_rows
+
+
+async def run_load(base_url, path, duration, concurrency):
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        return await drive(client, "GET", path, duration, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modes", default="sync,async")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--path", default="/api/admin/projects?skip=25000&limit=20")
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    results = []
+    with temp_database_url() as database_url:
+        database_url = args.database_url or database_url
+        seed(database_url, models.AdminProject, project_rows(args.rows))
+        for mode in args.modes.split(","):
+            with run_server({"DATABASE_MODE": mode}, database_url=database_url) as base_url:
+                result = asyncio.run(run_load(base_url, args.path, args.duration, args.concurrency))
+            results.append({"database_mode": mode, "concurrency": args.concurrency, **result})
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
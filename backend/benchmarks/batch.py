@@ -0,0 +1,92 @@
+"""Loading the admin cabinet: separate GET requests vs one `/api/batch`.
+
+    python -m backend.benchmarks.batch --rtt 50 --duration 10
+
+A "page load" fetches the lists the cabinet shows on start. `separate` sends
+them as individual requests over at most 6 connections, as a browser does
+per origin; `batch` sends them as one POST to `/api/batch`. `--rtt` adds a
+simulated network round-trip before each HTTP request, since on localhost
+there is none. Per mode it reports page loads per second and page load
+latency percentiles.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from .common import percentiles, report, run_server, temp_database_url
+from .dataset import generate
+
+CABINET_URLS = [
+    "/api/admin/projects?limit=50",
+    "/api/admin/categories",
+    "/api/admin/customers?limit=50",
+    "/api/admin/products?limit=50",
+    "/api/admin/tasks?limit=50",
+    "/api/admin/documents?limit=50",
+    "/api/contact/requests?limit=50",
+]
+BROWSER_CONNECTIONS = 6
+
+SCALE = {"users": 100, "categories": 20, "projects": 20_000, "customers": 5_000, "products": 1_000,
+         "tasks": 5_000, "documents": 5_000, "requests": 20_000}
+
+
+async def page_load(client, mode, headers, rtt):
+    async def request(method, url, **kwargs):
+        await asyncio.sleep(rtt)
+        response = await client.request(method, url, headers=headers, **kwargs)
+        response.raise_for_status()
+        return response
+
+    if mode == "batch":
+        response = await request("POST", "/api/batch", json={"requests": [{"url": url} for url in CABINET_URLS]})
+        assert all(item["status"] == 200 for item in response.json()["responses"])
+    else:
+        await asyncio.gather(*(request("GET", url) for url in CABINET_URLS))
+
+
+async def run_mode(base_url, mode, args):
+    # Each simulated browser tab gets its own connection limit
+    tabs = [httpx.AsyncClient(base_url=base_url, timeout=60.0,
+                              limits=httpx.Limits(max_connections=BROWSER_CONNECTIONS))
+            for _ in range(args.concurrency)]
+    try:
+        response = await tabs[0].post("/api/auth/login", data={"username": "root", "password": "root"})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        samples = []
+        stop_at = time.monotonic() + args.duration
+
+        async def tab(client):
+            while time.monotonic() < stop_at:
+                start = time.perf_counter()
+                await page_load(client, mode, headers, args.rtt / 1000)
+                samples.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(tab(client) for client in tabs))
+        return {"page_loads_per_sec": round(len(samples) / args.duration, 1), **percentiles(samples)}
+    finally:
+        for client in tabs:
+            await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rtt", type=float, default=50.0, help="Simulated round-trip time in milliseconds")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=4, help="Browser tabs loading the cabinet at once")
+    args = parser.parse_args()
+
+    results = {"rtt_ms": args.rtt, "requests_per_page": len(CABINET_URLS)}
+    with temp_database_url() as database_url:
+        generate(database_url, SCALE)
+        with run_server(database_url=database_url) as base_url:
+            for mode in ("separate", "batch"):
+                results[mode] = asyncio.run(run_mode(base_url, mode, args))
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Shared helpers for the benchmark scripts.
+
+Every benchmark starts the real app in a uvicorn subprocess against a throwaway
+SQLite database, so results include the HTTP stack and the threadpool.
+"""
+from contextlib import contextmanager
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def temp_database_url():
+    with tempfile.TemporaryDirectory() as tmp:
+        yield f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+
+
+@contextmanager
+def run_server(env: dict = None, database_url: str = None, args: list = None, quiet: bool = False,
+               workers: int = None):
+    """Start `uvicorn backend.main:app` and yield its base URL.
+
+    With `workers`, `python -m backend.serve` runs that many workers instead, and
+    the URL is yielded once all of them serve.
+    `quiet` also silences stderr, for runs that provoke server errors on purpose.
+    """
+    with temp_database_url() as default_url:
+        port = free_port()
+        proc_env = dict(os.environ)
+        proc_env["DATABASE_URL"] = database_url or default_url
+        # Benchmarks measure the app, not the limiters, unless a run opts in
+        proc_env.setdefault("RATE_LIMITS", "")
+        proc_env.setdefault("MAX_CONCURRENT_REQUESTS", "0")
+        proc_env.update(env or {})
+        if workers:
+            cmd = [sys.executable, "-m", "backend.serve", "--workers", str(workers)]
+        else:
+            cmd = [sys.executable, "-m", "uvicorn", "backend.main:app"]
+        cmd += ["--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+        proc = subprocess.Popen(cmd + (args or []), cwd=REPO_ROOT, env=proc_env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL if quiet else None)
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            wait_until_ready(base_url, proc)
+            if workers:
+                wait_until_workers_ready(base_url, workers, proc)
+            yield base_url
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def wait_until_ready(base_url: str, proc=None, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            if httpx.get(f"{base_url}/api/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("Server did not become ready")
+
+
+def wait_until_workers_ready(base_url: str, workers: int, proc=None, timeout: float = 60.0):
+    """Wait until the `backend.serve` supervisor reports `workers` serving workers."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        supervisor = httpx.get(f"{base_url}/api/health/workers", timeout=1.0).json()["supervisor"]
+        if supervisor and supervisor["workers_ready"] >= workers and supervisor["status"] == "ok":
+            return supervisor
+        time.sleep(0.2)
+    raise RuntimeError("Workers did not become ready")
+
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {"count": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {"count": len(ordered), "p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+
+async def drive(client, method: str, path: str, duration: float, concurrency: int, **kwargs) -> dict:
+    """Hit one route from `concurrency` tasks for `duration` seconds."""
+    samples, statuses = [], {}
+    stop_at = time.monotonic() + duration
+
+    async def worker():
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = response.status_code
+            except httpx.TransportError:
+                status = "transport_error"
+            samples.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return {"requests_per_sec": round(len(samples) / duration, 1), "status_codes": statuses,
+            **percentiles(samples)}
+
+
+def seed(database_url: str, model, rows, batch_size: int = 10000) -> None:
+    """Create the schema and insert `rows` (an iterable of dicts) into `model` in batches."""
+    from sqlalchemy import create_engine, insert
+    from backend.database import Base
+
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    batch = []
+    with engine.begin() as conn:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                conn.execute(insert(model.__table__), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(model.__table__), batch)
+    engine.dispose()
+
+
+def get_token(base_url: str, username: str, password: str) -> str:
+    httpx.post(f"{base_url}/api/auth/register", json={"username": username, "password": password})
+    response = httpx.post(f"{base_url}/api/auth/login",
+                          data={"username": username, "password": password}, timeout=30.0)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def report(results) -> None:
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,54 @@
+"""Admin dashboard from the trigger-maintained counters vs GROUP BY queries.
+
+    python -m backend.benchmarks.dashboard --projects 100000 --requests 1000000
+
+Both sources are served by the same server over the same generated dataset,
+and the two answers are compared before timing. Per source it reports
+requests per second and latency percentiles of `/api/admin/dashboard`.
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from .common import drive, report, run_server, temp_database_url
+from .dataset import generate, scale_arguments
+
+SOURCES = ("counters", "query")
+
+
+async def run_load(base_url, args):
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0) as client:
+        response = await client.post("/api/auth/login", data={"username": "root", "password": "root"})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        answers = {}
+        for source in SOURCES:
+            probe = await client.get("/api/admin/dashboard", headers=headers, params={"source": source})
+            probe.raise_for_status()
+            answers[source] = {key: value for key, value in probe.json().items() if key != "source"}
+        results = {"same_counts": answers["counters"] == answers["query"]}
+        for source in SOURCES:
+            results[source] = await drive(client, "GET", "/api/admin/dashboard", args.duration, args.concurrency,
+                                          headers=headers, params={"source": source})
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    scale_arguments(parser, users=100, categories=20, projects=100_000, tasks=100_000, requests=1_000_000)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    scale = {name: getattr(args, name) for name in
+             ("users", "categories", "projects", "customers", "products", "tasks", "documents", "requests")}
+
+    with temp_database_url() as database_url:
+        timings = generate(database_url, scale, dashboard_counters=True)
+        with run_server(env={"DASHBOARD_COUNTERS": "1"}, database_url=database_url) as base_url:
+            results = asyncio.run(run_load(base_url, args))
+    report({"scale": scale, "counter_rebuild_seconds": timings["dashboard_counters"][1], **results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Synthetic dataset at production scale, for load tests and benchmarks.
+
+    python -m backend.benchmarks.dataset --database-url sqlite:///./load.db --requests 1000000 --projects 100000
+
+Fills every table with deterministic data (same `--seed`, same rows), using
+multi-row Core inserts in batches; on SQLite with synchronous=OFF and the
+search triggers replaced by one index rebuild at the end. Users are
+`user1`..`userN` with password `DATASET_PASSWORD`, plus the `root` superuser.
+Project owners, request authors and categories are skewed the way real data is:
+a few users and categories own most rows.
+
+Run it against an empty database; ids start at 1.
+"""
+from typing import Optional
+from datetime import datetime, timedelta
+import argparse
+import random
+import time
+
+from sqlalchemy import DateTime, String, column, create_engine, event, insert, table, text
+
+from backend import dashboard, models, search, utils
+from backend.database import Base
+from .search import sentence, vocabulary
+
+DATASET_PASSWORD = "password"
+BATCH_SIZE = 10_000
+# Rows are spread over this many days before now
+HISTORY_DAYS = 2 * 365
+
+PROJECT_STATUSES = (("planned", 2), ("in_progress", 3), ("completed", 5))
+REQUEST_STATUSES = (("new", 3), ("in_progress", 2), ("done", 5))
+TASK_STATUSES = (("open", 4), ("in_progress", 3), ("done", 3))
+PRIORITIES = (("low", 3), ("medium", 5), ("high", 2))
+REASONS = ("Angebot", "Beratung", "Reklamation", "Termin", "Sonstiges")
+PROJECT_TYPES = ("Dach", "Fassade", "Innenausbau", "Sanierung", "Neubau")
+COLORS = ("Anthrazit", "Weiß", "Rot", "Grau", "Schwarz")
+SIZES = ("S", "M", "L", "XL")
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def _skewed_id(rng, count):
+    # Pareto-distributed: low ids (the "big" users and categories) get most rows
+    return min(int(rng.paretovariate(1.2)), count)
+
+
+def _timestamp(rng, now):
+    return now - timedelta(seconds=rng.randrange(HISTORY_DAYS * 86400))
+
+
+def users(count):
+    # One bcrypt hash for everyone; hashing a million passwords would dominate the run
+    hashed = utils.get_password_hash(DATASET_PASSWORD)
+    yield {"id": 1, "username": "root", "email": "root@example.com", "hashed_password": utils.get_password_hash("root"),
+           "is_active": True, "is_superuser": True, "vorname": "Admin", "nachname": "Root", "position": "Admin"}
+    for i in range(1, count + 1):
+        yield {"id": i + 1, "username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": hashed,
+               "is_active": True, "is_superuser": False, "vorname": f"Vorname{i}", "nachname": f"Nachname{i}",
+               "position": "Client"}
+
+
+def categories(count, rng, words):
+    for i in range(1, count + 1):
+        name = f"{words[i].capitalize()} {i}"
+        yield {"id": i, "name": name, "name_en": name, "name_de": name}
+
+
+def projects(count, rng, words, n_users, n_categories, now):
+    for i in range(1, count + 1):
+        created = _timestamp(rng, now)
+        yield {
+            "id": i,
+            "project_code": f"PRJ-{i:07d}",
+            "name": sentence(rng, words)[:60],
+            "description": sentence(rng, words),
+            "status": _weighted(rng, PROJECT_STATUSES),
+            "year": created.year,
+            "type": rng.choice(PROJECT_TYPES),
+            "size": rng.choice(SIZES),
+            "color": rng.choice(COLORS),
+            "end_date": (created + timedelta(days=rng.randrange(30, 400))).date(),
+            "category_id": _skewed_id(rng, n_categories),
+            # Users are ids 2..n_users + 1; root (1) owns nothing
+            "user_id": _skewed_id(rng, n_users) + 1 if rng.random() < 0.8 else None,
+        }
+
+
+def customers(count, rng, words):
+    for i in range(1, count + 1):
+        yield {"id": i, "firma": f"{words[rng.randrange(len(words))].capitalize()} GmbH {i}"}
+
+
+def products(count, rng, words):
+    for i in range(1, count + 1):
+        yield {"id": i, "name": f"{words[rng.randrange(len(words))].capitalize()} {rng.choice(SIZES)} {i}"}
+
+
+def tasks(count, rng, words, now):
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "titel": sentence(rng, words)[:50],
+            "status": _weighted(rng, TASK_STATUSES),
+            "prioritaet": _weighted(rng, PRIORITIES),
+            "zugewiesen_name": f"user{rng.randrange(1, 50)}",
+            "created_date": _timestamp(rng, now),
+        }
+
+
+def documents(count, rng, words, now):
+    for i in range(1, count + 1):
+        yield {"id": i, "name": f"{words[rng.randrange(len(words))]}_{i}.pdf", "created_date": _timestamp(rng, now)}
+
+
+def contact_requests(count, rng, words, n_users, n_categories, now):
+    for i in range(1, count + 1):
+        registered = rng.random() < 0.3
+        yield {
+            "id": i,
+            "name": f"Kunde {i}",
+            "phone": f"+49 30 {rng.randrange(1000000, 9999999)}",
+            "email": f"kunde{i}@example.com",
+            "reason": rng.choice(REASONS),
+            "message": sentence(rng, words),
+            "status": _weighted(rng, REQUEST_STATUSES),
+            "created_at": _timestamp(rng, now),
+            "category_id": _skewed_id(rng, n_categories) if rng.random() < 0.7 else None,
+            "user_id": _skewed_id(rng, n_users) + 1 if registered else None,
+        }
+
+
+def _insert_target(model, dialect_name):
+    """The model's table for inserts; on SQLite timestamps are bound as text in the server_default format."""
+    if dialect_name != "sqlite":
+        return model.__table__
+    # The DateTime bind processor always appends microseconds, while rows written by
+    # server_default=func.now() have none; mixed formats would break string ordering
+    return table(model.__tablename__, *(
+        column(c.name, String if isinstance(c.type, DateTime) else c.type) for c in model.__table__.columns
+    ))
+
+
+def _as_text(row):
+    return {key: value.strftime("%Y-%m-%d %H:%M:%S") if isinstance(value, datetime) else value
+            for key, value in row.items()}
+
+
+def load(connection, model, rows) -> int:
+    target = _insert_target(model, connection.dialect.name)
+    convert = _as_text if connection.dialect.name == "sqlite" else (lambda row: row)
+    count, batch = 0, []
+    for row in rows:
+        batch.append(convert(row))
+        if len(batch) >= BATCH_SIZE:
+            connection.execute(insert(target), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        connection.execute(insert(target), batch)
+        count += len(batch)
+    return count
+
+
+def _drop_triggers(connection):
+    names = [f"{target['table']}_fts" for target in search.TARGETS.values()]
+    names += [f"{table.name}_dashboard" for table, _ in dashboard.COUNTERS.values()]
+    for name in names:
+        for suffix in ("ai", "ad", "au"):
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {name}_{suffix}"))
+
+
+def generate(database_url: str, scale: dict, seed: int = 0, dashboard_counters: Optional[bool] = None) -> dict:
+    """Create the schema and fill it; returns {table: (rows, seconds)}.
+
+    `dashboard_counters` overrides DASHBOARD_COUNTERS for the dashboard triggers.
+    """
+    rng = random.Random(seed)
+    words = vocabulary(random.Random(seed))
+    now = datetime.utcnow().replace(microsecond=0)
+    engine = create_engine(database_url)
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def fast_load(dbapi_connection, connection_record):
+            dbapi_connection.execute("PRAGMA synchronous=OFF")
+
+    Base.metadata.create_all(bind=engine)
+    n_users, n_categories = max(scale["users"], 1), max(scale["categories"], 1)
+    plan = [
+        (models.User, users(n_users)),
+        (models.Category, categories(n_categories, rng, words)),
+        (models.AdminProject, projects(scale["projects"], rng, words, n_users, n_categories, now)),
+        (models.Kunde, customers(scale["customers"], rng, words)),
+        (models.Ware, products(scale["products"], rng, words)),
+        (models.Aufgabe, tasks(scale["tasks"], rng, words, now)),
+        (models.Dokument, documents(scale["documents"], rng, words, now)),
+        (models.ContactRequest, contact_requests(scale["requests"], rng, words, n_users, n_categories, now)),
+    ]
+    timings = {}
+    with engine.begin() as connection:
+        if connection.dialect.name == "sqlite":
+            # Per-row trigger maintenance is far slower than one rebuild at the end
+            _drop_triggers(connection)
+        for model, rows in plan:
+            start = time.perf_counter()
+            timings[model.__tablename__] = (load(connection, model, rows), round(time.perf_counter() - start, 2))
+        start = time.perf_counter()
+        search.rebuild(connection)
+        timings["search_index"] = (None, round(time.perf_counter() - start, 2))
+        start = time.perf_counter()
+        # Recreates dropped triggers and counts the loaded rows, or drops the triggers Postgres kept
+        dashboard.configure(connection, dashboard_counters)
+        timings["dashboard_counters"] = (None, round(time.perf_counter() - start, 2))
+        if connection.dialect.name == "sqlite":
+            connection.execute(text("ANALYZE"))
+    engine.dispose()
+    return timings
+
+
+def scale_arguments(parser, **defaults):
+    for name in ("users", "categories", "projects", "customers", "products", "tasks", "documents", "requests"):
+        parser.add_argument(f"--{name}", type=int, default=defaults.get(name, 0))
+
+
+DEFAULT_SCALE = {"users": 1_000, "categories": 20, "projects": 100_000, "customers": 10_000, "products": 10_000,
+                 "tasks": 50_000, "documents": 50_000, "requests": 1_000_000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    scale_arguments(parser, **DEFAULT_SCALE)
+    args = parser.parse_args()
+    scale = {name: getattr(args, name) for name in DEFAULT_SCALE}
+    for name, (rows, seconds) in generate(args.database_url, scale, args.seed).items():
+        print(f"{name:16} {rows if rows is not None else '':>10} rows  {seconds:8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
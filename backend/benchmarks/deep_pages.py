@@ -0,0 +1,68 @@
+"""Latency of deep pages: OFFSET paging vs keyset cursors.
+
+    python -m backend.benchmarks.deep_pages --rows 1000000
+"""
+import argparse
+import time
+
+import httpx
+
+from backend import models
+from backend.pagination import encode_cursor
+from .common import run_server, temp_database_url, seed, percentiles, report
+
+YEARS = 25
+
+
+def project_rows(count):
+    for i in range(count):
+        yield {
+            "id": i + 1,
+            "project_code": f"P{i + 1}",
+            "name": f"Project {i + 1}",
+            "status": "completed",
+            "year": 2000 + i * YEARS // count,
+            "type": "bench",
+        }
+
+
+def time_request(client, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get("/api/public/projects", params=params)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    depths = [d for d in (0, 1_000, 10_000, 100_000, 500_000, args.rows - args.limit) if 0 <= d < args.rows]
+    results = []
+    with temp_database_url() as database_url:
+        seed(database_url, models.AdminProject, project_rows(args.rows))
+        with run_server(database_url=database_url) as base_url, \
+                httpx.Client(base_url=base_url, timeout=60.0) as client:
+            for depth in depths:
+                row = {"depth": depth}
+                for sort in ("id", "year"):
+                    offset = {"skip": depth, "limit": args.limit, "sort": sort}
+                    cursor = ""
+                    if depth:
+                        value = depth if sort == "id" else 2000 + (depth - 1) * YEARS // args.rows
+                        cursor = encode_cursor(sort, value, depth)
+                    keyset = {"cursor": cursor, "limit": args.limit, "sort": sort}
+                    row[f"offset_sort_{sort}"] = time_request(client, offset, args.repeat)
+                    row[f"cursor_sort_{sort}"] = time_request(client, keyset, args.repeat)
+                results.append(row)
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
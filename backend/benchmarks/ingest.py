@@ -0,0 +1,59 @@
+"""Public contact-request submissions: direct commit vs write-behind group commit.
+
+    python -m backend.benchmarks.ingest --concurrency 64 --duration 10
+
+Runs the same burst with CONTACT_WRITE_BEHIND=0 (one commit per submission)
+and =1 (queued, one commit per batch). After the server has shut down it
+counts the stored rows, which must match the accepted submissions because
+shutdown flushes the queue.
+"""
+import argparse
+import asyncio
+
+import httpx
+from sqlalchemy import create_engine, func, select
+
+from backend import models
+from .common import run_server, temp_database_url, seed, drive, report
+from .write_contention import PAYLOAD
+
+
+async def run_load(base_url, duration, concurrency):
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        return await drive(client, "POST", "/api/contact/requests", duration, concurrency, json=PAYLOAD)
+
+
+def count_rows(database_url):
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        count = conn.execute(select(func.count()).select_from(models.ContactRequest)).scalar_one()
+    engine.dispose()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modes", default="0,1", help="CONTACT_WRITE_BEHIND values to compare")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--flush-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes.split(","):
+        env = {"CONTACT_WRITE_BEHIND": mode, "INGEST_BATCH_SIZE": str(args.batch_size),
+               "INGEST_FLUSH_MS": str(args.flush_ms)}
+        with temp_database_url() as database_url:
+            seed(database_url, models.ContactRequest, [])
+            with run_server(env, database_url=database_url) as base_url:
+                result = asyncio.run(run_load(base_url, args.duration, args.concurrency))
+            accepted = sum(count for code, count in result["status_codes"].items() if code in (200, 202))
+            results.append({"write_behind": mode == "1", **result, "accepted": accepted,
+                            "stored_after_shutdown": count_rows(database_url)})
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
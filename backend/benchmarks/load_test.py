@@ -0,0 +1,271 @@
+"""Mixed-traffic load test with per-route latency percentiles as JSON.
+
+    python -m backend.benchmarks.load_test --concurrency 64 --duration 60 --output run.json
+    python -m backend.benchmarks.load_test --compare run.json   # exits 1 on a regression
+
+Virtual users pick operations from four traffic classes (public, client, admin,
+auth) weighted by `--mix`. Each route reports requests per second, status
+codes and p50/p95/p99. Runs are deterministic for the same `--seed`, apart
+from timing.
+
+By default a temporary dataset is generated (`--projects`, `--requests`, ...)
+and the app is started against it with rate limits and load shedding off. Pass
+`--database-url` to reuse a dataset from `backend.benchmarks.dataset` (the run
+writes contact requests and status changes to it), or `--base-url` to target a
+running server whose users come from that generator.
+
+`--compare` reads an earlier `--output` file and flags every route whose p95
+grew by more than `--tolerance` (and by at least 5 ms), or whose error count
+went up.
+"""
+from contextlib import ExitStack
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import httpx
+
+from .common import run_server, temp_database_url, percentiles
+from .dataset import DATASET_PASSWORD, generate, scale_arguments
+from .search import vocabulary
+
+DEFAULT_MIX = "public=40,client=20,admin=30,auth=10"
+# Absolute p95 growth below this is treated as noise
+NOISE_FLOOR_MS = 5.0
+# Client users logged in up front; their tokens are shared by the virtual users
+CLIENT_SESSIONS = 50
+
+
+class Context:
+    def __init__(self, rng, words, max_ids, admin_headers, client_headers, users):
+        self.rng = rng
+        self.words = words
+        self.max_ids = max_ids
+        self.admin = admin_headers
+        self.clients = client_headers
+        self.users = users
+
+    def id_of(self, kind):
+        return self.rng.randint(1, max(self.max_ids[kind], 1))
+
+    def word(self):
+        # Mostly common words, like real searches
+        return self.words[min(int(self.rng.paretovariate(1.0)) - 1, 2000)]
+
+
+def public_operations(ctx):
+    return [
+        (5, lambda: ("GET /api/public/projects", "GET", "/api/public/projects",
+                     {"params": {"limit": 20, "skip": ctx.rng.randrange(0, 200) * 20}})),
+        (3, lambda: ("GET /api/public/categories", "GET", "/api/public/categories", {})),
+        (2, lambda: ("POST /api/contact/requests", "POST", "/api/contact/requests", {"json": {
+            "name": "Load Test", "email": "load@example.com", "reason": "Angebot",
+            "message": " ".join(ctx.word() for _ in range(20))}})),
+    ]
+
+
+def client_operations(ctx):
+    headers = lambda: {"headers": ctx.rng.choice(ctx.clients)}
+    return [
+        (4, lambda: ("GET /api/client/projects", "GET", "/api/client/projects", headers())),
+        (3, lambda: ("GET /api/client/requests", "GET", "/api/client/requests", headers())),
+        (3, lambda: ("GET /api/auth/me", "GET", "/api/auth/me", headers())),
+    ]
+
+
+def admin_operations(ctx):
+    admin = {"headers": ctx.admin}
+    return [
+        (4, lambda: ("GET /api/admin/projects", "GET", "/api/admin/projects",
+                     {**admin, "params": {"limit": 20, "status": ctx.rng.choice(["planned", "in_progress"])}})),
+        (3, lambda: ("GET /api/admin/projects/{project_id}", "GET", f"/api/admin/projects/{ctx.id_of('projects')}",
+                     admin)),
+        (4, lambda: ("GET /api/contact/requests", "GET", "/api/contact/requests",
+                     {**admin, "params": {"limit": 50, "cursor": "", "sort": "-created_at", "status": "new"}})),
+        (2, lambda: ("GET /api/admin/tasks", "GET", "/api/admin/tasks",
+                     {**admin, "params": {"limit": 50, "prioritaet": "high"}})),
+        (2, lambda: ("GET /api/admin/search", "GET", "/api/admin/search",
+                     {**admin, "params": {"q": ctx.word(), "limit": 20}})),
+        (1, lambda: ("PATCH /api/contact/requests/{request_id}", "PATCH",
+                     f"/api/contact/requests/{ctx.id_of('requests')}", {**admin, "json": {"status": "in_progress"}})),
+    ]
+
+
+def auth_operations(ctx):
+    return [
+        (1, lambda: ("POST /api/auth/login", "POST", "/api/auth/login",
+                     {"data": {"username": f"user{ctx.rng.randint(1, ctx.users)}", "password": DATASET_PASSWORD}})),
+    ]
+
+
+TRAFFIC_CLASSES = {
+    "public": public_operations,
+    "client": client_operations,
+    "admin": admin_operations,
+    "auth": auth_operations,
+}
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in TRAFFIC_CLASSES:
+            raise SystemExit(f"Unknown traffic class {name!r}, expected one of {', '.join(TRAFFIC_CLASSES)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def build_schedule(ctx, mix):
+    """Flatten the mix into (operation, weight) pairs."""
+    operations, weights = [], []
+    for name, class_weight in mix.items():
+        entries = TRAFFIC_CLASSES[name](ctx)
+        total = sum(weight for weight, _ in entries)
+        for weight, operation in entries:
+            operations.append(operation)
+            weights.append(class_weight * weight / total)
+    return operations, weights
+
+
+async def login(client, username, password):
+    response = await client.post("/api/auth/login", data={"username": username, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def max_id(client, path, headers):
+    response = await client.get(path, params={"limit": 1, "sort": "-id"}, headers=headers)
+    response.raise_for_status()
+    items = response.json()
+    items = items["items"] if isinstance(items, dict) else items
+    return items[0]["id"] if items else 0
+
+
+async def run_load(base_url, args, mix):
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        admin = await login(client, "root", "root")
+        clients = [await login(client, f"user{i}", DATASET_PASSWORD) for i in range(1, min(args.users, CLIENT_SESSIONS) + 1)]
+        max_ids = {"projects": await max_id(client, "/api/admin/projects", admin),
+                   "requests": await max_id(client, "/api/contact/requests", admin)}
+        ctx = Context(rng, vocabulary(random.Random(args.seed)), max_ids, admin, clients, args.users)
+        operations, weights = build_schedule(ctx, mix)
+
+        routes = {}
+        measuring = False
+
+        async def user():
+            while not stopped:
+                label, method, path, kwargs = rng.choices(operations, weights)[0]()
+                start = time.perf_counter()
+                try:
+                    status = (await client.request(method, path, **kwargs)).status_code
+                except httpx.TransportError:
+                    status = "transport_error"
+                if measuring:
+                    route = routes.setdefault(label, {"samples": [], "status_codes": {}})
+                    route["samples"].append(time.perf_counter() - start)
+                    route["status_codes"][status] = route["status_codes"].get(status, 0) + 1
+
+        stopped = False
+        users = [asyncio.create_task(user()) for _ in range(args.concurrency)]
+        await asyncio.sleep(args.warmup)
+        measuring = True
+        started = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        measuring = False
+        elapsed = time.perf_counter() - started
+        stopped = True
+        await asyncio.gather(*users)
+    return summarize(routes, elapsed)
+
+
+def summarize(routes, elapsed):
+    result, total, errors = {}, 0, 0
+    for label in sorted(routes):
+        route = routes[label]
+        count = len(route["samples"])
+        failed = sum(n for status, n in route["status_codes"].items() if status == "transport_error" or status >= 500)
+        total += count
+        errors += failed
+        result[label] = {
+            "requests_per_sec": round(count / elapsed, 1),
+            "errors": failed,
+            "status_codes": {str(status): n for status, n in sorted(route["status_codes"].items(), key=str)},
+            **percentiles(route["samples"]),
+        }
+    return {"requests_per_sec": round(total / elapsed, 1), "requests": total, "errors": errors,
+            "duration_s": round(elapsed, 2), "routes": result}
+
+
+def compare(baseline, current, tolerance):
+    regressions = []
+    for label, now in current["routes"].items():
+        before = baseline["routes"].get(label)
+        if before is None or before["p95_ms"] is None or now["p95_ms"] is None:
+            continue
+        growth = now["p95_ms"] - before["p95_ms"]
+        if growth > NOISE_FLOOR_MS and now["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append({"route": label, "metric": "p95_ms", "baseline": before["p95_ms"], "current": now["p95_ms"]})
+        if now["errors"] > before["errors"]:
+            regressions.append({"route": label, "metric": "errors", "baseline": before["errors"], "current": now["errors"]})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=None, help="Target a running server instead of starting one")
+    parser.add_argument("--database-url", default=None, help="Start the app against this existing dataset")
+    parser.add_argument("--mode", default="async", choices=["async", "sync"], help="DATABASE_MODE of the started app")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the started app")
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Also write the JSON report to this file")
+    parser.add_argument("--compare", default=None, help="Report of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative p95 growth")
+    scale_arguments(parser, users=200, categories=20, projects=10_000, customers=1_000, products=1_000,
+                    tasks=5_000, documents=5_000, requests=100_000)
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    with ExitStack() as stack:
+        base_url = args.base_url
+        if base_url is None:
+            database_url = args.database_url
+            if database_url is None:
+                database_url = stack.enter_context(temp_database_url())
+                scale = {name: getattr(args, name) for name in
+                         ("users", "categories", "projects", "customers", "products", "tasks", "documents", "requests")}
+                generate(database_url, scale, args.seed)
+            base_url = stack.enter_context(run_server({"DATABASE_MODE": args.mode}, database_url=database_url,
+                                                      args=["--workers", str(args.workers)]))
+        result = asyncio.run(run_load(base_url, args, mix))
+
+    report = {
+        "config": {"mix": mix, "concurrency": args.concurrency, "duration": args.duration, "seed": args.seed,
+                   "mode": args.mode if args.base_url is None else None, "workers": args.workers},
+        **result,
+    }
+    regressions = None
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = report["regressions"] = compare(json.load(f), report, args.tolerance)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
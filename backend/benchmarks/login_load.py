@@ -0,0 +1,68 @@
+"""Login throughput and latency of unrelated endpoints under login load.
+
+    python -m backend.benchmarks.login_load --pool-sizes 0,4 --duration 10
+
+HASH_POOL_SIZE=0 hashes in the request threadpool (the old behaviour); any
+other value uses the dedicated process pool from `utils.BoundedProcessPool`.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from .common import run_server, percentiles, report
+
+
+async def login_worker(client, stop_at, counters):
+    while time.monotonic() < stop_at:
+        response = await client.post("/api/auth/login",
+                                      data={"username": "bench", "password": "bench-password"})
+        counters[response.status_code] = counters.get(response.status_code, 0) + 1
+
+
+async def probe_worker(client, stop_at, samples):
+    while time.monotonic() < stop_at:
+        start = time.perf_counter()
+        await client.get("/api/public/categories")
+        samples.append(time.perf_counter() - start)
+
+
+async def run_load(base_url, duration, login_concurrency, probe_concurrency):
+    limits = httpx.Limits(max_connections=login_concurrency + probe_concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        await client.post("/api/auth/register", json={"username": "bench", "password": "bench-password"})
+        counters, samples = {}, []
+        stop_at = time.monotonic() + duration
+        await asyncio.gather(
+            *[login_worker(client, stop_at, counters) for _ in range(login_concurrency)],
+            *[probe_worker(client, stop_at, samples) for _ in range(probe_concurrency)],
+        )
+    return {
+        "logins_per_sec": round(counters.get(200, 0) / duration, 1),
+        "login_status_codes": counters,
+        "unrelated_endpoint": percentiles(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pool-sizes", default="0,4")
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--login-concurrency", type=int, default=64)
+    parser.add_argument("--probe-concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.pool_sizes.split(","):
+        env = {"HASH_POOL_SIZE": size, "HASH_QUEUE_SIZE": str(args.queue_size)}
+        with run_server(env) as base_url:
+            result = asyncio.run(run_load(base_url, args.duration,
+                                          args.login_concurrency, args.probe_concurrency))
+        results.append({"hash_pool_size": int(size), **result})
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Requests per second of authenticated routes with and without the principal cache.
+
+    python -m backend.benchmarks.principal_cache --ttls 0,30 --duration 10
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from .common import run_server, get_token, drive, report
+
+ROUTES = ["/api/auth/me", "/api/client/projects"]
+
+
+async def run_load(base_url, token, duration, concurrency):
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=30.0) as client:
+        return {path: await drive(client, "GET", path, duration, concurrency) for path in ROUTES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ttls", default="0,30")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    results = []
+    for ttl in args.ttls.split(","):
+        with run_server({"PRINCIPAL_CACHE_TTL": ttl}) as base_url:
+            token = get_token(base_url, "bench", "bench-password")
+            routes = asyncio.run(run_load(base_url, token, args.duration, args.concurrency))
+        results.append({"principal_cache_ttl": float(ttl), "routes": routes})
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
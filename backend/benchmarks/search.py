@@ -0,0 +1,116 @@
+"""Full-text search vs LIKE '%term%' scans.
+
+Seeds projects and contact requests with random text. For a common, a medium
+and a rare word, it times the ranked FTS query against LIKE scans over the same
+columns, directly on the database. It also times `/api/admin/search`
+end to end.
+
+    python -m backend.benchmarks.search --rows 500000
+"""
+import argparse
+import random
+import time
+
+import httpx
+from sqlalchemy import create_engine, text
+
+from backend import models, search
+from .common import run_server, temp_database_url, seed, percentiles, report
+
+VOCABULARY_SIZE = 20_000
+WORDS_PER_TEXT = 24
+
+
+def vocabulary(rng):
+    syllables = ["ba", "dach", "en", "fas", "ge", "hol", "in", "ka", "lo", "mau", "ner", "or",
+                 "pu", "ra", "sa", "te", "um", "ver", "wa", "zie"]
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def sentence(rng, words):
+    # Zipf-like: low indexes are common, high ones rare
+    return " ".join(words[min(int(rng.paretovariate(1.0)) - 1, len(words) - 1)] for _ in range(WORDS_PER_TEXT))
+
+
+def project_rows(count, words):
+    rng = random.Random(1)
+    for i in range(count):
+        yield {"id": i + 1, "project_code": f"P{i + 1}", "name": sentence(rng, words)[:40],
+               "description": sentence(rng, words), "status": "completed", "year": 2020, "type": "bench"}
+
+
+def request_rows(count, words):
+    rng = random.Random(2)
+    for i in range(count):
+        yield {"id": i + 1, "name": f"Kunde {i + 1}", "email": f"k{i + 1}@example.com", "reason": "Anfrage",
+               "message": sentence(rng, words), "status": "new"}
+
+
+def like_statement(limit):
+    def matches(kind):
+        return " OR ".join(f"{column} LIKE :pattern" for column in search.TARGETS[kind]["columns"])
+
+    return text(
+        f"SELECT 'project' AS type, id FROM admin_projects WHERE {matches('project')} "
+        f"UNION ALL SELECT 'request' AS type, id FROM contact_requests WHERE {matches('request')} "
+        f"LIMIT {limit}"
+    )
+
+
+def time_sql(engine, stmt, params, repeat):
+    samples, count = [], 0
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            count = len(conn.execute(stmt, params).all())
+            samples.append(time.perf_counter() - start)
+    return {"rows": count, **percentiles(samples)}
+
+
+def time_endpoint(client, headers, term, limit, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        client.get("/api/admin/search", params={"q": term, "limit": limit}, headers=headers).raise_for_status()
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500_000, help="Rows per table")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    words = vocabulary(random.Random(0))
+    terms = {"common": words[0], "medium": words[20], "rare": words[2000]}
+    results = []
+    with temp_database_url() as database_url:
+        # Importing backend.search installs the FTS tables and triggers with the schema
+        seed(database_url, models.AdminProject, project_rows(args.rows, words))
+        seed(database_url, models.ContactRequest, request_rows(args.rows, words))
+        engine = create_engine(database_url)
+        with run_server(database_url=database_url) as base_url, \
+                httpx.Client(base_url=base_url, timeout=120.0) as client:
+            token = client.post("/api/auth/login", data={"username": "root", "password": "root"}).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            for label, term in terms.items():
+                fts, params = search.search_statement("sqlite", term, list(search.TARGETS), 0, args.limit)
+                results.append({
+                    "term": label,
+                    "fts_ranked_page": time_sql(engine, fts, params, args.repeat),
+                    # LIKE cannot rank, so it only has to find the first `limit` matches
+                    "like_first_page": time_sql(engine, like_statement(args.limit), {"pattern": f"%{term}%"}, args.repeat),
+                    "like_all_matches": time_sql(engine, like_statement(-1), {"pattern": f"%{term}%"}, args.repeat),
+                    "endpoint": time_endpoint(client, headers, term, args.limit, args.repeat),
+                })
+        engine.dispose()
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
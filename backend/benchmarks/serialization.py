@@ -0,0 +1,84 @@
+"""List routes per JSON serialization mode: ORM + response_model vs Core rows + orjson, with and without gzip.
+
+    python -m backend.benchmarks.serialization --limit 100 --duration 5
+
+Each mode runs the app against the same generated dataset. Per route it
+reports requests per second, latency percentiles and the response size on
+the wire.
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from .common import run_server, temp_database_url, drive, report
+from .dataset import DATASET_PASSWORD, generate
+
+MODES = {
+    "orm": {"JSON_FAST_PATH": "0", "JSON_GZIP_MIN_SIZE": "0"},
+    "rows": {"JSON_FAST_PATH": "1", "JSON_GZIP_MIN_SIZE": "0"},
+    "rows_gzip": {"JSON_FAST_PATH": "1", "JSON_GZIP_MIN_SIZE": "4096"},
+}
+
+ADMIN_ROUTES = [
+    "/api/contact/requests",
+    "/api/admin/projects",
+    "/api/admin/tasks",
+    "/api/admin/documents",
+    "/api/admin/customers",
+    "/api/auth/users",
+]
+CLIENT_ROUTES = ["/api/client/projects", "/api/client/requests"]
+
+SCALE = {"users": 100, "categories": 20, "projects": 20_000, "customers": 5_000, "products": 1_000,
+         "tasks": 20_000, "documents": 20_000, "requests": 50_000}
+
+
+async def login(client, username, password):
+    response = await client.post("/api/auth/login", data={"username": username, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_load(base_url, args):
+    # Accept-Encoding: gzip is sent either way; only the server decides whether to compress
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as client:
+        admin = await login(client, "root", "root")
+        # user1 owns the most rows of the skewed dataset
+        owner = await login(client, "user1", DATASET_PASSWORD)
+        routes = [(path, admin, {"limit": args.limit}) for path in ADMIN_ROUTES]
+        routes += [(path, owner, {}) for path in CLIENT_ROUTES]
+        results = {}
+        for path, headers, params in routes:
+            probe = await client.get(path, headers=headers, params=params)
+            result = await drive(client, "GET", path, args.duration, args.concurrency, headers=headers, params=params)
+            items = probe.json()
+            results[path] = {
+                "rows": len(items["items"] if isinstance(items, dict) else items),
+                "wire_bytes": int(probe.headers.get("content-length", len(probe.content))),
+                "content_encoding": probe.headers.get("content-encoding"),
+                **result,
+            }
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--limit", type=int, default=100, help="Page size of the admin list routes")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    results = []
+    with temp_database_url() as database_url:
+        generate(database_url, SCALE)
+        for mode in args.modes.split(","):
+            with run_server(MODES[mode], database_url=database_url) as base_url:
+                routes = asyncio.run(run_load(base_url, args))
+            results.append({"mode": mode, "routes": routes})
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Startup cost: import time of backend.main, lifespan startup and time until workers serve.
+
+    python -m backend.benchmarks.startup --runs 5 --workers 4
+
+Every measurement runs in a fresh interpreter. `lifespan` times the app's
+startup on a new database (migrations applied) and on a migrated one (one
+version check). For comparison, `create_all_boot` times what every process
+used to do on boot: `create_all` plus the superuser lookup. `ready` starts
+uvicorn with `--workers` on a new database and checks that the workers
+created the schema and the superuser exactly once.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from .common import REPO_ROOT, free_port, temp_database_url, wait_until_ready, report
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import backend.main
+print(time.perf_counter() - start)
+"""
+
+LIFESPAN_SCRIPT = """
+import asyncio, time
+from backend.main import app
+
+async def boot():
+    start = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        return time.perf_counter() - start
+
+print(asyncio.run(boot()))
+"""
+
+CREATE_ALL_SCRIPT = """
+import time
+from backend import database, main, models
+start = time.perf_counter()
+database.Base.metadata.create_all(bind=database.engine)
+with database.SessionLocal() as db:
+    db.query(models.User).filter(models.User.username == "root").first()
+print(time.perf_counter() - start)
+"""
+
+
+def _run(script: str, database_url: str, flags=()) -> subprocess.CompletedProcess:
+    env = dict(os.environ, DATABASE_URL=database_url, HASH_POOL_SIZE="1")
+    return subprocess.run([sys.executable, *flags, "-c", script], cwd=REPO_ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def _seconds(script: str, database_url: str) -> float:
+    return float(_run(script, database_url).stdout.strip().splitlines()[-1])
+
+
+def _summary(samples) -> dict:
+    return {"median_ms": round(statistics.median(samples) * 1000, 1), "min_ms": round(min(samples) * 1000, 1),
+            "runs": len(samples)}
+
+
+def slowest_imports(database_url: str, count: int) -> list:
+    """Packages and backend modules with the largest cumulative import time (python -X importtime)."""
+    imports = []
+    for line in _run("import backend.main", database_url, ("-X", "importtime")).stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        # Packages include their submodules, so list only their roots
+        if "." not in name or name.startswith("backend."):
+            imports.append((int(cumulative), name))
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)}
+            for us, name in sorted(imports, reverse=True)[:count] if name != "backend"]
+
+
+def time_to_ready(workers: int) -> dict:
+    with temp_database_url() as database_url:
+        port = free_port()
+        env = dict(os.environ, DATABASE_URL=database_url, HASH_POOL_SIZE="1")
+        cmd = [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning", "--workers", str(workers)]
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            wait_until_ready(base_url, proc, timeout=120.0)
+            ready = time.perf_counter() - start
+            # Every worker has booted once each of them answers; give stragglers a moment
+            time.sleep(2)
+            login = httpx.post(f"{base_url}/api/auth/login", data={"username": "root", "password": "root"}, timeout=30)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+        from sqlalchemy import create_engine, text
+        engine = create_engine(database_url)
+        with engine.connect() as conn:
+            versions = conn.execute(text("SELECT count(*) FROM schema_version")).scalar()
+            superusers = conn.execute(text("SELECT count(*) FROM users WHERE username = 'root'")).scalar()
+        engine.dispose()
+    return {"workers": workers, "ready_ms": round(ready * 1000, 1), "login_status": login.status_code,
+            "schema_version_rows": versions, "root_users": superusers}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--top-imports", type=int, default=10)
+    args = parser.parse_args()
+
+    results = {}
+    with temp_database_url() as database_url:
+        results["import_backend_main"] = _summary([_seconds(IMPORT_SCRIPT, database_url) for _ in range(args.runs)])
+        results["slowest_imports"] = slowest_imports(database_url, args.top_imports)
+        new_database = []
+        for _ in range(args.runs):
+            with temp_database_url() as fresh_url:
+                new_database.append(_seconds(LIFESPAN_SCRIPT, fresh_url))
+        results["lifespan_new_database"] = _summary(new_database)
+        _seconds(LIFESPAN_SCRIPT, database_url)
+        results["lifespan_migrated_database"] = _summary([_seconds(LIFESPAN_SCRIPT, database_url)
+                                                           for _ in range(args.runs)])
+        results["create_all_boot"] = _summary([_seconds(CREATE_ALL_SCRIPT, database_url) for _ in range(args.runs)])
+    results["ready"] = time_to_ready(args.workers)
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
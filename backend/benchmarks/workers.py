@@ -0,0 +1,91 @@
+"""Throughput and latency of `python -m backend.serve` with 1, 2, 4 and 8 workers.
+
+    python -m backend.benchmarks.workers --workers 1,2,4,8 --duration 10 --concurrency 64
+
+Every worker count serves the same generated dataset. Each run drives three
+routes: a page of admin projects, which costs database and serialization CPU;
+`/api/auth/me`, which decodes a JWT and reads the user; and the cached public
+project list. Throughput only grows while there are idle CPUs, so compare the
+results with `cpus`.
+
+`--reload` then keeps the largest worker count under load for
+`--duration` seconds, sends SIGHUP to the supervisor a third of the way in, and
+counts failed requests during the rolling reload.
+"""
+import argparse
+import asyncio
+import os
+import signal
+
+import httpx
+
+from backend.serve import cpu_limit
+
+from .common import drive, report, run_server, temp_database_url, wait_until_workers_ready
+from .dataset import generate
+
+SCALE = {"users": 100, "categories": 20, "projects": 20_000, "customers": 1_000, "products": 1_000,
+         "tasks": 1_000, "documents": 1_000, "requests": 20_000}
+
+
+async def login(client) -> dict:
+    response = await client.post("/api/auth/login", data={"username": "root", "password": "root"})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_load(base_url, args):
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        headers = await login(client)
+        routes = [
+            ("/api/admin/projects", {"limit": 100}),
+            ("/api/auth/me", {}),
+            ("/api/public/projects", {"limit": 20}),
+        ]
+        return {path: await drive(client, "GET", path, args.duration, args.concurrency, headers=headers, params=params)
+                for path, params in routes}
+
+
+async def run_reload(base_url, args):
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        headers = await login(client)
+        supervisor = (await client.get("/api/health/workers")).json()["supervisor"]
+
+        async def reload():
+            await asyncio.sleep(args.duration / 3)
+            os.kill(supervisor["supervisor_pid"], signal.SIGHUP)
+
+        load = drive(client, "GET", "/api/admin/projects", args.duration, args.concurrency,
+                     headers=headers, params={"limit": 100})
+        result, _ = await asyncio.gather(load, reload())
+        after = (await client.get("/api/health/workers")).json()["supervisor"]
+        return {"generation": after["generation"], "workers": [w["state"] for w in after["workers"]], **result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--reload", action="store_true", help="Also measure errors during a rolling reload")
+    args = parser.parse_args()
+    counts = [int(n) for n in args.workers.split(",")]
+
+    results = {"cpus": cpu_limit(), "runs": []}
+    with temp_database_url() as database_url:
+        generate(database_url, SCALE)
+        for workers in counts:
+            with run_server(database_url=database_url, workers=workers) as base_url:
+                results["runs"].append({"workers": workers, "routes": asyncio.run(run_load(base_url, args))})
+        if args.reload:
+            workers = max(counts)
+            with run_server(database_url=database_url, workers=workers) as base_url:
+                results["reload"] = {"workers": workers, **asyncio.run(run_reload(base_url, args))}
+                wait_until_workers_ready(base_url, workers)
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Burst of public contact-request submissions against SQLite, per SQLite profile.
+
+    python -m backend.benchmarks.write_contention --workers 2 --concurrency 64
+
+With SQLITE_PROFILE=default concurrent writers collide on the database lock
+(500s from "database is locked"); the production profile queues them on the
+single writer connection instead.
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from .common import run_server, temp_database_url, drive, report
+
+PAYLOAD = {
+    "name": "Bench",
+    "email": "bench@example.com",
+    "reason": "offer",
+    "message": "Load test submission " * 10,
+}
+
+
+async def run_load(base_url, duration, concurrency):
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        return await drive(client, "POST", "/api/contact/requests", duration, concurrency, json=PAYLOAD)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", default="default,production")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    results = []
+    for profile in args.profiles.split(","):
+        env = {"SQLITE_PROFILE": profile}
+        with temp_database_url() as database_url:
+            with run_server(env, database_url=database_url, args=["--workers", str(args.workers)],
+                            quiet=True) as base_url:
+                result = asyncio.run(run_load(base_url, args.duration, args.concurrency))
+        results.append({"sqlite_profile": profile, "workers": args.workers, **result})
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""Bulk import of JSON arrays, NDJSON or CSV request bodies.
+
+Records are parsed from the body as it streams in, validated in chunks of
+`batch_size` and inserted with one executemany per chunk, all inside a single
+transaction that is committed at the end. Each chunk runs in a SAVEPOINT; if
+the database rejects it (a foreign key, NOT NULL or CHECK constraint, or a
+unique value another writer inserted meanwhile), the chunk is rolled back to
+the savepoint and inserted row by row, each row in its own savepoint. Rows
+that fail parsing, validation, a unique-column check or a constraint are
+reported by row number and skipped; the rest of the import goes through.
+
+`update_by_ids` / `delete_by_ids` change many rows by primary key with one
+set-based statement per chunk of ids instead of a load-modify-flush per row.
+"""
+from collections import deque
+from typing import AsyncIterator, Dict, List, Tuple, Type, Union
+import codecs
+import csv
+import json
+import os
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "1000"))
+# Per-row errors echoed back in the response; the failed count is always exact
+MAX_REPORTED_ERRORS = 1000
+
+
+async def _lines(request: Request, keepends: bool = False) -> AsyncIterator[str]:
+    # utf-8-sig drops the byte order mark spreadsheet programs put in front of CSV exports
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in request.stream():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line + "\n" if keepends else line
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+class _PendingLines:
+    """The input of a csv.reader that is only advanced once a whole record has arrived."""
+
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def _csv_records(request: Request) -> AsyncIterator[Union[List[str], str]]:
+    """Yield the records of a streamed CSV body, or an error message string.
+
+    Quoted fields may span lines, e.g. multi-line descriptions: lines are
+    held back while a quote is open, and one csv.reader parses the body.
+    """
+    pending = _PendingLines()
+    reader = csv.reader(pending)
+    quoted = False
+    async for line in _lines(request, keepends=True):
+        pending.lines.append(line)
+        # Quotes come in pairs, "" included, so an odd count opens or closes a quoted field
+        if line.count('"') % 2:
+            quoted = not quoted
+        if quoted:
+            continue
+        try:
+            yield next(reader)
+        except csv.Error as e:
+            yield f"Invalid CSV: {e}"
+    if quoted:
+        pending.lines.clear()
+        yield "Invalid CSV: unterminated quoted field"
+
+
+async def iter_records(request: Request) -> AsyncIterator[Tuple[int, object]]:
+    """Yield `(row_number, record)`; `record` is a dict, or an error message string."""
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip()
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        row = 0
+        async for line in _lines(request):
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                yield row, json.loads(line)
+            except ValueError as e:
+                yield row, f"Invalid JSON: {e}"
+    elif content_type == "text/csv":
+        header = None
+        row = 0
+        async for values in _csv_records(request):
+            # Blank lines
+            if not values:
+                continue
+            if header is None and not isinstance(values, str):
+                header = [name.strip() for name in values]
+                continue
+            row += 1
+            if isinstance(values, str):
+                yield row, values
+                continue
+            if len(values) != len(header):
+                yield row, f"Expected {len(header)} columns, got {len(values)}"
+                continue
+            # Empty CSV cells mean "not set"
+            yield row, {name: value for name, value in zip(header, values) if value != ""}
+    elif content_type == "application/json":
+        try:
+            records = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(records, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array")
+        for row, record in enumerate(records, start=1):
+            yield row, record
+    else:
+        raise HTTPException(
+            status_code=415, detail="Use application/json, application/x-ndjson or text/csv"
+        )
+
+
+def _unique_columns(model) -> List:
+    return [column for column in model.__table__.columns if column.unique and not column.primary_key]
+
+
+class BulkImport:
+    def __init__(self, db, model, create_schema: Type[BaseModel], batch_size: int):
+        self.db = db
+        self.model = model
+        self.create_schema = create_schema
+        self.batch_size = batch_size
+        self.unique_columns = _unique_columns(model)
+        self.seen: Dict[str, set] = {column.key: set() for column in self.unique_columns}
+        # A Core insert, so RoutingSession sees the statement and sends it to the writer
+        self._statement = insert(model.__table__)
+        self._begun = False
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+
+    def _fail(self, row: int, error):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "errors": error})
+
+    async def _drop_duplicates(self, batch: List[Tuple[int, dict]]) -> List[Tuple[int, dict]]:
+        for column in self.unique_columns:
+            values = [values[column.key] for _, values in batch if values.get(column.key) is not None]
+            if not values:
+                continue
+            existing = set((await self.db.execute(select(column).where(column.in_(values)))).scalars().all())
+            kept = []
+            for row, values in batch:
+                value = values.get(column.key)
+                if value is not None and (value in existing or value in self.seen[column.key]):
+                    self._fail(row, f"Duplicate {column.key} '{value}'")
+                    continue
+                if value is not None:
+                    self.seen[column.key].add(value)
+                kept.append((row, values))
+            batch = kept
+        return batch
+
+    async def _flush(self, batch: List[Tuple[int, object]]):
+        valid = []
+        for row, record in batch:
+            if isinstance(record, str):
+                self._fail(row, record)
+                continue
+            try:
+                valid.append((row, self.create_schema.model_validate(record).model_dump()))
+            except ValidationError as e:
+                self._fail(row, e.errors(include_url=False, include_context=False))
+        valid = await self._drop_duplicates(valid)
+        if valid:
+            self.inserted += await self.db.run_sync(self._insert, valid)
+
+    def _begin(self, session):
+        if self._begun:
+            return
+        self._begun = True
+        connection = session.connection(bind_arguments={"clause": self._statement})
+        if connection.dialect.name == "sqlite":
+            # pysqlite only opens a transaction in front of INSERT/UPDATE/DELETE, so a
+            # leading SAVEPOINT would open its own and its RELEASE would commit the chunk
+            connection.exec_driver_sql("BEGIN")
+
+    def _insert(self, session, rows: List[Tuple[int, dict]]) -> int:
+        """Insert `rows` with one executemany, or one by one if the database rejects that."""
+        self._begin(session)
+        try:
+            with session.begin_nested():
+                session.execute(self._statement, [values for _, values in rows])
+            return len(rows)
+        except IntegrityError:
+            pass
+        inserted = 0
+        for row, values in rows:
+            try:
+                with session.begin_nested():
+                    session.execute(self._statement, values)
+                inserted += 1
+            except IntegrityError as e:
+                self._fail(row, str(e.orig))
+        return inserted
+
+    async def run(self, records: AsyncIterator[Tuple[int, object]]) -> dict:
+        batch = []
+        try:
+            async for row, record in records:
+                batch.append((row, record))
+                if len(batch) >= self.batch_size:
+                    await self._flush(batch)
+                    batch = []
+            if batch:
+                await self._flush(batch)
+            await self.db.commit()
+        except IntegrityError as e:
+            # Constraints checked at commit, e.g. deferred foreign keys on Postgres
+            await self.db.rollback()
+            raise HTTPException(status_code=409, detail=f"Import rolled back: {e.orig}")
+        return {"inserted": self.inserted, "failed": self.failed, "errors": self.errors}
+
+
+async def bulk_insert(db, request: Request, model, create_schema: Type[BaseModel], batch_size: int) -> dict:
+    return await BulkImport(db, model, create_schema, batch_size).run(iter_records(request))
+
+
+def _id_chunks(ids: List[int]):
+    ids = list(dict.fromkeys(ids))
+    for start in range(0, len(ids), BULK_BATCH_SIZE):
+        yield ids[start:start + BULK_BATCH_SIZE]
+
+
+async def update_by_ids(db, model, ids: List[int], values: dict) -> int:
+    """Set `values` on every row in `ids`; returns the number of rows matched."""
+    if not values:
+        return 0
+    count = 0
+    for chunk in _id_chunks(ids):
+        stmt = update(model).where(model.id.in_(chunk)).values(**values)
+        result = await db.execute(stmt.execution_options(synchronize_session=False))
+        count += result.rowcount
+    await db.commit()
+    return count
+
+
+async def delete_by_ids(db, model, ids: List[int]) -> int:
+    count = 0
+    for chunk in _id_chunks(ids):
+        stmt = delete(model).where(model.id.in_(chunk))
+        result = await db.execute(stmt.execution_options(synchronize_session=False))
+        count += result.rowcount
+    await db.commit()
+    return count
@@ -1,9 +1,7 @@
-from .database import SessionLocal, engine, Base
+from .database import SessionLocal
 from . import models
 from . import utils
-
-# Create tables
-models.Base.metadata.create_all(bind=engine)
+from . import migrations
 
 def create_users():
     db = SessionLocal()
@@ -56,4 +54,5 @@ def create_users():
         db.close()
 
 if __name__ == "__main__":
+    migrations.upgrade()
     create_users()
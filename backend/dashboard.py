@@ -0,0 +1,261 @@
+"""Admin dashboard counts: projects by status and year, contact requests by
+status, tasks by status and priority.
+
+`dashboard_counters` holds one row per (entity, column, value) with the number
+of rows carrying that value. Triggers on the counted tables update it in the
+same transaction as every insert, delete and update of a counted column,
+including the Core statements of the bulk routes and the contact write-behind.
+Reading the dashboard therefore costs one small SELECT, independent of the
+table sizes. NULL values are counted under "".
+
+The counters are experimental and off by default (DASHBOARD_COUNTERS=0): every
+write to a counted table updates the same few counter rows, which serializes
+concurrent writers on Postgres, and the Postgres triggers have not run in CI.
+Without them the counts come from one `GROUP BY` pass per table. With
+DASHBOARD_COUNTERS=1 the schema hooks (`after_create`, migrations 4 and 6)
+install the triggers and fill the counters from the existing rows; with 0
+they drop the triggers again. Switching an already migrated database:
+
+    python -m backend.dashboard install     # create the triggers and count the rows
+    python -m backend.dashboard uninstall   # drop the triggers
+    python -m backend.dashboard verify      # compare the counters with GROUP BY; exit 1 on drift
+    python -m backend.dashboard rebuild     # recount from scratch, e.g. after restoring a dump
+"""
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import argparse
+import os
+import sys
+
+from sqlalchemy import String, bindparam, cast, delete, event, func, insert, select, text
+
+from . import models
+from .database import Base
+
+DASHBOARD_COUNTERS = os.getenv("DASHBOARD_COUNTERS", "0") == "1"
+
+# Counted columns per dashboard entity
+COUNTERS = {
+    "projects": (models.AdminProject.__table__, ("status", "year")),
+    "requests": (models.ContactRequest.__table__, ("status",)),
+    "tasks": (models.Aufgabe.__table__, ("status", "prioritaet")),
+}
+
+counters = models.DashboardCounter.__table__
+
+
+def _trigger_name(table) -> str:
+    return f"{table.name}_dashboard"
+
+
+def _bump(entity: str, field: str, row: str, delta: int, guard: str = "1 = 1") -> str:
+    """Add `delta` to the counter of `row.field` (`row` is NEW or OLD) when `guard` holds."""
+    return (
+        f"INSERT INTO {counters.name} (entity, field, value, row_count) "
+        f"SELECT '{entity}', '{field}', coalesce(CAST({row}.{field} AS TEXT), ''), {delta} WHERE {guard} "
+        f"ON CONFLICT (entity, field, value) DO UPDATE SET row_count = {counters.name}.row_count + excluded.row_count"
+    )
+
+
+def _changed(dialect: str, field: str) -> str:
+    operator = "IS NOT" if dialect == "sqlite" else "IS DISTINCT FROM"
+    return f"OLD.{field} {operator} NEW.{field}"
+
+
+def _sqlite_ddl(entity: str) -> List[str]:
+    table, fields = COUNTERS[entity]
+    name = _trigger_name(table)
+    inserted = "; ".join(_bump(entity, field, "NEW", 1) for field in fields)
+    deleted = "; ".join(_bump(entity, field, "OLD", -1) for field in fields)
+    updated = "; ".join(
+        f"{_bump(entity, field, 'OLD', -1, _changed('sqlite', field))}; "
+        f"{_bump(entity, field, 'NEW', 1, _changed('sqlite', field))}"
+        for field in fields
+    )
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {name}_ai AFTER INSERT ON {table.name} BEGIN {inserted}; END",
+        f"CREATE TRIGGER IF NOT EXISTS {name}_ad AFTER DELETE ON {table.name} BEGIN {deleted}; END",
+        # Only edits of counted columns fire, and unchanged columns are skipped
+        f"CREATE TRIGGER IF NOT EXISTS {name}_au AFTER UPDATE OF {', '.join(fields)} ON {table.name} "
+        f"BEGIN {updated}; END",
+    ]
+
+
+def _pg_ddl(entity: str) -> List[str]:
+    table, fields = COUNTERS[entity]
+    name = _trigger_name(table)
+    inserted = "; ".join(_bump(entity, field, "NEW", 1) for field in fields)
+    deleted = "; ".join(_bump(entity, field, "OLD", -1) for field in fields)
+    updated = "; ".join(
+        f"{_bump(entity, field, 'OLD', -1, _changed('postgresql', field))}; "
+        f"{_bump(entity, field, 'NEW', 1, _changed('postgresql', field))}"
+        for field in fields
+    )
+    return [
+        f"CREATE OR REPLACE FUNCTION {name}() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+        f"IF TG_OP = 'INSERT' THEN {inserted}; "
+        f"ELSIF TG_OP = 'DELETE' THEN {deleted}; "
+        f"ELSE {updated}; END IF; RETURN NULL; END $$",
+        f"DROP TRIGGER IF EXISTS {name} ON {table.name}",
+        f"CREATE TRIGGER {name} AFTER INSERT OR DELETE OR UPDATE OF {', '.join(fields)} ON {table.name} "
+        f"FOR EACH ROW EXECUTE FUNCTION {name}()",
+    ]
+
+
+def _installed(connection) -> bool:
+    names = [_trigger_name(table) for table, _ in COUNTERS.values()]
+    if connection.dialect.name == "sqlite":
+        names = [f"{name}_{suffix}" for name in names for suffix in ("ai", "ad", "au")]
+        statement = text("SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name IN :names")
+    else:
+        statement = text("SELECT count(*) FROM pg_trigger WHERE tgname IN :names")
+    statement = statement.bindparams(bindparam("names", expanding=True))
+    return connection.execute(statement, {"names": names}).scalar() == len(names)
+
+
+def _lock_tables(connection):
+    """Keep writers out while counting; SQLite callers already hold the write lock."""
+    if connection.dialect.name == "postgresql":
+        tables = ", ".join(table.name for table, _ in COUNTERS.values())
+        connection.execute(text(f"LOCK TABLE {tables} IN SHARE MODE"))
+
+
+def _group_statement(entity: str):
+    """One pass over the entity's table, grouped by all of its counted columns."""
+    table, fields = COUNTERS[entity]
+    columns = [func.coalesce(cast(table.c[field], String), "").label(field) for field in fields]
+    return select(*columns, func.count().label("row_count")).group_by(*columns)
+
+
+def _tally(rows, fields) -> Dict[str, Dict[str, int]]:
+    tally = {field: {} for field in fields}
+    for row in rows:
+        for field in fields:
+            value = row._mapping[field]
+            tally[field][value] = tally[field].get(value, 0) + row.row_count
+    return tally
+
+
+def install(connection):
+    """Create the counter table and its triggers if missing; new triggers start from a full recount."""
+    counters.create(bind=connection, checkfirst=True)
+    dialect = connection.dialect.name
+    if dialect not in ("sqlite", "postgresql") or _installed(connection):
+        return
+    _lock_tables(connection)
+    for entity in COUNTERS:
+        for statement in (_sqlite_ddl(entity) if dialect == "sqlite" else _pg_ddl(entity)):
+            connection.execute(text(statement))
+    rebuild(connection)
+
+
+def uninstall(connection):
+    """Drop the triggers; the counter table stays, and goes stale until the next install."""
+    dialect = connection.dialect.name
+    for table, _ in COUNTERS.values():
+        name = _trigger_name(table)
+        if dialect == "sqlite":
+            for suffix in ("ai", "ad", "au"):
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {name}_{suffix}"))
+        elif dialect == "postgresql":
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {name} ON {table.name}"))
+            connection.execute(text(f"DROP FUNCTION IF EXISTS {name}()"))
+
+
+def configure(connection, enabled: Optional[bool] = None):
+    """Install the triggers when the counters are enabled (default: DASHBOARD_COUNTERS), drop them otherwise."""
+    if DASHBOARD_COUNTERS if enabled is None else enabled:
+        install(connection)
+    else:
+        counters.create(bind=connection, checkfirst=True)
+        uninstall(connection)
+
+
+def rebuild(connection):
+    """Replace all counters with a fresh count of the tables."""
+    _lock_tables(connection)
+    connection.execute(delete(counters))
+    for entity, (_, fields) in COUNTERS.items():
+        tally = _tally(connection.execute(_group_statement(entity)).all(), fields)
+        rows = [{"entity": entity, "field": field, "value": value, "row_count": count}
+                for field, values in tally.items() for value, count in values.items()]
+        if rows:
+            connection.execute(insert(counters), rows)
+
+
+def verify(connection) -> List[dict]:
+    """Counters that differ from a fresh count, as {entity, field, value, counter, actual}."""
+    _lock_tables(connection)
+    actual = {}
+    for entity, (_, fields) in COUNTERS.items():
+        for field, values in _tally(connection.execute(_group_statement(entity)).all(), fields).items():
+            for value, count in values.items():
+                actual[(entity, field, value)] = count
+    stored = {(row.entity, row.field, row.value): row.row_count
+              for row in connection.execute(select(counters).where(counters.c.row_count != 0))}
+    return [
+        {"entity": entity, "field": field, "value": value,
+         "counter": stored.get((entity, field, value), 0), "actual": actual.get((entity, field, value), 0)}
+        for entity, field, value in sorted(set(actual) | set(stored))
+        if stored.get((entity, field, value), 0) != actual.get((entity, field, value), 0)
+    ]
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_after_create(target, connection, **kw):
+    configure(connection)
+
+
+async def counts(db, source: Optional[str] = None) -> dict:
+    """The dashboard from the counters, or from GROUP BY queries with `source="query"`."""
+    source = source or ("counters" if DASHBOARD_COUNTERS else "query")
+    if source == "counters":
+        tallies = {entity: {field: {} for field in fields} for entity, (_, fields) in COUNTERS.items()}
+        rows = (await db.execute(select(counters).where(counters.c.row_count != 0))).all()
+        for row in rows:
+            tally = tallies.get(row.entity, {}).get(row.field)
+            if tally is not None:
+                tally[row.value] = row.row_count
+    else:
+        tallies = {}
+        for entity, (_, fields) in COUNTERS.items():
+            tallies[entity] = _tally((await db.execute(_group_statement(entity))).all(), fields)
+    # Every row has exactly one value of each counted column
+    totals = {entity: sum(tallies[entity][fields[0]].values()) for entity, (_, fields) in COUNTERS.items()}
+    return {"source": source, "totals": totals, **tallies}
+
+
+@contextmanager
+def _write_locked(engine):
+    with engine.connect() as connection:
+        if connection.dialect.name == "sqlite":
+            # Taken up front, so no write lands between the count and the comparison
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        yield connection
+        connection.commit()
+
+
+if __name__ == "__main__":
+    from .database import engine, writer_engine
+
+    parser = argparse.ArgumentParser(description="Maintain the admin dashboard counters")
+    parser.add_argument("command", choices=["install", "uninstall", "verify", "rebuild"])
+    args = parser.parse_args()
+    with _write_locked(writer_engine or engine) as connection:
+        if args.command == "install":
+            install(connection)
+            print("Dashboard counters installed; set DASHBOARD_COUNTERS=1 to read them.")
+        elif args.command == "uninstall":
+            uninstall(connection)
+            print("Dashboard triggers dropped.")
+        elif args.command == "rebuild":
+            install(connection)
+            rebuild(connection)
+            print("Dashboard counters rebuilt.")
+        else:
+            drift = verify(connection)
+            for row in drift:
+                print(f"{row['entity']}.{row['field']}={row['value']!r}: counter {row['counter']}, actual {row['actual']}")
+            print("Dashboard counters match." if not drift else f"{len(drift)} counters differ; run rebuild.")
+    if args.command == "verify" and drift:
+        sys.exit(1)
@@ -1,19 +1,282 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import FrozenResult
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.dml import UpdateBase
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from typing import Optional
+import asyncio
 import os
+from . import metrics, pool_stats, profiling
 
 # Use SQLite for local development, can be overridden by env var for Postgres
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sql_app.db")
+# "async" serves routers from an AsyncEngine, "sync" from the sync engine via the threadpool
+DATABASE_MODE = os.getenv("DATABASE_MODE", "async")
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+# SQLite performance profile: "production" enables WAL, the pragmas below and a
+# single serialized writer connection; "default" leaves SQLite as configured.
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production")
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    # Negative values are KiB, so -65536 is a 64 MiB page cache per connection
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),
+    "temp_store": "MEMORY",
+}
+SQLITE_CHECKPOINT_INTERVAL = float(os.getenv("SQLITE_CHECKPOINT_INTERVAL", "300"))
+SQLITE_WRITER_TIMEOUT = float(os.getenv("SQLITE_WRITER_TIMEOUT", "30"))
+
+# Connection pool (ignored for in-memory SQLite, which needs a single shared connection)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Seconds after which a connection is replaced, before the server or a proxy drops it
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+IS_MEMORY_SQLITE = IS_SQLITE and (
+    ":memory:" in DATABASE_URL or DATABASE_URL.rstrip("/") in ("sqlite:", "sqlite+pysqlite:")
 )
+SQLITE_TUNED = IS_SQLITE and not IS_MEMORY_SQLITE and SQLITE_PROFILE == "production"
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def _pool_options(name: str, use_async: bool = False, **overrides) -> dict:
+    if IS_MEMORY_SQLITE:
+        return {}
+    options = {
+        "poolclass": pool_stats.TimedAsyncAdaptedQueuePool if use_async else pool_stats.TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_logging_name": name,
+    }
+    options.update(overrides)
+    return options
+
+def _setup_engine(sync_engine, name: str):
+    metrics.instrument_engine(sync_engine)
+    if SQLITE_TUNED:
+        event.listen(sync_engine, "connect", _apply_sqlite_pragmas)
+    if not IS_MEMORY_SQLITE:
+        pool_stats.instrument(sync_engine, name)
+
+def _create_engine(url: str, name: str, **pool_overrides):
+    kwargs = _pool_options(name, **pool_overrides)
+    if IS_SQLITE:
+        kwargs["connect_args"] = {"check_same_thread": False}
+    new_engine = create_engine(url, **kwargs)
+    _setup_engine(new_engine, name)
+    return new_engine
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Writers get a single connection, so concurrent writers queue on the pool instead of
+# failing with "database is locked"
+WRITER_POOL = {"pool_size": 1, "max_overflow": 0, "pool_timeout": SQLITE_WRITER_TIMEOUT}
+
+engine = _create_engine(DATABASE_URL, "sync")
+writer_engine = _create_engine(DATABASE_URL, "sync_writer", **WRITER_POOL) if SQLITE_TUNED else None
+
+class RoutingSession(Session):
+    """Sends flushes and INSERT/UPDATE/DELETE to `info["writer"]`, reads to the session bind."""
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        writer = self.info.get("writer")
+        if writer is not None and (self._flushing or isinstance(clause, UpdateBase)):
+            return writer
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine, class_=RoutingSession, info={"writer": writer_engine}
+)
 
 Base = declarative_base()
 
+def get_async_database_url(url: str) -> str:
+    """Map a sync database URL to its asyncio driver (aiosqlite / asyncpg)."""
+    scheme, _, rest = url.partition("://")
+    driver = scheme.split("+")[0]
+    if driver == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if driver in ("postgres", "postgresql"):
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+async_engine = None
+async_writer_engine = None
+AsyncSessionLocal = None
+if DATABASE_MODE == "async":
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    # An explicit queue pool also replaces aiosqlite's NullPool default, keeping
+    # tuned SQLite connections (mmap, page cache) alive between requests
+    async_engine = create_async_engine(
+        get_async_database_url(DATABASE_URL), **_pool_options("async", use_async=True)
+    )
+    _setup_engine(async_engine.sync_engine, "async")
+    if SQLITE_TUNED:
+        async_writer_engine = create_async_engine(
+            get_async_database_url(DATABASE_URL), **_pool_options("async_writer", use_async=True, **WRITER_POOL)
+        )
+        _setup_engine(async_writer_engine.sync_engine, "async_writer")
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine,
+        autoflush=False,
+        expire_on_commit=False,
+        sync_session_class=RoutingSession,
+        info={"writer": async_writer_engine.sync_engine if async_writer_engine is not None else None},
+    )
+
+def checkpoint_wal():
+    with engine.connect() as conn:
+        conn.execute(text("PRAGMA wal_checkpoint(PASSIVE)"))
+
+async def run_wal_checkpoints():
+    """Background task: fold the WAL back into the main database file periodically."""
+    while True:
+        await asyncio.sleep(SQLITE_CHECKPOINT_INTERVAL)
+        try:
+            await run_in_threadpool(checkpoint_wal)
+        except Exception as e:
+            print(f"Error checkpointing WAL: {e}")
+
+async def dispose_engines():
+    for sync_engine in (engine, writer_engine):
+        if sync_engine is not None:
+            sync_engine.dispose()
+    for aengine in (async_engine, async_writer_engine):
+        if aengine is not None:
+            await aengine.dispose()
+
+def reset_after_fork():
+    """Drop pooled connections inherited from the parent process without closing them."""
+    for sync_engine in (engine, writer_engine):
+        if sync_engine is not None:
+            sync_engine.dispose(close=False)
+    for aengine in (async_engine, async_writer_engine):
+        if aengine is not None:
+            aengine.sync_engine.dispose(close=False)
+
+def _pool_capacity(pool) -> Optional[int]:
+    if isinstance(pool, QueuePool) and pool._max_overflow >= 0:
+        return pool.size() + pool._max_overflow
+    return None
+
+_session_slots: Optional[asyncio.Semaphore] = None
+
+def _get_session_slots() -> Optional[asyncio.Semaphore]:
+    global _session_slots
+    capacity = _pool_capacity(engine.pool)
+    if _session_slots is None and capacity is not None:
+        _session_slots = asyncio.Semaphore(capacity)
+    return _session_slots
+
+class SyncSessionAdapter:
+    """A sync Session with the AsyncSession call style.
+
+    Used when DATABASE_MODE=sync so routers can be written once against the
+    async API; every call that touches the database runs in the threadpool.
+    A session waits for a pool slot on the event loop before its first query,
+    so threadpool workers never block on a pool checkout while the sessions
+    holding the connections wait for a worker to finish.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+        self._slot = None
+
+    async def _acquire_slot(self):
+        if self._slot is None:
+            slots = _get_session_slots()
+            if slots is not None:
+                await slots.acquire()
+                self._slot = slots
+
+    async def _run(self, fn, *args, **kwargs):
+        await self._acquire_slot()
+        return await run_in_threadpool(profiling.traced(fn), *args, **kwargs)
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    def get_bind(self):
+        return self.sync_session.get_bind()
+
+    async def execute(self, statement, *args, **kwargs):
+        # Buffer the rows in the worker thread, as AsyncSession does
+        def run():
+            result = self.sync_session.execute(statement, *args, **kwargs)
+            if not getattr(result._metadata, "returns_rows", True):
+                return result
+            return result.freeze()
+        result = await self._run(run)
+        # INSERT/UPDATE/DELETE results carry no rows, only rowcount
+        return result() if isinstance(result, FrozenResult) else result
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await self._run(self.sync_session.scalar, statement, *args, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await self._run(self.sync_session.get, entity, ident, **kwargs)
+
+    async def refresh(self, instance, attribute_names=None):
+        await self._run(self.sync_session.refresh, instance, attribute_names)
+
+    async def delete(self, instance):
+        await self._run(self.sync_session.delete, instance)
+
+    async def flush(self):
+        await self._run(self.sync_session.flush)
+
+    async def commit(self):
+        await self._run(self.sync_session.commit)
+
+    async def rollback(self):
+        await self._run(self.sync_session.rollback)
+
+    async def close(self):
+        try:
+            await run_in_threadpool(self.sync_session.close)
+        finally:
+            if self._slot is not None:
+                self._slot.release()
+                self._slot = None
+
+    async def stream(self, statement, *args, **kwargs):
+        result = await self._run(self.sync_session.execute, statement, *args, **kwargs)
+        return _ThreadedStreamResult(result)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await self._run(fn, self.sync_session, *args, **kwargs)
+
+class _ThreadedStreamResult:
+    """The `AsyncResult.partitions()` part of a sync Result, fetching in the threadpool."""
+
+    def __init__(self, result):
+        self._result = result
+
+    async def partitions(self, size=None):
+        partitions = self._result.partitions(size)
+        while True:
+            rows = await run_in_threadpool(next, partitions, None)
+            if rows is None:
+                return
+            yield rows
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -21,3 +284,20 @@ def get_db():
         yield db
     finally:
         db.close()
+
+@asynccontextmanager
+async def async_session():
+    """A session in the configured DATABASE_MODE, for work outside a request's dependency scope."""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SyncSessionAdapter(SessionLocal(expire_on_commit=False))
+        try:
+            yield db
+        finally:
+            await db.close()
+
+async def get_async_db():
+    async with async_session() as db:
+        yield db
@@ -0,0 +1,132 @@
+"""Streaming CSV / NDJSON exports.
+
+Exports select plain columns (no ORM objects, no response models) and stream
+the result with `yield_per`, so rows are fetched from a server-side cursor in
+chunks of `EXPORT_CHUNK_SIZE` and encoded chunk by chunk. Memory use depends on
+the chunk size, not on the table size. The response is gzip-compressed on the
+fly when the client accepts it.
+
+Streaming outlives the request's dependencies, so the generator opens its own
+session with `database.async_session()`.
+"""
+from datetime import date, datetime
+from typing import Optional
+import csv
+import io
+import json
+import os
+import zlib
+
+from fastapi import Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from . import database, models
+from .filters import datetime_bound
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+
+# Column used by the date_from / date_to filters
+DATE_COLUMNS = {
+    models.ContactRequest: models.ContactRequest.created_at,
+    models.AdminProject: models.AdminProject.end_date,
+}
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+class ExportParams:
+    def __init__(
+        self,
+        format: str = Query("csv", pattern="^(csv|ndjson)$"),
+        status: Optional[str] = Query(None),
+        category_id: Optional[int] = Query(None),
+        date_from: Optional[datetime] = Query(None, description="Inclusive lower bound"),
+        date_to: Optional[datetime] = Query(None, description="Exclusive upper bound"),
+    ):
+        self.format = format
+        self.status = status
+        self.category_id = category_id
+        self.date_from = date_from
+        self.date_to = date_to
+
+
+def export_statement(model, columns, params: ExportParams, dialect_name: str):
+    """`select(*columns)` plus the category name, filtered by `params` and ordered by id."""
+    stmt = (
+        select(*columns, models.Category.name.label("category"))
+        .outerjoin(models.Category, model.category_id == models.Category.id)
+        .order_by(model.id)
+    )
+    if params.status is not None:
+        stmt = stmt.where(model.status == params.status)
+    if params.category_id is not None:
+        stmt = stmt.where(model.category_id == params.category_id)
+    date_column = DATE_COLUMNS[model]
+    if params.date_from is not None:
+        stmt = stmt.where(date_column >= datetime_bound(date_column, params.date_from, dialect_name))
+    if params.date_to is not None:
+        stmt = stmt.where(date_column < datetime_bound(date_column, params.date_to, dialect_name))
+    return stmt
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _encode_csv(rows, header=None) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header is not None:
+        writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def _encode_ndjson(rows) -> bytes:
+    return "".join(
+        json.dumps(dict(row._mapping), default=_json_default, separators=(",", ":")) + "\n"
+        for row in rows
+    ).encode()
+
+
+async def _stream(stmt, fmt: str):
+    async with database.async_session() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        if fmt == "csv":
+            # The header goes out even when no row matches
+            yield _encode_csv([], [column.name for column in stmt.selected_columns])
+        async for rows in result.partitions():
+            yield _encode_csv(rows) if fmt == "csv" else _encode_ndjson(rows)
+
+
+async def _gzip(chunks):
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        # Sync flush so every chunk reaches the client as soon as it is encoded
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def accepts_gzip(request: Request) -> bool:
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def stream_export(request: Request, model, columns, params: ExportParams, filename: str) -> StreamingResponse:
+    stmt = export_statement(model, columns, params, database.engine.dialect.name)
+    body = _stream(stmt, params.format)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}.{params.format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if accepts_gzip(request):
+        body = _gzip(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=MEDIA_TYPES[params.format], headers=headers)
@@ -0,0 +1,100 @@
+"""Sparse fieldsets for the list endpoints.
+
+`fields=name,year,color` limits every item to those fields of the route's
+response schema; `id` is always returned. Embedded objects such as a
+project's category are left out then unless asked for with
+`include=category`. Without `fields`, `include` picks which embedded objects
+come along with all columns.
+
+The requested fields become a pydantic model generated from the response
+schema, and the query only selects their columns. The Core row path
+(`serialization.list_response`) selects nothing else. The ORM path uses
+`load_options`, so every other column, such as a project's `description`,
+stays deferred and is never read from the database.
+"""
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union
+
+from fastapi import HTTPException, Query
+from pydantic import ConfigDict, create_model
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, selectinload
+
+from . import schemas
+
+
+class FieldParams:
+    def __init__(
+        self,
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return; `id` is always included"),
+        include: Optional[str] = Query(None, description="Comma-separated embedded objects to return, e.g. `category`"),
+    ):
+        self.fields = _split(fields)
+        self.include = _split(include)
+
+    def schema(self, schema, model):
+        """`schema` reduced to the requested fields, or `schema` itself when nothing was requested."""
+        if self.fields is None and self.include is None:
+            return schema
+        return projected_schema(schema, model, self.fields, self.include)
+
+
+def _split(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    if value is None:
+        return None
+    return tuple(sorted({name.strip() for name in value.split(",") if name.strip()}))
+
+
+def _check(requested, allowed, parameter: str):
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported {parameter} '{', '.join(unknown)}', use any of: {', '.join(allowed)}",
+        )
+
+
+@lru_cache(maxsize=256)
+def projected_schema(schema, model, fields: Optional[Tuple[str, ...]], include: Optional[Tuple[str, ...]]):
+    """A model with the `fields` columns and `include` relationships of `schema`, in its field order."""
+    mapper = inspect(model)
+    columns = [name for name in schema.model_fields if name in mapper.columns]
+    relationships = [name for name in schema.model_fields if name in mapper.relationships]
+    if fields is not None:
+        _check(fields, columns, "field")
+    if include is not None:
+        _check(include, relationships, "include")
+
+    keep = set(columns if fields is None else fields) | {"id"}
+    if include is not None:
+        keep |= set(include)
+    elif fields is None:
+        keep |= set(relationships)
+    definitions = {
+        name: (field.annotation, field)
+        for name, field in schema.model_fields.items() if name in keep
+    }
+    return create_model(f"{schema.__name__}Fields", __config__=ConfigDict(from_attributes=True), **definitions)
+
+
+@lru_cache(maxsize=256)
+def list_type(schema):
+    """The response type of a list route returning `schema` items."""
+    return Union[List[schema], schemas.Page[schema]]
+
+
+def load_options(model, schema, extra=()):
+    """Loader options reading only the columns and relationships `schema` exposes.
+
+    `extra` columns are loaded as well, e.g. the sort key a cursor is built from.
+    """
+    mapper = inspect(model)
+    columns = [mapper.columns[name] for name in schema.model_fields if name in mapper.columns]
+    relationships = [mapper.relationships[name] for name in schema.model_fields if name in mapper.relationships]
+    # A many-to-one is loaded by its foreign key, which has to be there
+    columns += [column for rel in relationships for column in rel.local_columns]
+    columns += list(extra)
+    keys = dict.fromkeys(column.key for column in columns)
+    options = [load_only(*(getattr(model, key) for key in keys))]
+    options += [selectinload(getattr(model, rel.key)) for rel in relationships]
+    return tuple(options)
@@ -0,0 +1,90 @@
+"""Invalidation counters shared by the worker processes of `python -m backend.serve`.
+
+Caches tag each entry with the generation of its key and treat it as stale
+once the generation has moved on. In a single process the counters are a
+dict. Under `backend.serve` the supervisor creates SERVE_GENERATIONS_FILE
+and every worker maps it into memory, so a bump in one worker is seen by the
+next lookup in all of them.
+
+Keys are hashed onto GENERATION_SLOTS counters; keys sharing a slot only
+cause extra misses. Bumps lock the file for their read-modify-write, lookups
+read without locking.
+"""
+from hashlib import blake2b
+from typing import Dict, Optional
+import mmap
+import os
+import struct
+import threading
+
+GENERATION_SLOTS = 4096
+_COUNTER = struct.Struct("=Q")
+FILE_SIZE = GENERATION_SLOTS * _COUNTER.size
+
+
+def create_file(path: str):
+    """A file of zeroed counters, for the workers started after this call."""
+    with open(path, "wb") as f:
+        f.truncate(FILE_SIZE)
+
+
+def _offset(key: str) -> int:
+    slot = int.from_bytes(blake2b(key.encode(), digest_size=8).digest(), "little") % GENERATION_SLOTS
+    return slot * _COUNTER.size
+
+
+class Generations:
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._local: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+
+    def _shared(self) -> Optional[mmap.mmap]:
+        if not self.path:
+            return None
+        if self._pid != os.getpid():
+            # Opened per process: an flock belongs to the open file, which a fork would share
+            with self._lock:
+                if self._pid != os.getpid():
+                    try:
+                        self._file = open(self.path, "r+b")
+                        self._map = mmap.mmap(self._file.fileno(), FILE_SIZE)
+                    except (OSError, ValueError) as e:
+                        print(f"Error opening shared cache generations {self.path}: {e}")
+                        self.path = None
+                        return None
+                    self._pid = os.getpid()
+        return self._map
+
+    def get(self, key: str) -> int:
+        shared = self._shared()
+        if shared is None:
+            return self._local.get(key, 0)
+        return _COUNTER.unpack_from(shared, _offset(key))[0]
+
+    def bump(self, *keys: str):
+        shared = self._shared()
+        with self._lock:
+            if shared is None:
+                for key in keys:
+                    self._local[key] = self._local.get(key, 0) + 1
+                return
+            # Only reached under backend.serve, which is POSIX-only like fcntl
+            import fcntl
+
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            try:
+                for offset in {_offset(key) for key in keys}:
+                    _COUNTER.pack_into(shared, offset, _COUNTER.unpack_from(shared, offset)[0] + 1)
+            finally:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    @property
+    def shared(self) -> bool:
+        return self._shared() is not None
+
+
+generations = Generations(os.getenv("SERVE_GENERATIONS_FILE"))
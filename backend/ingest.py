@@ -0,0 +1,165 @@
+"""Write-behind queue for public contact-request submissions.
+
+With CONTACT_WRITE_BEHIND=1, `POST /api/contact/requests` validates the form,
+puts the row on a bounded in-process queue and answers 202 with the row's
+receipt, a random id generated up front and stored in the row's `receipt`
+column.
+A background task drains the queue in batches. Each batch is one
+multi-row INSERT and one commit (one fsync), written when it reaches
+INGEST_BATCH_SIZE rows or INGEST_FLUSH_MS after its first row. A full queue
+answers 503 with Retry-After. Shutdown stops accepting and writes out
+everything still queued, for at most INGEST_SHUTDOWN_TIMEOUT seconds.
+
+Rows get their numeric id only when their batch commits; until then the
+receipt is the only reference, and afterwards it finds the row, e.g. with
+`GET /api/contact/requests?receipt=...`.
+Rows queued in a process that is killed (not shut down) are lost.
+"""
+from typing import List, Optional
+import asyncio
+import os
+import time
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from . import database, models
+
+CONTACT_WRITE_BEHIND = os.getenv("CONTACT_WRITE_BEHIND", "0") == "1"
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+INGEST_FLUSH_MS = float(os.getenv("INGEST_FLUSH_MS", "50"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+INGEST_SHUTDOWN_TIMEOUT = float(os.getenv("INGEST_SHUTDOWN_TIMEOUT", "30"))
+# Attempts per batch before it is written row by row
+INGEST_RETRIES = 3
+
+
+class WriteBehindQueue:
+    def __init__(self, model, batch_size: int, flush_ms: float, max_queue: int):
+        self.model = model
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.accepting = False
+        self.accepted = 0
+        self.written = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+
+    def start(self):
+        self._queue = asyncio.Queue(self.max_queue)
+        self._task = asyncio.create_task(self._drain())
+        self.accepting = True
+
+    def submit(self, row: dict):
+        """Queue `row` for insertion."""
+        if not self.accepting:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server is shutting down")
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self.accepted += 1
+
+    async def _next_batch(self) -> List[dict]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            # Take whatever is already queued without waiting
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            remaining = deadline - time.monotonic()
+            if len(batch) >= self.batch_size or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _insert(self, rows: List[dict]):
+        async with database.async_session() as db:
+            try:
+                # A Core insert, so RoutingSession sends it to the SQLite writer
+                await db.execute(insert(self.model.__table__), rows)
+                await db.commit()
+            except BaseException:
+                await db.rollback()
+                raise
+
+    async def _write(self, batch: List[dict]):
+        for attempt in range(INGEST_RETRIES):
+            try:
+                await self._insert(batch)
+                self.written += len(batch)
+                self.batches += 1
+                return
+            except IntegrityError:
+                break
+            except Exception as e:
+                print(f"Error writing {len(batch)} queued contact requests (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(0.1 * 2 ** attempt)
+        # One bad row (or a persistent error) must not lose the rest of the batch
+        for row in batch:
+            try:
+                await self._insert([row])
+                self.written += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Dropped queued contact request from {row.get('email')!r}: {e}")
+
+    async def _drain(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def stop(self, timeout: float = INGEST_SHUTDOWN_TIMEOUT):
+        """Stop accepting submissions and write out everything already queued.
+
+        Gives up after `timeout` seconds, or at once if the drain task has died.
+        """
+        if self._task is None:
+            return
+        self.accepting = False
+        joined = asyncio.create_task(self._queue.join())
+        await asyncio.wait({joined, self._task}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if not joined.done():
+            joined.cancel()
+            print(f"Error writing queued contact requests on shutdown: {self._queue.qsize()} still queued")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Error in contact request write-behind queue: {e}")
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self._task is not None,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.max_queue,
+            "batch_size": self.batch_size,
+            "accepted": self.accepted,
+            "written": self.written,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "batches": self.batches,
+        }
+
+
+contact_queue = WriteBehindQueue(models.ContactRequest, INGEST_BATCH_SIZE, INGEST_FLUSH_MS, INGEST_QUEUE_SIZE)
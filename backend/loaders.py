@@ -0,0 +1,34 @@
+"""Relationship loading strategies keyed by response schema.
+
+Response schemas that embed related objects would otherwise trigger one lazy
+SELECT per row and relationship while FastAPI serializes a list, and lazy
+loads are not available at all on an AsyncSession. Queries that feed such a
+schema apply `options_for(schema)` so the relationships are loaded up front
+in a fixed number of statements; single objects returned after a write go
+through `refresh(db, instance, schema)`.
+"""
+from sqlalchemy import inspect
+from sqlalchemy.orm import selectinload
+
+from . import models, schemas
+
+EMBEDDED_RELATIONSHIPS = {
+    schemas.Project: (
+        models.AdminProject.category,
+    ),
+    schemas.ContactRequest: (
+        models.ContactRequest.category,
+        models.ContactRequest.user,
+    ),
+}
+
+
+def options_for(schema):
+    return tuple(selectinload(rel) for rel in EMBEDDED_RELATIONSHIPS.get(schema, ()))
+
+
+async def refresh(db, instance, schema=None):
+    """Reload all columns of `instance` plus the relationships `schema` embeds."""
+    names = [attr.key for attr in inspect(instance).mapper.column_attrs]
+    names += [rel.key for rel in EMBEDDED_RELATIONSHIPS.get(schema, ())]
+    await db.refresh(instance, names)
@@ -1,43 +1,43 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from .database import engine, Base, SessionLocal
+from . import database
 from .routers import auth, admin, contact, client, public
-from . import models, utils
+from . import utils, reports, ingest, ratelimit, metrics, profiling, migrations, static_files, serialization, serve
+from . import batch, schemas
+import hmac
 import os
 
+import asyncio
 from contextlib import asynccontextmanager
 
-def create_default_superuser():
-    db = SessionLocal()
-    try:
-        if not db.query(models.User).filter(models.User.username == "root").first():
-            user = models.User(
-                username="root",
-                hashed_password=utils.get_password_hash("root"),
-                is_superuser=True,
-                is_active=True,
-                vorname="Admin",
-                nachname="Root",
-                position="Admin"
-            )
-            db.add(user)
-            db.commit()
-            print("Default superuser 'root' created.")
-    except Exception as e:
-        print(f"Error creating superuser: {e}")
-    finally:
-        db.close()
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Create tables and default user
-    Base.metadata.create_all(bind=engine)
-    create_default_superuser()
+    # Startup: One schema version check; the first worker on a new or outdated database migrates it
+    migrations.ensure_schema()
+    if os.path.isdir(static_files.STATIC_DIR):
+        static_files.frontend.load()
+    checkpoints = asyncio.create_task(database.run_wal_checkpoints()) if database.SQLITE_TUNED else None
+    if ingest.CONTACT_WRITE_BEHIND:
+        ingest.contact_queue.start()
     yield
-    # Shutdown: Clean up resources if needed (none here)
+    # Queued submissions are written before the engines go away
+    await ingest.contact_queue.stop()
+    # Shutdown: Stop background work, the hashing and report workers and pooled connections
+    if checkpoints is not None:
+        checkpoints.cancel()
+    utils.hash_executor.shutdown()
+    reports.report_executor.shutdown()
+    await database.dispose_engines()
+
+app = FastAPI(title="Base44 App Migration", lifespan=lifespan, default_response_class=serialization.FastJSONResponse)
 
-app = FastAPI(title="Base44 App Migration", lifespan=lifespan)
+# Innermost, so profiles cover only requests that got past the limiters
+app.add_middleware(profiling.ProfilingMiddleware)
+
+# Load shedding and rate limits; added first so CORS headers also reach rejected requests
+app.add_middleware(ratelimit.ConcurrencyLimitMiddleware, limiter=ratelimit.concurrency_limiter)
+app.add_middleware(ratelimit.RateLimitMiddleware, limiter=ratelimit.rate_limiter)
 
 # CORS middleware
 app.add_middleware(
@@ -48,6 +48,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so rejected and shed requests are counted too
+app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(auth.router)
 app.include_router(admin.router)
 app.include_router(contact.router)
@@ -58,14 +61,33 @@ app.include_router(public.router)
 async def health_check():
     return {"status": "ok", "message": "Backend is running"}
 
-# Serve Frontend
-if os.path.exists("static"):
-    app.mount("/", StaticFiles(directory="static", html=True), name="static")
+@app.get("/api/health/workers")
+async def worker_health():
+    """Per-worker state as seen by the `backend.serve` supervisor, and which worker answered."""
+    return {"pid": os.getpid(), "supervisor": serve.worker_status()}
 
-    from fastapi.responses import FileResponse
-    @app.exception_handler(404)
-    async def not_found(request, exc):
-        return FileResponse("static/index.html")
+@app.post("/api/batch", response_model=schemas.BatchResponse)
+async def run_batch(body: schemas.BatchRequest, request: Request, token: str = Depends(utils.oauth2_scheme)):
+    """GET requests answered in one round-trip with one authentication; see `backend/batch.py`."""
+    principal = await utils.authenticate(token)
+    responses = await batch.execute(request, [(item.id, item.url) for item in body.requests], principal)
+    # Sub-response bodies are already JSON, so they skip response_model validation
+    return batch.BatchJSONResponse(responses)
 
+@app.get("/api/metrics", include_in_schema=False)
+async def read_metrics(request: Request):
+    """Readable with METRICS_TOKEN, or with a superuser's token when METRICS_TOKEN is not set."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        allowed = False
+    elif metrics.METRICS_TOKEN:
+        allowed = hmac.compare_digest(token.encode(), metrics.METRICS_TOKEN.encode())
+    else:
+        allowed = await utils.is_superuser_token(token)
+    if not allowed:
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
-# We will mount static files and frontend later
+# Serve Frontend (precompressed, with index.html for client-side routes)
+if os.path.isdir(static_files.STATIC_DIR):
+    app.mount("/", static_files.frontend, name="static")
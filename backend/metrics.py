@@ -0,0 +1,222 @@
+"""Prometheus metrics at `/api/metrics`.
+
+`MetricsMiddleware` records, per route template and method, request counts by
+status code and a latency histogram, plus the number of requests in flight.
+SQLAlchemy cursor events time every statement. The count and total time of
+a request's statements go into per-route histograms, so N+1 queries and slow
+pages show up by route.
+
+Per request this costs a few dict lookups and additions. Everything else
+(threadpool, process pools, connection pools, caches, queues) is read from the
+components' own `stats()` only when the endpoint is scraped.
+"""
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+import os
+import threading
+import time
+
+from sqlalchemy import event
+
+from . import profiling
+
+# Bearer token for scrapers to read /api/metrics; without it only superusers can
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+STATEMENT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+# Statements and seconds spent in SQL by the current request
+_request_sql: ContextVar[Optional[List[float]]] = ContextVar("request_sql", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name: str, labels: str):
+        cumulative = 0
+        sep = "," if labels else ""
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            yield f'{name}_bucket{{{labels}{sep}le="{le}"}} {cumulative}'
+        suffix = f"{{{labels}}}" if labels else ""
+        yield f"{name}_sum{suffix} {self.sum:.6f}"
+        yield f"{name}_count{suffix} {cumulative}"
+
+
+class RouteStats:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.sql_statements = Histogram(STATEMENT_COUNT_BUCKETS)
+        self.sql_seconds = Histogram(SQL_BUCKETS)
+        self.statuses: Dict[int, int] = {}
+
+
+class Metrics:
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteStats] = {}
+        self.in_flight = 0
+        self.sql = Histogram(SQL_BUCKETS)
+        self._sql_lock = threading.Lock()
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, sql: List[float]):
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = RouteStats()
+        stats.latency.observe(seconds)
+        stats.sql_statements.observe(sql[0])
+        stats.sql_seconds.observe(sql[1])
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def observe_statement(self, seconds: float):
+        # Sync mode runs statements in threadpool workers
+        with self._sql_lock:
+            self.sql.observe(seconds)
+        sql = _request_sql.get()
+        if sql is not None:
+            sql[0] += 1
+            sql[1] += seconds
+
+
+metrics = Metrics()
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    # Templates, not raw paths, keep the label set bounded
+    return getattr(route, "path", None) or "other"
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+        sql = [0, 0.0]
+        token = _request_sql.set(sql)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.in_flight -= 1
+            _request_sql.reset(token)
+            metrics.observe_request(scope["method"], _route_label(scope), status, time.perf_counter() - start, sql)
+
+
+def instrument_engine(sync_engine):
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_start"].pop()
+        metrics.observe_statement(seconds)
+        profiling.observe_statement(statement, seconds)
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{key}="{str(value)}"' for key, value in labels.items())
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Exposition:
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def family(self, name: str, kind: str, help_text: str):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name: str, value, **labels):
+        if value is None:
+            return
+        if isinstance(value, bool):
+            value = int(value)
+        self.lines.append(f"{name}{{{_labels(**labels)}}} {value}" if labels else f"{name} {value}")
+
+    def stats(self, prefix: str, help_text: str, values: Dict[str, dict], label: str):
+        """One gauge family per numeric key of `stats()` dicts, labelled by component."""
+        keys = sorted({key for data in values.values() for key, value in data.items()
+                       if isinstance(value, (int, float))})
+        for key in keys:
+            self.family(f"{prefix}_{key}", "gauge", f"{help_text} ({key})")
+            for component, data in values.items():
+                value = data.get(key)
+                if isinstance(value, (int, float)):
+                    self.sample(f"{prefix}_{key}", value, **{label: component})
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def render() -> str:
+    """The current metrics in Prometheus text format (version 0.0.4)."""
+    import anyio.to_thread
+    from . import ingest, pool_stats, ratelimit, reports, static_files, utils
+    from .response_cache import response_cache
+
+    out = _Exposition()
+    routes = sorted(metrics.routes.items())
+
+    out.family("http_requests_total", "counter", "HTTP requests by route template, method and status")
+    for (method, route), stats in routes:
+        for status, count in sorted(stats.statuses.items()):
+            out.sample("http_requests_total", count, method=method, route=_escape(route), status=status)
+    out.family("http_requests_in_flight", "gauge", "HTTP requests being served")
+    out.sample("http_requests_in_flight", metrics.in_flight)
+    for name, attr, help_text in (
+        ("http_request_duration_seconds", "latency", "Request latency until the response is complete"),
+        ("http_request_sql_statements", "sql_statements", "SQL statements executed per request"),
+        ("http_request_sql_seconds", "sql_seconds", "Time spent executing SQL per request"),
+    ):
+        out.family(name, "histogram", help_text)
+        for (method, route), stats in routes:
+            out.lines.extend(getattr(stats, attr).samples(name, _labels(method=method, route=_escape(route))))
+
+    out.family("db_statement_duration_seconds", "histogram", "SQL statement execution time")
+    out.lines.extend(metrics.sql.samples("db_statement_duration_seconds", ""))
+
+    threadpool = anyio.to_thread.current_default_thread_limiter().statistics()
+    out.family("threadpool_threads", "gauge", "Threadpool size")
+    out.sample("threadpool_threads", threadpool.total_tokens)
+    out.family("threadpool_busy", "gauge", "Threadpool workers running a task")
+    out.sample("threadpool_busy", threadpool.borrowed_tokens)
+    out.family("threadpool_queue_depth", "gauge", "Tasks waiting for a threadpool worker")
+    out.sample("threadpool_queue_depth", threadpool.tasks_waiting)
+
+    out.stats("process_pool", "Process pool", {"hash": utils.hash_executor.stats(),
+                                               "report": reports.report_executor.stats()}, "pool")
+    out.stats("db_pool", "Database connection pool", pool_stats.snapshot(), "pool")
+    out.stats("cache", "Cache", {"principal": utils.principal_cache.stats(), "public": response_cache.stats(),
+                                 "report": reports.report_cache.stats()}, "cache")
+    out.stats("ingest_queue", "Contact request write-behind queue", {"contact": ingest.contact_queue.stats()}, "queue")
+    out.stats("limiter", "Rate and concurrency limiter", {"rate": ratelimit.rate_limiter.stats(),
+                                                          "concurrency": ratelimit.concurrency_limiter.stats()},
+              "limiter")
+    out.stats("static_files", "Static frontend files", {"frontend": static_files.frontend.stats()}, "mount")
+    return out.render()
@@ -0,0 +1,222 @@
+"""Versioned schema migrations.
+
+`schema_version` records every applied migration with a fingerprint of the
+schema the models describe (the DDL of their tables and indexes). On startup,
+`ensure_schema` reads the latest row. If the version and fingerprint match the
+code, nothing else happens. Otherwise one process takes a database-wide lock
+(BEGIN IMMEDIATE on SQLite, an advisory transaction lock on Postgres), applies
+the pending migrations and records them. Processes that started alongside it
+wait for the lock, then find the schema current. Several uvicorn workers can
+therefore boot at once without racing on table creation or the default
+superuser.
+
+Add a migration by appending a step to MIGRATIONS; never edit or reorder
+applied steps. If the models change without a new step, the fingerprint no
+longer matches: missing tables and indexes are created and a warning is
+printed. Column changes still need a migration.
+
+    python -m backend.migrations upgrade   # e.g. as a release step with MIGRATE_ON_STARTUP=0
+    python -m backend.migrations status
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Tuple
+import argparse
+import hashlib
+import os
+import time
+import zlib
+
+from sqlalchemy import (Column, DateTime, Integer, MetaData, String, Table, create_engine, inspect, insert,
+                        select, text)
+from sqlalchemy.pool import NullPool
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+# search and dashboard register the after_create hooks that install their triggers
+from . import dashboard, database, models, search, utils
+
+# "0" makes startup only check the version and refuse to serve an outdated schema
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "1") == "1"
+# Seconds a process waits for another one to finish migrating
+MIGRATION_LOCK_TIMEOUT = float(os.getenv("MIGRATION_LOCK_TIMEOUT", "600"))
+
+# Postgres advisory lock key, derived from a fixed name so every worker uses the same one
+ADVISORY_LOCK_KEY = zlib.crc32(b"deiw.schema_migrations")
+
+# Kept out of Base.metadata, so it is not part of the fingerprint it records
+version_table = Table(
+    "schema_version", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("fingerprint", String(64), nullable=False),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _create_tables(connection):
+    # Skips tables that exist, so databases created before versioning are adopted as they are;
+    # the metadata's after_create hook installs the search index
+    database.Base.metadata.create_all(bind=connection)
+
+
+def _create_missing_indexes(connection):
+    inspector = inspect(connection)
+    for table in database.Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=connection)
+
+
+def _create_default_superuser(connection):
+    users = models.User.__table__
+    if connection.execute(select(users.c.id).where(users.c.username == "root")).first() is None:
+        connection.execute(insert(users).values(
+            username="root", hashed_password=utils.get_password_hash("root"), is_superuser=True,
+            is_active=True, vorname="Admin", nachname="Root", position="Admin",
+        ))
+        print("Default superuser 'root' created.")
+
+
+def _add_contact_request_receipts(connection):
+    # Databases created at version 5 or later already have the column from step 1
+    table = models.ContactRequest.__table__
+    if "receipt" not in {column["name"] for column in inspect(connection).get_columns(table.name)}:
+        connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN receipt VARCHAR(32)"))
+    _create_missing_indexes(connection)
+
+
+# (version, description, step); steps run inside the locked transaction
+MIGRATIONS = [
+    (1, "Create tables and the search index", _create_tables),
+    (2, "Add list, cursor and filter indexes to existing tables", _create_missing_indexes),
+    (3, "Create the default superuser", _create_default_superuser),
+    (4, "Maintain the dashboard counters with triggers", dashboard.configure),
+    (5, "Store a receipt with every contact request", _add_contact_request_receipts),
+    (6, "Drop the dashboard triggers unless DASHBOARD_COUNTERS=1", dashboard.configure),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def fingerprint(dialect) -> str:
+    """sha256 of the DDL the models compile to on `dialect`."""
+    digest = hashlib.sha256()
+    for table in database.Base.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    return digest.hexdigest()
+
+
+def _migration_engine():
+    if database.IS_MEMORY_SQLITE:
+        # A new engine would open a different in-memory database
+        return database.engine
+    connect_args = {}
+    if database.IS_SQLITE:
+        # Driver-level autocommit, so BEGIN IMMEDIATE below is the only transaction;
+        # the busy timeout is how long a worker waits for the one that is migrating
+        connect_args = {"isolation_level": None, "timeout": MIGRATION_LOCK_TIMEOUT, "check_same_thread": False}
+    return create_engine(database.DATABASE_URL, poolclass=NullPool, connect_args=connect_args)
+
+
+def _current(connection) -> Optional[Tuple[int, str]]:
+    if not inspect(connection).has_table(version_table.name):
+        return None
+    row = connection.execute(
+        select(version_table.c.version, version_table.c.fingerprint).order_by(version_table.c.id.desc()).limit(1)
+    ).first()
+    return (row.version, row.fingerprint) if row is not None else None
+
+
+@contextmanager
+def _locked(engine):
+    """A transaction holding the migration lock."""
+    with engine.connect() as connection:
+        if connection.dialect.name == "sqlite":
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        elif connection.dialect.name == "postgresql":
+            connection.execute(text(f"SET LOCAL lock_timeout = {int(MIGRATION_LOCK_TIMEOUT * 1000)}"))
+            connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        try:
+            yield connection
+        except BaseException:
+            connection.rollback()
+            raise
+        connection.commit()
+
+
+def _record(connection, version: int, fingerprint_: str, description: str):
+    version_table.create(bind=connection, checkfirst=True)
+    connection.execute(insert(version_table).values(
+        version=version, fingerprint=fingerprint_, description=description, applied_at=datetime.utcnow(),
+    ))
+
+
+def upgrade(engine=None) -> list:
+    """Apply pending migrations under the lock; returns the descriptions of the steps applied."""
+    engine = engine or _migration_engine()
+    applied = []
+    with _locked(engine) as connection:
+        expected = fingerprint(connection.dialect)
+        current = _current(connection)
+        version = current[0] if current else 0
+        if version > LATEST_VERSION:
+            raise RuntimeError(f"Database schema version {version} is newer than this code ({LATEST_VERSION})")
+        for step_version, description, step in MIGRATIONS:
+            if step_version > version:
+                step(connection)
+                _record(connection, step_version, expected, description)
+                applied.append(description)
+        if not applied and current is not None and current[1] != expected:
+            print("Warning: the models changed without a migration; creating missing tables and indexes. "
+                  "Column changes need a new entry in backend.migrations.MIGRATIONS.")
+            _create_tables(connection)
+            _create_missing_indexes(connection)
+            _record(connection, version, expected, "Create tables and indexes added without a migration")
+            applied.append("Create tables and indexes added without a migration")
+    return applied
+
+
+def status(engine=None) -> dict:
+    engine = engine or _migration_engine()
+    with engine.connect() as connection:
+        current = _current(connection)
+        expected = fingerprint(connection.dialect)
+    return {
+        "version": current[0] if current else None,
+        "latest_version": LATEST_VERSION,
+        "fingerprint": current[1] if current else None,
+        "expected_fingerprint": expected,
+        "up_to_date": current == (LATEST_VERSION, expected),
+    }
+
+
+def ensure_schema():
+    """Startup hook: one version read when the schema is current, a locked upgrade otherwise."""
+    engine = _migration_engine()
+    try:
+        if status(engine)["up_to_date"]:
+            return
+        if not MIGRATE_ON_STARTUP:
+            raise RuntimeError("Database schema is not up to date; run `python -m backend.migrations upgrade`")
+        start = time.perf_counter()
+        applied = upgrade(engine)
+        if applied:
+            print(f"Applied migrations in {time.perf_counter() - start:.2f}s: {'; '.join(applied)}")
+    finally:
+        if engine is not database.engine:
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the database schema version")
+    parser.add_argument("command", choices=["upgrade", "status"])
+    args = parser.parse_args()
+    if args.command == "upgrade":
+        applied = upgrade()
+        print("\n".join(applied) if applied else "Schema is up to date.")
+    else:
+        for key, value in status().items():
+            print(f"{key}: {value}")
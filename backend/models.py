@@ -1,7 +1,12 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, Text, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, Text, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
+import uuid
+
+def new_receipt() -> str:
+    """Public reference of a contact request, known before its row (and id) exists."""
+    return uuid.uuid4().hex
 
 class User(Base):
     __tablename__ = "users"
@@ -32,6 +37,10 @@ class Category(Base):
     projects = relationship("AdminProject", back_populates="category")
     requests = relationship("ContactRequest", back_populates="category")
 
+    __table_args__ = (
+        Index("ix_categories_name_de_id", "name_de", "id"),
+    )
+
 class AdminProject(Base):
     __tablename__ = "admin_projects"
 
@@ -51,18 +60,34 @@ class AdminProject(Base):
     category = relationship("Category", back_populates="projects")
     user = relationship("User", back_populates="projects")
 
+    __table_args__ = (
+        Index("ix_admin_projects_year_id", "year", "id"),
+        Index("ix_admin_projects_name_id", "name", "id"),
+        Index("ix_admin_projects_status_id", "status", "id"),
+        Index("ix_admin_projects_category_id_id", "category_id", "id"),
+        Index("ix_admin_projects_user_id_id", "user_id", "id"),
+    )
+
 class Kunde(Base):
     __tablename__ = "kunden"
     id = Column(Integer, primary_key=True, index=True)
     firma = Column(String)
     # Add other fields as needed
 
+    __table_args__ = (
+        Index("ix_kunden_firma_id", "firma", "id"),
+    )
+
 class Ware(Base):
     __tablename__ = "waren"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
     # Add other fields as needed
 
+    __table_args__ = (
+        Index("ix_waren_name_id", "name", "id"),
+    )
+
 class Aufgabe(Base):
     __tablename__ = "aufgaben"
     id = Column(Integer, primary_key=True, index=True)
@@ -72,12 +97,23 @@ class Aufgabe(Base):
     zugewiesen_name = Column(String, nullable=True)
     created_date = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_aufgaben_created_date_id", "created_date", "id"),
+        Index("ix_aufgaben_status_id", "status", "id"),
+        Index("ix_aufgaben_prioritaet_id", "prioritaet", "id"),
+    )
+
 class Dokument(Base):
     __tablename__ = "dokumente"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
     created_date = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_dokumente_created_date_id", "created_date", "id"),
+        Index("ix_dokumente_name_id", "name", "id"),
+    )
+
 class ContactRequest(Base):
     __tablename__ = "contact_requests"
 
@@ -90,9 +126,27 @@ class ContactRequest(Base):
     status = Column(String, default="new")
     message_admin = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    receipt = Column(String(32), default=new_receipt)
     
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
 
     category = relationship("Category", back_populates="requests")
     user = relationship("User", back_populates="requests")
+
+    __table_args__ = (
+        Index("ix_contact_requests_created_at_id", "created_at", "id"),
+        Index("ix_contact_requests_status_id", "status", "id"),
+        Index("ix_contact_requests_category_id_id", "category_id", "id"),
+        Index("ix_contact_requests_user_id_id", "user_id", "id"),
+        Index("ix_contact_requests_receipt", "receipt", unique=True),
+    )
+
+class DashboardCounter(Base):
+    """Rows per value of a counted column, kept current by triggers (see backend/dashboard.py)."""
+    __tablename__ = "dashboard_counters"
+
+    entity = Column(String, primary_key=True)
+    field = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
+    row_count = Column(Integer, nullable=False, default=0)
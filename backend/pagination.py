@@ -0,0 +1,249 @@
+"""Keyset (cursor) pagination shared by the list endpoints.
+
+A cursor encodes the sort key name plus the `(sort value, id)` of the last row
+on the previous page, so the next page is a range scan on an index instead of
+an OFFSET that has to walk every skipped row.
+
+List routes stay backward compatible: without `cursor` they return a plain
+list paged by `skip`/`limit`. Passing `cursor` (empty for the first page)
+switches to the `schemas.Page` envelope with `items` and `next_cursor`.
+`limit` is capped at PAGE_MAX_LIMIT.
+
+Sorts carry no NULLS FIRST/LAST clause, so they match the plain `(column, id)`
+indexes in both directions: NULL sort keys come first in ascending order on
+SQLite and last on Postgres, as each one stores them in the index.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime
+from typing import Dict, Optional
+import json
+import os
+
+from fastapi import HTTPException, Query
+from sqlalchemy import String, and_, literal, tuple_
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Largest page a list route returns
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", "1000"))
+
+# Sort keys per model besides `id`; each one has a composite `(column, id)` index
+SORT_KEYS = {
+    models.User: {"username": models.User.username},
+    models.Category: {"name_de": models.Category.name_de},
+    models.AdminProject: {
+        "year": models.AdminProject.year,
+        "name": models.AdminProject.name,
+        "status": models.AdminProject.status,
+    },
+    models.Kunde: {"firma": models.Kunde.firma},
+    models.Ware: {"name": models.Ware.name},
+    models.Aufgabe: {
+        "created_date": models.Aufgabe.created_date,
+        "status": models.Aufgabe.status,
+        "prioritaet": models.Aufgabe.prioritaet,
+    },
+    models.Dokument: {"created_date": models.Dokument.created_date, "name": models.Dokument.name},
+    models.ContactRequest: {
+        "created_at": models.ContactRequest.created_at,
+        "status": models.ContactRequest.status,
+    },
+}
+
+
+class PageParams:
+    def __init__(
+        self,
+        skip: int = Query(0, ge=0),
+        limit: int = Query(100, ge=1, le=PAGE_MAX_LIMIT),
+        cursor: Optional[str] = Query(None, description="Opaque cursor; pass an empty value for the first page"),
+        sort: str = Query("id", description="Sort key, prefix with '-' for descending"),
+    ):
+        self.skip = skip
+        self.limit = limit
+        self.cursor = cursor
+        self.sort = sort
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+    return value
+
+
+def encode_cursor(sort: str, value, last_id: int) -> str:
+    raw = json.dumps([sort, _encode_value(value), last_id], separators=(",", ":"))
+    return urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, column=None):
+    """`(value, last_id)` of a cursor for `sort`, whose key is `column` (None for `id`); 400 otherwise."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, last_id = json.loads(urlsafe_b64decode(padded.encode()))
+        value = _decode_value(value)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort or type(last_id) is not int:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    # Exact types: bool is an int and datetime a date, but neither is a valid key for those columns
+    expected = int if column is None else column.type.python_type
+    if value is not None and type(value) is not expected:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, last_id
+
+
+def sqlite_datetime(value: datetime):
+    """Bind a datetime the way SQLite stores it so string comparison stays exact.
+
+    `server_default=func.now()` writes `YYYY-MM-DD HH:MM:SS` without fractional
+    seconds, while the default DateTime bind processor always appends them.
+    """
+    text = value.strftime("%Y-%m-%d %H:%M:%S")
+    if value.microsecond:
+        text += f".{value.microsecond:06d}"
+    return literal(text, String)
+
+
+def _resolve_sort(sort: str, sort_keys: Dict[str, object]):
+    descending = sort.startswith("-")
+    name = sort.lstrip("-")
+    if name == "id":
+        return None, descending
+    if name not in sort_keys:
+        allowed = ", ".join(["id"] + sorted(sort_keys))
+        raise HTTPException(status_code=400, detail=f"Unsupported sort key '{name}', use one of: {allowed}")
+    return sort_keys[name], descending
+
+
+def sort_column(model, params: PageParams):
+    """The column `params` sorts by besides `id`, or None."""
+    return _resolve_sort(params.sort, SORT_KEYS.get(model, {}))[0]
+
+
+def _order_by(column, id_column, descending):
+    if column is None:
+        return [id_column.desc() if descending else id_column.asc()]
+    if descending:
+        return [column.desc(), id_column.desc()]
+    return [column.asc(), id_column.asc()]
+
+
+def _nulls_first(dialect_name: str, descending: bool) -> bool:
+    """Whether rows with a NULL sort key come before the others in `_order_by`."""
+    # Postgres sorts NULL above every value, SQLite below
+    return descending if dialect_name == "postgresql" else not descending
+
+
+def _after(column, id_column, descending, value, last_id, dialect_name):
+    """The range scans returning the rows after `(value, last_id)`, in order.
+
+    Rows with a NULL sort key form one end of the order and the others the rest.
+    Each region is a pure `(column, id)` row comparison or an `IS NULL` prefix
+    on the index; the next region follows when the cursor's region runs out.
+    """
+    if column is None:
+        return [id_column < last_id if descending else id_column > last_id]
+    nulls_first = _nulls_first(dialect_name, descending)
+    if value is None:
+        after_null = and_(column.is_(None), id_column < last_id if descending else id_column > last_id)
+        return [after_null, column.isnot(None)] if nulls_first else [after_null]
+    if descending:
+        after_value = tuple_(column, id_column) < tuple_(value, last_id)
+    else:
+        after_value = tuple_(column, id_column) > tuple_(value, last_id)
+    return [after_value] if nulls_first else [after_value, column.is_(None)]
+
+
+def _page_statements(stmt, model, params: PageParams, dialect_name: str):
+    """The statements returning one page, and the sort column.
+
+    A page is one statement, except for a cursor page that reaches the end of
+    its NULL or non-NULL region: the next statement is only run while the
+    page is not full, with the remaining limit.
+    """
+    column, descending = _resolve_sort(params.sort, SORT_KEYS.get(model, {}))
+    stmt = stmt.order_by(*_order_by(column, model.id, descending))
+
+    if params.cursor is None:
+        return [stmt.offset(params.skip).limit(params.limit)], column
+    if not params.cursor:
+        return [stmt], column
+
+    value, last_id = decode_cursor(params.cursor, params.sort, column)
+    if isinstance(value, datetime) and dialect_name == "sqlite":
+        value = sqlite_datetime(value)
+    return [stmt.where(where) for where in _after(column, model.id, descending, value, last_id, dialect_name)], column
+
+
+def _windows(statements, params: PageParams, rows: list):
+    """`statements` limited to what is left of the page after `rows`, until it is full.
+
+    `rows` is the caller's list, filled between the statements.
+    """
+    for statement in statements:
+        if params.cursor is None:
+            yield statement
+            return
+        if len(rows) > params.limit:
+            return
+        # One row beyond the page tells whether there is a next one
+        yield statement.limit(params.limit + 1 - len(rows))
+
+
+def _page_result(rows, column, params: PageParams):
+    if params.cursor is None:
+        return rows
+
+    next_cursor = None
+    if len(rows) > params.limit:
+        rows = rows[:params.limit]
+        last = rows[-1]
+        value = getattr(last, column.key) if column is not None else last.id
+        next_cursor = encode_cursor(params.sort, value, last.id)
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+async def paginate(db, stmt, model, params: PageParams):
+    """Apply the requested ordering and page window to the `select(model)` statement.
+
+    Returns a list in skip/limit mode, or a page dict in cursor mode.
+    """
+    statements, column = _page_statements(stmt, model, params, db.get_bind().dialect.name)
+    rows = []
+    for statement in _windows(statements, params, rows):
+        rows += (await db.execute(statement)).scalars().all()
+    return _page_result(rows, column, params)
+
+
+async def paginate_rows(db, stmt, model, params: PageParams):
+    """`paginate` for column selects of `model`; pages hold Rows instead of ORM instances.
+
+    The selected columns must include `id` and the sort key under their own names.
+    """
+    statements, column = _page_statements(stmt, model, params, db.get_bind().dialect.name)
+    rows = []
+    for statement in _windows(statements, params, rows):
+        rows += (await db.execute(statement)).all()
+    return _page_result(rows, column, params)
+
+
+def paginate_sync(db: Session, stmt, model, params: PageParams):
+    """`paginate` for code that runs on a sync Session in the threadpool."""
+    statements, column = _page_statements(stmt, model, params, db.get_bind().dialect.name)
+    rows = []
+    for statement in _windows(statements, params, rows):
+        rows += db.execute(statement).scalars().all()
+    return _page_result(rows, column, params)
@@ -0,0 +1,138 @@
+"""Connection pool statistics.
+
+Pool events count connects, checkouts, checkins and invalidations per named
+pool. Checkout wait time is measured by the `Timed*QueuePool` classes around
+`Pool.connect()`, which covers waiting for a free slot, opening an overflow
+connection and the pre-ping.
+"""
+from typing import Dict
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf"))
+
+
+class PoolStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * len(WAIT_BUCKETS)
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.wait_buckets[i] += 1
+                    break
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        waits = sum(self.wait_buckets)
+        data = {
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "wait_avg_ms": round(self.wait_total / waits * 1000, 3) if waits else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "wait_histogram": {
+                ("+Inf" if bound == float("inf") else f"{bound * 1000:g}ms"): count
+                for bound, count in zip(WAIT_BUCKETS, self.wait_buckets)
+            },
+        }
+        if isinstance(pool, QueuePool):
+            data.update({
+                "pool_size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+            })
+        return data
+
+
+registry: Dict[str, PoolStats] = {}
+
+
+def stats_for(name: str) -> PoolStats:
+    stats = registry.get(name)
+    if stats is None:
+        stats = registry[name] = PoolStats(name)
+    return stats
+
+
+class _TimedCheckout:
+    def connect(self):
+        stats = stats_for(self._orig_logging_name)
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            stats.timeouts += 1
+            raise
+        finally:
+            stats.record_wait(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument(engine, name: str) -> PoolStats:
+    """Track `engine`'s pool under `name` (should match its `pool_logging_name`)."""
+    stats = stats_for(name)
+    stats.pool = engine.pool
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        stats.connects += 1
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        with stats._lock:
+            stats.checkouts += 1
+            stats.in_use += 1
+            stats.peak_in_use = max(stats.peak_in_use, stats.in_use)
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        with stats._lock:
+            stats.checkins += 1
+            stats.in_use = max(stats.in_use - 1, 0)
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        stats.invalidations += 1
+
+    @event.listens_for(engine, "engine_disposed")
+    def on_disposed(disposed_engine):
+        stats.pool = disposed_engine.pool
+
+    return stats
+
+
+def snapshot() -> dict:
+    return {name: stats.snapshot() for name, stats in registry.items()}
@@ -0,0 +1,269 @@
+"""On-demand statistical profiling of single requests.
+
+A request is profiled when a superuser sends `X-Profile: 1`, or at random at
+PROFILE_SAMPLE_RATE. A sampler thread then records the request's Python stack
+every PROFILE_INTERVAL_MS. It samples the event loop thread while the request's
+task is running on it, and the threadpool workers running the request's
+database calls in sync mode. While the request is waiting on something else
+(I/O, other tasks, the password hashing pool), the sample is recorded as
+`(waiting)`. The SQL statements the request issued are recorded with their
+timings.
+
+Finished profiles go into a ring buffer of PROFILE_BUFFER_SIZE entries. The
+response carries `X-Profile-Id`. `/api/admin/profiles` lists the buffer and
+`/api/admin/profiles/{id}` downloads a profile as speedscope JSON
+(https://www.speedscope.app): one sampled profile for the stacks and one
+evented profile for the SQL statements.
+
+Without the header, and with the sample rate at 0 (the default), a request
+costs one header lookup.
+"""
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "1")) / 1000
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+# Longest statement text kept per SQL event
+MAX_STATEMENT_LENGTH = 2000
+
+PROFILE_HEADER = b"x-profile"
+WAITING = ("(waiting)", "", 0)
+
+_active: ContextVar[Optional["Profile"]] = ContextVar("active_profile", default=None)
+_ids = itertools.count(1)
+
+Frame = Tuple[str, str, int]
+
+
+class Profile:
+    def __init__(self, method: str, path: str, reason: str):
+        self.id = next(_ids)
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.route: Optional[str] = None
+        self.status: Optional[int] = None
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        # Sampled stacks (root first) and the seconds each one stands for
+        self.samples: List[Tuple[Frame, ...]] = []
+        self.weights: List[float] = []
+        # (offset from start, seconds, statement)
+        self.statements: List[Tuple[float, float, str]] = []
+        self.threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def enter_thread(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self.threads[ident] = self.threads.get(ident, 0) + 1
+
+    def exit_thread(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self.threads[ident] -= 1
+            if not self.threads[ident]:
+                del self.threads[ident]
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "reason": self.reason,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration * 1000, 3),
+            "samples": len(self.samples),
+            "sql_statements": len(self.statements),
+            "sql_ms": round(sum(seconds for _, seconds, _ in self.statements) * 1000, 3),
+        }
+
+    def speedscope(self) -> dict:
+        frames, index = [], {}
+
+        def frame_id(frame: Frame) -> int:
+            if frame not in index:
+                index[frame] = len(frames)
+                name, file, line = frame
+                frames.append({"name": name, "file": file, "line": line} if file else {"name": name})
+            return index[frame]
+
+        samples = [[frame_id(frame) for frame in stack] for stack in self.samples]
+        end = round(self.duration * 1000, 3)
+        events = []
+        for offset, seconds, statement in self.statements:
+            frame = frame_id((statement, "", 0))
+            events.append({"type": "O", "frame": frame, "at": round(offset * 1000, 3)})
+            events.append({"type": "C", "frame": frame, "at": round((offset + seconds) * 1000, 3)})
+        title = f"{self.method} {self.path}"
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"#{self.id} {title}",
+            "exporter": "deiw backend",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [
+                {"type": "sampled", "name": title, "unit": "milliseconds", "startValue": 0, "endValue": end,
+                 "samples": samples, "weights": [round(w * 1000, 3) for w in self.weights]},
+                {"type": "evented", "name": f"SQL ({len(self.statements)} statements)", "unit": "milliseconds",
+                 "startValue": 0, "endValue": end, "events": events},
+            ],
+        }
+
+
+profiles: "deque[Profile]" = deque(maxlen=PROFILE_BUFFER_SIZE)
+
+
+def get_profile(profile_id: int) -> Optional[Profile]:
+    return next((profile for profile in list(profiles) if profile.id == profile_id), None)
+
+
+def _stack(frame, stop_code) -> Tuple[Frame, ...]:
+    """Frames from just below `stop_code` (or the thread's root) down to `frame`, root first."""
+    stack = []
+    while frame is not None and frame.f_code is not stop_code:
+        code = frame.f_code
+        stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class Sampler(threading.Thread):
+    def __init__(self, profile: Profile, loop, task, loop_thread: int, loop_root):
+        super().__init__(name=f"profile-{profile.id}", daemon=True)
+        self.profile = profile
+        self.loop = loop
+        self.task = task
+        self.loop_thread = loop_thread
+        self.loop_root = loop_root
+        self.stopped = threading.Event()
+
+    def run(self):
+        profile = self.profile
+        last = time.perf_counter()
+        while not self.stopped.wait(PROFILE_INTERVAL):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            frames = sys._current_frames()
+            stacks = []
+            if asyncio.current_task(self.loop) is self.task and self.loop_thread in frames:
+                stacks.append(_stack(frames[self.loop_thread], self.loop_root))
+            with profile._lock:
+                threads = list(profile.threads)
+            stacks.extend(_stack(frames[ident], _tracked.__code__) for ident in threads if ident in frames)
+            stacks = [stack for stack in stacks if stack] or [(WAITING,)]
+            for stack in stacks:
+                profile.samples.append(stack)
+                profile.weights.append(weight / len(stacks))
+
+
+_switch_lock = threading.Lock()
+_running = 0
+_switch_interval = sys.getswitchinterval()
+
+
+def _sampling(active: bool):
+    """Shorten the interpreter's thread switch interval while any sampler runs.
+
+    Otherwise a busy thread keeps the GIL for 5 ms at a time, and the sampler
+    could not take a sample more often than that.
+    """
+    global _running, _switch_interval
+    with _switch_lock:
+        if active:
+            if not _running:
+                _switch_interval = sys.getswitchinterval()
+                sys.setswitchinterval(min(_switch_interval, PROFILE_INTERVAL))
+            _running += 1
+        else:
+            _running -= 1
+            if not _running:
+                sys.setswitchinterval(_switch_interval)
+
+
+def _tracked(profile: Profile, fn, args, kwargs):
+    profile.enter_thread()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profile.exit_thread()
+
+
+def traced(fn):
+    """`fn`, marked as work of the profiled request when one is active; used for threadpool calls."""
+    profile = _active.get()
+    if profile is None:
+        return fn
+    return lambda *args, **kwargs: _tracked(profile, fn, args, kwargs)
+
+
+def observe_statement(statement: str, seconds: float):
+    profile = _active.get()
+    if profile is not None:
+        offset = time.perf_counter() - profile.start - seconds
+        profile.statements.append((offset, seconds, statement[:MAX_STATEMENT_LENGTH]))
+
+
+async def _requested_by_superuser(scope) -> bool:
+    from . import utils
+
+    authorization = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    return scheme.lower() == "bearer" and await utils.is_superuser_token(token)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        reason = None
+        if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            reason = "sampled"
+        elif any(name == PROFILE_HEADER for name, _ in scope["headers"]) and await _requested_by_superuser(scope):
+            reason = "header"
+        if reason is None:
+            return await self.app(scope, receive, send)
+        await self._profile(scope, receive, send, reason)
+
+    async def _profile(self, scope, receive, send, reason: str):
+        profile = Profile(scope["method"], scope["path"], reason)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", str(profile.id).encode())]
+            await send(message)
+
+        sampler = Sampler(profile, asyncio.get_running_loop(), asyncio.current_task(), threading.get_ident(),
+                          sys._getframe().f_code)
+        token = _active.set(profile)
+        _sampling(True)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stopped.set()
+            sampler.join()
+            _sampling(False)
+            profile.duration = time.perf_counter() - profile.start
+            _active.reset(token)
+            route = scope.get("route")
+            profile.route = getattr(route, "path", None)
+            profiles.append(profile)
@@ -0,0 +1,343 @@
+"""Rate limiting and load shedding middleware.
+
+`RateLimitMiddleware` applies token buckets per route, keyed by client IP and,
+for routes that name one, by the submitted username. Each bucket holds
+`capacity` requests and refills at `capacity / period` per second. An empty
+bucket answers 429 with Retry-After. Rules come from RATE_LIMITS, e.g.
+
+    POST /api/auth/login ip=30/60 username=10/60; POST /api/contact/requests ip=20/60
+
+Buckets live in a sharded in-memory store by default, so each worker process
+counts on its own. RATE_LIMIT_BACKEND=redis keeps them in a Redis-compatible
+server (redis, valkey, dragonfly, ...), so all workers share them. It needs
+the `redis` package.
+
+`ConcurrencyLimitMiddleware` caps requests in flight. Requests above the cap
+wait briefly for a slot; when too many are already waiting, or the wait runs
+out, the request is shed with 503 before it reaches the threadpool.
+
+The client IP is the socket peer. Behind a proxy, set FORWARDED_ALLOW_IPS for
+`python -m backend.serve` (or run uvicorn with `--forwarded-allow-ips`) so the
+peer is the real client from `X-Forwarded-For`. Until FORWARDED_ALLOW_IPS is
+set, the default rules stay off: behind a proxy every client would share the
+proxy's bucket. Rules given in RATE_LIMITS always apply.
+"""
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+import zlib
+
+from . import database
+
+DEFAULT_RATE_LIMITS = (
+    "POST /api/auth/login ip=30/60 username=10/60; "
+    "POST /api/auth/register ip=10/60; "
+    "POST /api/contact/requests ip=20/60"
+)
+
+
+def configured_rules() -> str:
+    """RATE_LIMITS, else the default rules once FORWARDED_ALLOW_IPS names the trusted proxies."""
+    if "RATE_LIMITS" in os.environ:
+        # An empty value disables rate limiting
+        return os.environ["RATE_LIMITS"]
+    if os.getenv("FORWARDED_ALLOW_IPS"):
+        return DEFAULT_RATE_LIMITS
+    print("Rate limits are off: set FORWARDED_ALLOW_IPS to the proxy addresses (or RATE_LIMITS) to enable them.")
+    return ""
+
+
+RATE_LIMITS = configured_rules()
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_SHARDS = int(os.getenv("RATE_LIMIT_SHARDS", "16"))
+# Buckets kept per shard before refilled and then least recently used ones are dropped
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+
+# "auto" sizes the cap to the threadpool in sync mode and disables it in async mode; "0" disables it
+MAX_CONCURRENT_REQUESTS = os.getenv("MAX_CONCURRENT_REQUESTS", "auto")
+LOAD_SHED_QUEUE_SIZE = int(os.getenv("LOAD_SHED_QUEUE_SIZE", "100"))
+LOAD_SHED_TIMEOUT = float(os.getenv("LOAD_SHED_TIMEOUT_MS", "2000")) / 1000
+
+# Largest request body read to find the username
+MAX_KEY_BODY = 64 * 1024
+# Never shed health checks and metric scrapes
+UNLIMITED_PATHS = {"/api/health", "/api/metrics"}
+
+
+class Limit:
+    def __init__(self, key: str, capacity: int, period: float):
+        if key not in ("ip", "username"):
+            raise ValueError(f"Unknown rate limit key {key!r}, expected ip or username")
+        self.key = key
+        self.capacity = capacity
+        self.rate = capacity / period
+
+
+def parse_rules(spec: str) -> Dict[Tuple[str, str], List[Limit]]:
+    """Parse RATE_LIMITS into `{(method, path): [Limit, ...]}`."""
+    rules = {}
+    for rule in filter(None, (part.strip() for part in spec.split(";"))):
+        method, path, *limits = rule.split()
+        parsed = []
+        for limit in limits:
+            key, _, value = limit.partition("=")
+            capacity, _, period = value.partition("/")
+            parsed.append(Limit(key, int(capacity), float(period or 1)))
+        rules[(method.upper(), path)] = parsed
+    return rules
+
+
+class MemoryBackend:
+    """Token buckets in process memory, spread over shards with a lock each."""
+
+    def __init__(self, shards: int, max_keys: int):
+        self.max_keys = max_keys
+        self._shards = [({}, threading.Lock()) for _ in range(max(shards, 1))]
+
+    def _prune(self, buckets: dict, now: float):
+        for key in [key for key, (_, _, full_at) in buckets.items() if full_at <= now]:
+            del buckets[key]
+        # Dicts keep insertion order and buckets are re-inserted on use, so the front is least recent
+        while len(buckets) > self.max_keys:
+            del buckets[next(iter(buckets))]
+
+    async def take(self, key: str, limit: Limit) -> Tuple[bool, float]:
+        """Take one token; returns (allowed, seconds until a token is available)."""
+        buckets, lock = self._shards[zlib.crc32(key.encode()) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            tokens, stamp, _ = buckets.pop(key, (limit.capacity, now, now))
+            tokens = min(limit.capacity, tokens + (now - stamp) * limit.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            buckets[key] = (tokens, now, now + (limit.capacity - tokens) / limit.rate)
+            if len(buckets) > self.max_keys:
+                self._prune(buckets, now)
+        return allowed, 0.0 if allowed else (1 - tokens) / limit.rate
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "keys": sum(len(buckets) for buckets, _ in self._shards)}
+
+
+# Refill and take in one round trip; the hash expires once the bucket would be full again
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 't', 's')
+local tokens = tonumber(bucket[1]) or capacity
+local stamp = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - stamp) * rate)
+local allowed = 0
+local retry = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 's', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(retry)}
+"""
+
+
+class RedisBackend:
+    """Token buckets in a Redis-compatible server, shared by every worker process."""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis needs the redis package (pip install redis)")
+        self._client = redis.asyncio.Redis.from_url(url)
+        self._script = self._client.register_script(TOKEN_BUCKET_SCRIPT)
+        self.errors = 0
+
+    async def take(self, key: str, limit: Limit) -> Tuple[bool, float]:
+        try:
+            allowed, retry = await self._script(keys=[f"ratelimit:{key}"],
+                                                args=[limit.capacity, limit.rate, time.time()])
+        except Exception as e:
+            # An unreachable store must not take the API down with it
+            self.errors += 1
+            print(f"Error checking rate limit: {e}")
+            return True, 0.0
+        return bool(allowed), float(retry)
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "errors": self.errors}
+
+
+def create_backend():
+    if RATE_LIMIT_BACKEND == "redis":
+        return RedisBackend(RATE_LIMIT_REDIS_URL)
+    return MemoryBackend(RATE_LIMIT_SHARDS, RATE_LIMIT_MAX_KEYS)
+
+
+async def _send_error(send, status_code: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _read_body(receive) -> Tuple[bytes, list]:
+    """Read the request body, returning it and the messages to replay to the app."""
+    messages, chunks, size = [], [], 0
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        size += len(chunks[-1])
+        if not message.get("more_body") or size > MAX_KEY_BODY:
+            break
+    return b"".join(chunks), messages
+
+
+def _username(headers: dict, body: bytes) -> Optional[str]:
+    content_type = headers.get(b"content-type", b"").decode("latin-1").split(";")[0].strip()
+    try:
+        if content_type == "application/x-www-form-urlencoded":
+            value = parse_qs(body.decode()).get("username", [None])[0]
+        elif content_type == "application/json":
+            data = json.loads(body)
+            value = data.get("username") if isinstance(data, dict) else None
+        else:
+            return None
+    except ValueError:
+        return None
+    return value.strip().lower() if isinstance(value, str) and value.strip() else None
+
+
+class RateLimiter:
+    def __init__(self, rules: Dict[Tuple[str, str], List[Limit]], backend):
+        self.rules = rules
+        self.backend = backend
+        self.limited = 0
+
+    def stats(self) -> dict:
+        return {"rules": len(self.rules), "limited": self.limited, **self.backend.stats()}
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        limits = self.limiter.rules.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if not limits:
+            return await self.app(scope, receive, send)
+
+        username = None
+        if any(limit.key == "username" for limit in limits):
+            body, messages = await _read_body(receive)
+            username = _username(dict(scope["headers"]), body)
+            upstream = receive
+
+            async def receive():
+                return messages.pop(0) if messages else await upstream()
+
+        client = scope.get("client")
+        identities = {"ip": client[0] if client else "unknown", "username": username}
+        route = f"{scope['method']} {scope['path']}"
+        for limit in limits:
+            identity = identities[limit.key]
+            if identity is None:
+                continue
+            allowed, retry_after = await self.limiter.backend.take(f"{route}:{limit.key}:{identity}", limit)
+            if not allowed:
+                self.limiter.limited += 1
+                return await _send_error(send, 429, "Too many requests, please retry later", retry_after)
+        await self.app(scope, receive, send)
+
+
+def _concurrency_cap() -> int:
+    if MAX_CONCURRENT_REQUESTS != "auto":
+        return int(MAX_CONCURRENT_REQUESTS)
+    if database.DATABASE_MODE != "sync":
+        # Async requests wait on pool connections, which DB_POOL_TIMEOUT already bounds
+        return 0
+    import anyio.to_thread
+    return int(anyio.to_thread.current_default_thread_limiter().total_tokens)
+
+
+class ConcurrencyLimiter:
+    def __init__(self, max_queue: int, timeout: float):
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.limit: Optional[int] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.shed = 0
+
+    async def acquire(self) -> bool:
+        """Take a request slot, waiting if needed; False means the request should be shed."""
+        if self.limit is None:
+            # Sized on the first request, once the event loop and threadpool exist
+            self.limit = _concurrency_cap()
+            self._slots = asyncio.Semaphore(self.limit) if self.limit > 0 else None
+        if self._slots is not None:
+            if self._slots.locked():
+                if self.waiting >= self.max_queue:
+                    self.shed += 1
+                    return False
+                self.waiting += 1
+                try:
+                    await asyncio.wait_for(self._slots.acquire(), self.timeout)
+                except asyncio.TimeoutError:
+                    self.shed += 1
+                    return False
+                finally:
+                    self.waiting -= 1
+            else:
+                await self._slots.acquire()
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "in_flight": self.in_flight, "waiting": self.waiting,
+                "queue_size": self.max_queue, "shed": self.shed}
+
+
+class ConcurrencyLimitMiddleware:
+    def __init__(self, app, limiter: ConcurrencyLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in UNLIMITED_PATHS:
+            return await self.app(scope, receive, send)
+        if not await self.limiter.acquire():
+            return await _send_error(send, 503, "Server is busy, please retry", 1)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release()
+
+
+rate_limiter = RateLimiter(parse_rules(RATE_LIMITS), create_backend())
+concurrency_limiter = ConcurrencyLimiter(LOAD_SHED_QUEUE_SIZE, LOAD_SHED_TIMEOUT)
@@ -0,0 +1,292 @@
+"""Project PDF reports, rendered in a process pool and cached on disk.
+
+A report's cache key is a hash of everything printed in it: the project
+row, its category and owner, plus `TEMPLATE_VERSION`. Any edit to those rows
+yields a new key. Nothing else goes into the file, not even the render date
+or reportlab's timestamps, so equal keys mean equal bytes. A repeat download only reads the project (one query) and
+serves the existing file without rendering. Concurrent requests for the same
+key share one render. Files for outdated keys are never read again, and the
+cache directory can be emptied at any time.
+"""
+from datetime import date
+from hashlib import sha256
+from typing import Dict, List, Optional
+import asyncio
+import json
+import os
+import zipfile
+
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from . import models, utils
+
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", "./report_cache")
+REPORT_POOL_SIZE = int(os.getenv("REPORT_POOL_SIZE", str(min(os.cpu_count() or 1, 2))))
+REPORT_QUEUE_SIZE = int(os.getenv("REPORT_QUEUE_SIZE", "32"))
+REPORT_BATCH_MAX = int(os.getenv("REPORT_BATCH_MAX", "500"))
+# Bump whenever the layout changes, so cached reports are rendered again
+TEMPLATE_VERSION = 2
+
+report_executor = utils.BoundedProcessPool(REPORT_POOL_SIZE, REPORT_QUEUE_SIZE)
+
+
+def _report_statement(ids: List[int]):
+    return (
+        select(
+            *models.AdminProject.__table__.columns,
+            models.Category.name.label("category"),
+            models.User.vorname.label("owner_vorname"),
+            models.User.nachname.label("owner_nachname"),
+            models.User.username.label("owner_username"),
+        )
+        .outerjoin(models.Category, models.AdminProject.category_id == models.Category.id)
+        .outerjoin(models.User, models.AdminProject.user_id == models.User.id)
+        .where(models.AdminProject.id.in_(ids))
+        .order_by(models.AdminProject.id)
+    )
+
+
+async def load_report_data(db, ids: List[int]) -> List[dict]:
+    """Everything a report prints, as plain picklable dicts."""
+    rows = (await db.execute(_report_statement(ids))).all()
+    data = []
+    for row in rows:
+        values = dict(row._mapping)
+        full_name = " ".join(filter(None, (values.pop("owner_vorname"), values.pop("owner_nachname"))))
+        username = values.pop("owner_username")
+        values["owner"] = full_name or username
+        if isinstance(values["end_date"], date):
+            values["end_date"] = values["end_date"].isoformat()
+        data.append(values)
+    return data
+
+
+def cache_key(data: dict) -> str:
+    payload = json.dumps([TEMPLATE_VERSION, data], sort_keys=True, default=str)
+    return sha256(payload.encode()).hexdigest()
+
+
+def cache_path(key: str) -> str:
+    return os.path.join(REPORT_CACHE_DIR, key[:2], f"{key}.pdf")
+
+
+def report_filename(data: dict) -> str:
+    code = "".join(c if c.isalnum() or c in "-_" else "_" for c in data["project_code"] or str(data["id"]))
+    return f"{code}_Bericht.pdf"
+
+
+def _german_date(value: Optional[str]) -> Optional[str]:
+    return date.fromisoformat(value).strftime("%d.%m.%Y") if value else None
+
+
+def render_report(data: dict, path: str):
+    """Render the PDF for `data` to `path`. Runs in a worker process."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.lib.utils import simpleSplit
+    from reportlab.pdfgen import canvas
+
+    width, height = A4
+    margin = 15 * mm
+    content_width = width - 2 * margin
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    pages = []
+
+    class NumberedCanvas(canvas.Canvas):
+        # Defers page output so the footer can print the total page count
+        def showPage(self):
+            pages.append(dict(self.__dict__))
+            self._startPage()
+
+        def save(self):
+            for state in pages:
+                self.__dict__.update(state)
+                self.setFont("Helvetica", 8)
+                self.setFillColorRGB(0.59, 0.59, 0.59)
+                self.drawCentredString(width / 2, 10 * mm, f"Seite {self._pageNumber} von {len(pages)}")
+                canvas.Canvas.showPage(self)
+            canvas.Canvas.save(self)
+
+    # invariant: fixed creation date and document id instead of the current time
+    pdf = NumberedCanvas(tmp_path, pagesize=A4, invariant=True)
+    pdf.setTitle(f"Projektbericht {data['project_code']}")
+
+    # Header
+    pdf.setFillColorRGB(25 / 255, 118 / 255, 210 / 255)
+    pdf.rect(0, height - 40 * mm, width, 40 * mm, stroke=0, fill=1)
+    pdf.setFillColorRGB(1, 1, 1)
+    pdf.setFont("Helvetica-Bold", 24)
+    pdf.drawString(margin, height - 15 * mm, "PROJEKTBERICHT")
+    pdf.setFont("Helvetica", 12)
+    pdf.drawString(margin, height - 28 * mm, data["project_code"] or "")
+
+    y = height - 50 * mm
+    pdf.setFillColorRGB(0, 0, 0)
+
+    def ensure_space(needed):
+        nonlocal y
+        if y - needed < 20 * mm:
+            pdf.showPage()
+            y = height - margin
+
+    def wrapped(text, x, max_width, font="Helvetica", size=10):
+        nonlocal y
+        for line in simpleSplit(text, font, size, max_width):
+            ensure_space(size * 0.5 * mm)
+            pdf.setFont(font, size)
+            pdf.drawString(x, y, line)
+            y -= size * 0.45 * mm
+
+    def heading(text):
+        nonlocal y
+        ensure_space(20 * mm)
+        pdf.setFont("Helvetica-Bold", 14)
+        pdf.drawString(margin, y, text)
+        y -= 8 * mm
+
+    # Title, status line and divider
+    wrapped(data["name"] or "", margin, content_width, "Helvetica-Bold", 18)
+    y -= 4 * mm
+    pdf.setFont("Helvetica", 10)
+    pdf.drawString(margin, y, f"Status: {data['status'] or '-'}")
+    pdf.drawString(margin + 50 * mm, y, f"Jahr: {data['year'] or '-'}")
+    y -= 8 * mm
+    pdf.setStrokeColorRGB(200 / 255, 200 / 255, 200 / 255)
+    pdf.line(margin, y, width - margin, y)
+    y -= 8 * mm
+
+    heading("Projekt-Details")
+    details = [
+        ("Projektnummer:", data["project_code"]),
+        ("Projektname:", data["name"]),
+        ("Status:", data["status"]),
+        ("Jahr:", data["year"]),
+        ("Typ:", data["type"]),
+        ("Größe:", data["size"]),
+        ("Farbe:", data["color"]),
+        ("Kategorie:", data["category"]),
+        ("Verantwortlich:", data["owner"]),
+        ("Enddatum:", _german_date(data["end_date"])),
+    ]
+    for label, value in details:
+        if value in (None, ""):
+            continue
+        ensure_space(6 * mm)
+        pdf.setFont("Helvetica-Bold", 10)
+        pdf.drawString(margin, y, label)
+        wrapped(str(value), margin + 50 * mm, content_width - 50 * mm)
+        y -= 2 * mm
+
+    if data["description"]:
+        y -= 4 * mm
+        heading("Beschreibung")
+        for paragraph in data["description"].splitlines():
+            wrapped(paragraph, margin, content_width)
+
+    pdf.showPage()
+    pdf.save()
+    # Readers only ever see complete files
+    os.replace(tmp_path, path)
+
+
+class ReportCache:
+    def __init__(self, executor: utils.BoundedProcessPool):
+        self.executor = executor
+        self._rendering: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.renders = 0
+
+    async def _render(self, key: str, data: dict, path: str):
+        try:
+            await self.executor.run(render_report, data, path)
+            self.renders += 1
+        finally:
+            self._rendering.pop(key, None)
+
+    async def get(self, data: dict) -> str:
+        """Path of the cached PDF for `data`, rendering it first when missing."""
+        key = cache_key(data)
+        path = cache_path(key)
+        if os.path.exists(path):
+            self.hits += 1
+            return path
+        task = self._rendering.get(key)
+        if task is None:
+            task = self._rendering[key] = asyncio.ensure_future(self._render(key, data, path))
+        # One caller disconnecting must not cancel the render the others wait for
+        await asyncio.shield(task)
+        return path
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "renders": self.renders, "rendering": len(self._rendering),
+                "executor": self.executor.stats()}
+
+
+report_cache = ReportCache(report_executor)
+
+
+class _ChunkWriter:
+    """A write-only, unseekable file for zipfile that hands out what was written so far."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def zip_reports(projects: List[dict]):
+    """Yield a zip archive of the reports for `projects`, rendering them concurrently.
+
+    Reports are added in the order they finish; at most one render per pool
+    worker runs at a time, so a batch never overflows the executor queue.
+    """
+    slots = asyncio.Semaphore(max(report_executor.max_workers, 1))
+
+    async def build(data):
+        async with slots:
+            try:
+                return data, await report_cache.get(data), None
+            except Exception as e:
+                return data, None, e
+
+    writer = _ChunkWriter()
+    tasks = [asyncio.ensure_future(build(data)) for data in projects]
+    try:
+        with zipfile.ZipFile(writer, "w", zipfile.ZIP_STORED) as archive:
+            for next_done in asyncio.as_completed(tasks):
+                data, path, error = await next_done
+                name = f"{data['id']}_{report_filename(data)}"
+                if error is not None:
+                    archive.writestr(f"{name}.error.txt", f"Report could not be rendered: {error}")
+                else:
+                    archive.write(path, name)
+                yield writer.take()
+        yield writer.take()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def check_batch(ids: List[int]):
+    if not ids:
+        raise HTTPException(status_code=400, detail="No project ids given")
+    if len(ids) > REPORT_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {REPORT_BATCH_MAX} reports per batch")
@@ -0,0 +1,139 @@
+"""In-process cache of serialized JSON responses for public endpoints.
+
+Entries are stored per namespace and query-string variant as ready-to-send
+bytes plus an ETag. Admin write routes call `bump(namespace)`, which advances
+the namespace generation and makes every older entry stale. Generations live
+in `generations`, so under `backend.serve` a bump reaches every worker.
+Concurrent misses for the same variant share a single rebuild.
+"""
+from collections import OrderedDict
+from functools import lru_cache
+from hashlib import blake2b
+from typing import Callable, Dict, Tuple
+import asyncio
+import os
+import threading
+import time
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import database
+from .generations import generations
+
+PUBLIC_CACHE_MAX_ENTRIES = int(os.getenv("PUBLIC_CACHE_MAX_ENTRIES", "256"))
+# Upper bound on staleness when a process outside this server wrote, e.g. another replica
+PUBLIC_CACHE_TTL = float(os.getenv("PUBLIC_CACHE_TTL", "60"))
+PUBLIC_CACHE_MAX_AGE = int(os.getenv("PUBLIC_CACHE_MAX_AGE", "0"))
+
+
+# Bounded, since sparse fieldsets generate response types per request
+@lru_cache(maxsize=256)
+def _adapter(response_type) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int, ttl: float, max_age: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_control = f"public, max-age={max_age}, must-revalidate"
+        self._namespaces = set()
+        self._entries: "OrderedDict[tuple, Tuple[int, float, bytes, str]]" = OrderedDict()
+        self._building: Dict[tuple, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def generation(self, namespace: str) -> int:
+        return generations.get(f"response:{namespace}")
+
+    def bump(self, *namespaces: str):
+        self._namespaces.update(namespaces)
+        generations.bump(*(f"response:{namespace}" for namespace in namespaces))
+
+    def _lookup(self, key: tuple, generation: int):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generation or entry[1] < time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _store(self, key: tuple, entry: tuple):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _serialize(self, response_type, build: Callable[[Session], object]) -> bytes:
+        adapter = _adapter(response_type)
+        db = database.SessionLocal()
+        try:
+            return adapter.dump_json(adapter.validate_python(build(db), from_attributes=True))
+        finally:
+            db.close()
+
+    async def _build_entry(self, key: tuple, generation: int, response_type, build):
+        body = await run_in_threadpool(self._serialize, response_type, build)
+        etag = '"' + blake2b(body, digest_size=16).hexdigest() + '"'
+        entry = (generation, time.monotonic() + self.ttl, body, etag)
+        self._store(key, entry)
+        return entry
+
+    async def _rebuild(self, key: tuple, generation: int, response_type, build):
+        flight = (key, generation)
+        task = self._building.get(flight)
+        if task is None:
+            # A separate task, so one client disconnecting doesn't fail the others
+            task = asyncio.ensure_future(self._build_entry(key, generation, response_type, build))
+            self._building[flight] = task
+            task.add_done_callback(lambda _: self._building.pop(flight, None))
+        return await asyncio.shield(task)
+
+    async def respond(self, request: Request, namespace: str, response_type, build: Callable[[Session], object]) -> Response:
+        """Serve `build(db)` serialized as `response_type`, from cache when possible.
+
+        On a miss `build` runs in the threadpool with its own session.
+        """
+        key = (namespace, tuple(sorted(request.query_params.multi_items())))
+        generation = self.generation(namespace)
+        entry = self._lookup(key, generation)
+        if entry is None:
+            self.misses += 1
+            entry = await self._rebuild(key, generation, response_type, build)
+        else:
+            self.hits += 1
+
+        _, _, body, etag = entry
+        headers = {"ETag": etag, "Cache-Control": self.cache_control}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "generations": {namespace: self.generation(namespace) for namespace in sorted(self._namespaces)},
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+
+def etag_matches(header, etag: str) -> bool:
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+response_cache = ResponseCache(PUBLIC_CACHE_MAX_ENTRIES, PUBLIC_CACHE_TTL, PUBLIC_CACHE_MAX_AGE)
@@ -1,7 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from .. import models, schemas, utils, database
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+from .. import models, schemas, utils, database, loaders, pool_stats, bulk, export, search, reports, profiling, serialization, dashboard
+from ..pagination import PageParams
+from ..fieldsets import FieldParams
+from ..filters import ProjectFilters, TaskFilters
+from ..response_cache import response_cache
 
 router = APIRouter(
     prefix="/api/admin",
@@ -10,150 +16,355 @@ router = APIRouter(
 
 # Categories
 @router.post("/categories", response_model=schemas.Category)
-def create_category(
-    category: schemas.CategoryCreate, 
-    db: Session = Depends(database.get_db),
+async def create_category(
+    category: schemas.CategoryCreate,
+    db: AsyncSession = Depends(database.get_async_db),
     current_user: models.User = Depends(utils.get_current_superuser)
 ):
     db_cat = models.Category(**category.model_dump())
     db.add(db_cat)
-    db.commit()
-    db.refresh(db_cat)
+    await db.commit()
+    response_cache.bump("categories")
+    await db.refresh(db_cat)
     return db_cat
 
-@router.get("/categories", response_model=List[schemas.Category])
-def read_categories(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(database.get_db)
+@router.get("/categories", response_model=Union[List[schemas.Category], schemas.Page[schemas.Category]])
+async def read_categories(
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    categories = db.query(models.Category).offset(skip).limit(limit).all()
-    return categories
+    return await serialization.list_response(db, select(models.Category), models.Category, schemas.Category, page)
 
 @router.delete("/categories/{category_id}")
-def delete_category(
-    category_id: int, 
-    db: Session = Depends(database.get_db),
+async def delete_category(
+    category_id: int,
+    db: AsyncSession = Depends(database.get_async_db),
     current_user: models.User = Depends(utils.get_current_superuser)
 ):
-    db_cat = db.query(models.Category).filter(models.Category.id == category_id).first()
+    db_cat = await db.get(models.Category, category_id)
     if not db_cat:
         raise HTTPException(status_code=404, detail="Category not found")
-    db.delete(db_cat)
-    db.commit()
+    await db.delete(db_cat)
+    await db.commit()
+    # Projects embed their category
+    response_cache.bump("categories", "projects")
     return {"ok": True}
 
 # Projects
 @router.post("/projects", response_model=schemas.Project)
-def create_project(
-    project: schemas.ProjectCreate, 
-    db: Session = Depends(database.get_db),
+async def create_project(
+    project: schemas.ProjectCreate,
+    db: AsyncSession = Depends(database.get_async_db),
     current_user: models.User = Depends(utils.get_current_superuser)
 ):
     db_project = models.AdminProject(**project.model_dump())
     db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    response_cache.bump("projects")
+    await loaders.refresh(db, db_project, schemas.Project)
     return db_project
 
-@router.get("/projects", response_model=List[schemas.Project])
-def read_projects(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(database.get_db)
+@router.post("/projects/bulk", response_model=schemas.BulkImportResult)
+async def import_projects(
+    request: Request,
+    batch_size: int = Query(bulk.BULK_BATCH_SIZE, ge=1, le=10000),
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(utils.get_current_superuser)
+):
+    """
+    Import projects from a JSON array, NDJSON or CSV body in one transaction.
+    """
+    result = await bulk.bulk_insert(db, request, models.AdminProject, schemas.ProjectCreate, batch_size)
+    response_cache.bump("projects")
+    return result
+
+@router.patch("/projects/bulk")
+async def update_projects(
+    project_update: schemas.ProjectBulkUpdate,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(utils.get_current_superuser)
+):
+    values = project_update.model_dump(exclude_unset=True, exclude={"ids"})
+    count = await bulk.update_by_ids(db, models.AdminProject, project_update.ids, values)
+    response_cache.bump("projects")
+    return {"ok": True, "updated": count}
+
+@router.post("/projects/bulk/delete")
+async def delete_projects(
+    body: schemas.BulkIds,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(utils.get_current_superuser)
 ):
-    projects = db.query(models.AdminProject).offset(skip).limit(limit).all()
-    return projects
+    count = await bulk.delete_by_ids(db, models.AdminProject, body.ids)
+    response_cache.bump("projects")
+    return {"ok": True, "deleted": count}
+
+# Declared before /projects/{project_id}, which would otherwise match "export"
+@router.get("/projects/export")
+async def export_projects(
+    request: Request,
+    params: export.ExportParams = Depends(),
+    current_user: models.User = Depends(utils.get_current_superuser)
+):
+    """
+    Stream all projects matching the filters as CSV or NDJSON; date filters apply to end_date.
+    """
+    columns = [column for column in models.AdminProject.__table__.columns]
+    return export.stream_export(request, models.AdminProject, columns, params, "projects")
+
+@router.get("/projects", response_model=Union[List[schemas.Project], schemas.Page[schemas.Project]])
+async def read_projects(
+    page: PageParams = Depends(),
+    filters: ProjectFilters = Depends(),
+    fields: FieldParams = Depends(),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    stmt = filters.apply(select(models.AdminProject), db.get_bind().dialect.name)
+    return await serialization.list_response(db, stmt, models.AdminProject, schemas.Project, page, fields)
 
 @router.get("/projects/{project_id}", response_model=schemas.Project)
-def read_project(
-    project_id: int, 
-    db: Session = Depends(database.get_db)
+async def read_project(
+    project_id: int,
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    project = db.query(models.AdminProject).filter(models.AdminProject.id == project_id).first()
+    project = await db.get(models.AdminProject, project_id, options=loaders.options_for(schemas.Project))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     return project
 
 @router.put("/projects/{project_id}", response_model=schemas.Project)
-def update_project(
+async def update_project(
     project_id: int,
     project_update: schemas.ProjectCreate,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
     current_user: models.User = Depends(utils.get_current_superuser)
 ):
-    db_project = db.query(models.AdminProject).filter(models.AdminProject.id == project_id).first()
+    db_project = await db.get(models.AdminProject, project_id)
     if not db_project:
         raise HTTPException(status_code=404, detail="Project not found")
-    
+
     for key, value in project_update.model_dump().items():
         setattr(db_project, key, value)
-    
-    db.commit()
-    db.refresh(db_project)
+
+    await db.commit()
+    response_cache.bump("projects")
+    await loaders.refresh(db, db_project, schemas.Project)
     return db_project
 
+@router.get("/projects/{project_id}/report")
+async def read_project_report(
+    project_id: int,
+    request: Request,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(utils.get_current_superuser)
+):
+    """
+    The project report as PDF; unchanged projects are served from the report cache.
+    """
+    projects = await reports.load_report_data(db, [project_id])
+    if not projects:
+        raise HTTPException(status_code=404, detail="Project not found")
+    data = projects[0]
+    etag = f'"{reports.cache_key(data)}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    path = await reports.report_cache.get(data)
+    return FileResponse(path, media_type="application/pdf", filename=reports.report_filename(data),
+                        headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+@router.post("/projects/reports")
+async def read_project_reports(
+    body: schemas.BulkIds,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(utils.get_current_superuser)
+):
+    """
+    Reports for many projects as a zip archive, rendered concurrently and streamed as they finish.
+    """
+    reports.check_batch(body.ids)
+    projects = await reports.load_report_data(db, body.ids)
+    if not projects:
+        raise HTTPException(status_code=404, detail="No project found")
+    return StreamingResponse(reports.zip_reports(projects), media_type="application/zip",
+                             headers={"Content-Disposition": 'attachment; filename="Projektberichte.zip"'})
+
 @router.delete("/projects/{project_id}")
-def delete_project(
-    project_id: int, 
-    db: Session = Depends(database.get_db),
+async def delete_project(
+    project_id: int,
+    db: AsyncSession = Depends(database.get_async_db),
     current_user: models.User = Depends(utils.get_current_superuser)
 ):
-    db_project = db.query(models.AdminProject).filter(models.AdminProject.id == project_id).first()
+    db_project = await db.get(models.AdminProject, project_id)
     if not db_project:
         raise HTTPException(status_code=404, detail="Project not found")
-    db.delete(db_project)
-    db.commit()
+    await db.delete(db_project)
+    await db.commit()
+    response_cache.bump("projects")
     return {"ok": True}
 
 # Customers (Kunde)
-@router.get("/customers", response_model=List[schemas.Kunde])
-def read_customers(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    return db.query(models.Kunde).offset(skip).limit(limit).all()
+@router.get("/customers", response_model=Union[List[schemas.Kunde], schemas.Page[schemas.Kunde]])
+async def read_customers(page: PageParams = Depends(), db: AsyncSession = Depends(database.get_async_db)):
+    return await serialization.list_response(db, select(models.Kunde), models.Kunde, schemas.Kunde, page)
 
 @router.post("/customers", response_model=schemas.Kunde)
-def create_customer(item: schemas.KundeCreate, db: Session = Depends(database.get_db)):
+async def create_customer(item: schemas.KundeCreate, db: AsyncSession = Depends(database.get_async_db)):
     db_item = models.Kunde(**item.model_dump())
     db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
+    await db.commit()
+    await db.refresh(db_item)
     return db_item
 
+@router.post("/customers/bulk", response_model=schemas.BulkImportResult)
+async def import_customers(
+    request: Request,
+    batch_size: int = Query(bulk.BULK_BATCH_SIZE, ge=1, le=10000),
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(utils.get_current_superuser)
+):
+    return await bulk.bulk_insert(db, request, models.Kunde, schemas.KundeCreate, batch_size)
+
+@router.post("/customers/bulk/delete")
+async def delete_customers(
+    body: schemas.BulkIds,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(utils.get_current_superuser)
+):
+    return {"ok": True, "deleted": await bulk.delete_by_ids(db, models.Kunde, body.ids)}
+
 # Products (Ware)
-@router.get("/products", response_model=List[schemas.Ware])
-def read_products(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    return db.query(models.Ware).offset(skip).limit(limit).all()
+@router.get("/products", response_model=Union[List[schemas.Ware], schemas.Page[schemas.Ware]])
+async def read_products(page: PageParams = Depends(), db: AsyncSession = Depends(database.get_async_db)):
+    return await serialization.list_response(db, select(models.Ware), models.Ware, schemas.Ware, page)
 
 @router.post("/products", response_model=schemas.Ware)
-def create_product(item: schemas.WareCreate, db: Session = Depends(database.get_db)):
+async def create_product(item: schemas.WareCreate, db: AsyncSession = Depends(database.get_async_db)):
     db_item = models.Ware(**item.model_dump())
     db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
+    await db.commit()
+    await db.refresh(db_item)
     return db_item
 
+@router.post("/products/bulk", response_model=schemas.BulkImportResult)
+async def import_products(
+    request: Request,
+    batch_size: int = Query(bulk.BULK_BATCH_SIZE, ge=1, le=10000),
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(utils.get_current_superuser)
+):
+    return await bulk.bulk_insert(db, request, models.Ware, schemas.WareCreate, batch_size)
+
+@router.post("/products/bulk/delete")
+async def delete_products(
+    body: schemas.BulkIds,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(utils.get_current_superuser)
+):
+    return {"ok": True, "deleted": await bulk.delete_by_ids(db, models.Ware, body.ids)}
+
 # Tasks (Aufgabe)
-@router.get("/tasks", response_model=List[schemas.Aufgabe])
-def read_tasks(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    return db.query(models.Aufgabe).offset(skip).limit(limit).all()
+@router.get("/tasks", response_model=Union[List[schemas.Aufgabe], schemas.Page[schemas.Aufgabe]])
+async def read_tasks(
+    page: PageParams = Depends(),
+    filters: TaskFilters = Depends(),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    stmt = filters.apply(select(models.Aufgabe), db.get_bind().dialect.name)
+    return await serialization.list_response(db, stmt, models.Aufgabe, schemas.Aufgabe, page)
 
 @router.post("/tasks", response_model=schemas.Aufgabe)
-def create_task(item: schemas.AufgabeCreate, db: Session = Depends(database.get_db)):
+async def create_task(item: schemas.AufgabeCreate, db: AsyncSession = Depends(database.get_async_db)):
     db_item = models.Aufgabe(**item.model_dump())
     db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
+    await db.commit()
+    await db.refresh(db_item)
     return db_item
 
+@router.post("/tasks/bulk", response_model=schemas.BulkImportResult)
+async def import_tasks(
+    request: Request,
+    batch_size: int = Query(bulk.BULK_BATCH_SIZE, ge=1, le=10000),
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(utils.get_current_superuser)
+):
+    return await bulk.bulk_insert(db, request, models.Aufgabe, schemas.AufgabeCreate, batch_size)
+
+@router.post("/tasks/bulk/delete")
+async def delete_tasks(
+    body: schemas.BulkIds,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(utils.get_current_superuser)
+):
+    return {"ok": True, "deleted": await bulk.delete_by_ids(db, models.Aufgabe, body.ids)}
+
 # Documents (Dokument)
-@router.get("/documents", response_model=List[schemas.Dokument])
-def read_documents(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    return db.query(models.Dokument).offset(skip).limit(limit).all()
+@router.get("/documents", response_model=Union[List[schemas.Dokument], schemas.Page[schemas.Dokument]])
+async def read_documents(page: PageParams = Depends(), db: AsyncSession = Depends(database.get_async_db)):
+    return await serialization.list_response(db, select(models.Dokument), models.Dokument, schemas.Dokument, page)
 
 @router.post("/documents", response_model=schemas.Dokument)
-def create_document(item: schemas.DokumentCreate, db: Session = Depends(database.get_db)):
+async def create_document(item: schemas.DokumentCreate, db: AsyncSession = Depends(database.get_async_db)):
     db_item = models.Dokument(**item.model_dump())
     db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
+    await db.commit()
+    await db.refresh(db_item)
     return db_item
+
+# Search
+@router.get("/search", response_model=schemas.SearchResults)
+async def search_all(
+    q: str = Query(..., min_length=1, max_length=200),
+    type: Optional[str] = Query(None, pattern="^(project|request)$", description="Restrict to one entity"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(utils.get_current_superuser)
+):
+    """
+    Ranked full-text search over projects and contact requests; every word must match as a prefix.
+    """
+    kinds = [type] if type else list(search.TARGETS)
+    return await search.search(db, q, kinds, skip, limit)
+
+# Dashboard
+@router.get("/dashboard", response_model=schemas.Dashboard)
+async def read_dashboard(
+    source: Optional[str] = Query(None, pattern="^(counters|query)$", description="Default: counters with DASHBOARD_COUNTERS=1, else query"),
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(utils.get_current_superuser)
+):
+    """
+    Projects by status and year, contact requests by status, tasks by status and priority.
+    """
+    if source == "counters" and not dashboard.DASHBOARD_COUNTERS:
+        raise HTTPException(status_code=400, detail="Dashboard counters are disabled (DASHBOARD_COUNTERS=0)")
+    return await dashboard.counts(db, source)
+
+# Diagnostics
+@router.get("/diagnostics/pools")
+async def read_pool_diagnostics(current_user: models.User = Depends(utils.get_current_superuser)):
+    """
+    Connection pool statistics per engine, for sizing DB_POOL_SIZE / DB_MAX_OVERFLOW.
+    """
+    return pool_stats.snapshot()
+
+@router.get("/profiles")
+async def read_profiles(current_user: models.User = Depends(utils.get_current_superuser)):
+    """
+    Recently profiled requests, newest first. Send `X-Profile: 1` with a request to profile it.
+    """
+    return [profile.summary() for profile in reversed(profiling.profiles)]
+
+@router.get("/profiles/{profile_id}")
+async def read_profile(
+    profile_id: int,
+    current_user: models.User = Depends(utils.get_current_superuser)
+):
+    """
+    A profile as speedscope JSON: sampled stacks plus the request's SQL statements.
+    """
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return JSONResponse(profile.speedscope(),
+                        headers={"Content-Disposition": f'attachment; filename="profile-{profile.id}.speedscope.json"'})
@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from .. import models, schemas, utils, database
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models, schemas, utils, database, serialization
+from ..fieldsets import FieldParams
+from ..pagination import PageParams
 from datetime import timedelta
+from typing import Union
 
 router = APIRouter(
     prefix="/api/auth",
@@ -10,12 +14,14 @@ router = APIRouter(
 )
 
 @router.post("/register", response_model=schemas.User)
-def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(database.get_async_db)):
+    db_user = (await db.execute(select(models.User).where(models.User.username == user.username))).scalars().first()
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    hashed_password = utils.get_password_hash(user.password)
+    # Hand the connection back to the pool while bcrypt runs
+    await db.close()
+    hashed_password = await utils.get_password_hash_async(user.password)
     new_user = models.User(
         username=user.username,
         email=user.email,
@@ -24,14 +30,16 @@ def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
         is_superuser=False
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 @router.post("/login", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.username == form_data.username).first()
-    if not user or not utils.verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(database.get_async_db)):
+    user = (await db.execute(select(models.User).where(models.User.username == form_data.username))).scalars().first()
+    # Hand the connection back to the pool while bcrypt runs
+    await db.close()
+    if not user or not await utils.verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -47,7 +55,10 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
 async def read_users_me(current_user: models.User = Depends(utils.get_current_active_user)):
     return current_user
 
-@router.get("/users", response_model=list[schemas.User])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    users = db.query(models.User).offset(skip).limit(limit).all()
-    return users
+@router.get("/users", response_model=Union[list[schemas.User], schemas.Page[schemas.User]])
+async def read_users(
+    page: PageParams = Depends(),
+    fields: FieldParams = Depends(),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    return await serialization.list_response(db, select(models.User), models.User, schemas.User, page, fields)
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from .. import models, schemas, utils, database
+from .. import models, schemas, utils, database, serialization
 
 router = APIRouter(
     prefix="/api/client",
@@ -9,29 +10,31 @@ router = APIRouter(
 )
 
 @router.get("/projects", response_model=List[schemas.Project])
-def read_my_projects(
-    db: Session = Depends(database.get_db),
+async def read_my_projects(
+    db: AsyncSession = Depends(database.get_async_db),
     current_user: models.User = Depends(utils.get_current_active_user)
 ):
     """
     Get all projects assigned to the current user.
     """
-    return current_user.projects
+    stmt = select(models.AdminProject).where(models.AdminProject.user_id == current_user.id)
+    return await serialization.list_response(db, stmt, models.AdminProject, schemas.Project)
 
 @router.get("/requests", response_model=List[schemas.ContactRequest])
-def read_my_requests(
-    db: Session = Depends(database.get_db),
+async def read_my_requests(
+    db: AsyncSession = Depends(database.get_async_db),
     current_user: models.User = Depends(utils.get_current_active_user)
 ):
     """
     Get all contact requests made by the current user.
     """
-    return current_user.requests
+    stmt = select(models.ContactRequest).where(models.ContactRequest.user_id == current_user.id)
+    return await serialization.list_response(db, stmt, models.ContactRequest, schemas.ContactRequest)
 
 @router.patch("/profile", response_model=schemas.User)
-def update_my_profile(
+async def update_my_profile(
     user_update: schemas.UserUpdate,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
     current_user: models.User = Depends(utils.get_current_active_user)
 ):
     """
@@ -55,6 +58,6 @@ def update_my_profile(
     for key, value in update_data.items():
         setattr(current_user, key, value)
 
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
     return current_user
@@ -1,50 +1,93 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from .. import models, schemas, utils, database
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+from .. import models, schemas, utils, database, loaders, bulk, export, ingest, serialization
+from ..pagination import PageParams
+from ..fieldsets import FieldParams
+from ..filters import ContactRequestFilters
 
 router = APIRouter(
     prefix="/api/contact",
     tags=["contact"],
 )
 
-@router.post("/requests", response_model=schemas.ContactRequest)
-def create_request(
-    request: schemas.ContactRequestCreate, 
-    db: Session = Depends(database.get_db)
+@router.post("/requests", response_model=Union[schemas.ContactRequest, schemas.ContactRequestReceipt])
+async def create_request(
+    request: schemas.ContactRequestCreate,
+    response: Response,
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     # Public endpoint to submit request
+    if ingest.CONTACT_WRITE_BEHIND:
+        response.status_code = status.HTTP_202_ACCEPTED
+        # The receipt is written with the row, so the submission can be found once its batch commits
+        values = {**request.model_dump(), "receipt": models.new_receipt()}
+        ingest.contact_queue.submit(values)
+        return {"receipt": values["receipt"], "status": "queued"}
     db_request = models.ContactRequest(**request.model_dump())
     db.add(db_request)
-    db.commit()
-    db.refresh(db_request)
+    await db.commit()
+    await loaders.refresh(db, db_request, schemas.ContactRequest)
     return db_request
 
-@router.get("/requests", response_model=List[schemas.ContactRequest])
-def read_requests(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(database.get_db),
+@router.get("/requests", response_model=Union[List[schemas.ContactRequest], schemas.Page[schemas.ContactRequest]])
+async def read_requests(
+    page: PageParams = Depends(),
+    filters: ContactRequestFilters = Depends(),
+    fields: FieldParams = Depends(),
+    db: AsyncSession = Depends(database.get_async_db),
     current_user: models.User = Depends(utils.get_current_superuser)
 ):
-    requests = db.query(models.ContactRequest).offset(skip).limit(limit).all()
-    return requests
+    stmt = filters.apply(select(models.ContactRequest), db.get_bind().dialect.name)
+    return await serialization.list_response(db, stmt, models.ContactRequest, schemas.ContactRequest, page, fields)
+
+@router.get("/requests/export")
+async def export_requests(
+    request: Request,
+    params: export.ExportParams = Depends(),
+    current_user: models.User = Depends(utils.get_current_superuser)
+):
+    """
+    Stream all contact requests matching the filters as CSV or NDJSON; date filters apply to created_at.
+    """
+    columns = [column for column in models.ContactRequest.__table__.columns]
+    return export.stream_export(request, models.ContactRequest, columns, params, "contact_requests")
+
+# Declared before /requests/{request_id}, which would otherwise match "bulk"
+@router.patch("/requests/bulk")
+async def update_requests(
+    request_update: schemas.ContactRequestBulkUpdate,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(utils.get_current_superuser)
+):
+    values = request_update.model_dump(exclude_unset=True, exclude={"ids"})
+    count = await bulk.update_by_ids(db, models.ContactRequest, request_update.ids, values)
+    return {"ok": True, "updated": count}
+
+@router.post("/requests/bulk/delete")
+async def delete_requests(
+    body: schemas.BulkIds,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(utils.get_current_superuser)
+):
+    return {"ok": True, "deleted": await bulk.delete_by_ids(db, models.ContactRequest, body.ids)}
 
 @router.patch("/requests/{request_id}", response_model=schemas.ContactRequest)
-def update_request_status(
+async def update_request_status(
     request_id: int,
     request_update: schemas.ContactRequestUpdate,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
     current_user: models.User = Depends(utils.get_current_superuser)
 ):
-    db_request = db.query(models.ContactRequest).filter(models.ContactRequest.id == request_id).first()
+    db_request = await db.get(models.ContactRequest, request_id)
     if not db_request:
         raise HTTPException(status_code=404, detail="Request not found")
-    
+
     update_data = request_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_request, key, value)
-    
-    db.commit()
-    db.refresh(db_request)
+
+    await db.commit()
+    await loaders.refresh(db, db_request, schemas.ContactRequest)
     return db_request
@@ -1,35 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from .. import database, models, schemas
+from typing import List, Optional, Union
+from .. import database, models, schemas, loaders
+from ..fieldsets import FieldParams, list_type, load_options
+from ..pagination import PageParams, paginate_sync, sort_column
+from ..response_cache import response_cache
 
 router = APIRouter(
     prefix="/api/public",
     tags=["public"],
 )
 
-@router.get("/projects", response_model=List[schemas.Project])
-def read_public_projects(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(database.get_db)
+ProjectList = Union[List[schemas.Project], schemas.Page[schemas.Project]]
+CategoryList = Union[List[schemas.Category], schemas.Page[schemas.Category]]
+
+@router.get("/projects", response_model=ProjectList)
+async def read_public_projects(
+    request: Request,
+    page: PageParams = Depends(),
+    fields: FieldParams = Depends()
 ):
     """
     Get all public projects (for landing page).
+
+    The landing page only needs `fields=name,year,color&include=category`.
     """
     # Assuming all projects are public for now, or filter by status 'Completed' if needed.
     # For now returning all to match user request.
-    projects = db.query(models.AdminProject).offset(skip).limit(limit).all()
-    return projects
-
-@router.get("/categories", response_model=List[schemas.Category])
-def read_public_categories(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(database.get_db)
+    schema = fields.schema(schemas.Project, models.AdminProject)
+    if schema is schemas.Project:
+        options, response_type = loaders.options_for(schemas.Project), ProjectList
+    else:
+        sort = sort_column(models.AdminProject, page)
+        options = load_options(models.AdminProject, schema, () if sort is None else (sort,))
+        response_type = list_type(schema)
+
+    def build(db: Session):
+        stmt = select(models.AdminProject).options(*options)
+        return paginate_sync(db, stmt, models.AdminProject, page)
+
+    return await response_cache.respond(request, "projects", response_type, build)
+
+@router.get("/categories", response_model=CategoryList)
+async def read_public_categories(
+    request: Request,
+    page: PageParams = Depends()
 ):
     """
     Get all categories (services).
     """
-    categories = db.query(models.Category).offset(skip).limit(limit).all()
-    return categories
+    def build(db: Session):
+        return paginate_sync(db, select(models.Category), models.Category, page)
+
+    return await response_cache.respond(request, "categories", CategoryList, build)
@@ -1,7 +1,66 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, BeforeValidator
+from typing import Annotated, Any, Dict, Optional, List, Generic, TypeVar, Union
 from datetime import date, datetime
 
+T = TypeVar("T")
+
+# A flag stored as NULL, e.g. by rows written outside the ORM, reads as False; kept by sparse fieldsets
+NullAsFalse = Annotated[bool, BeforeValidator(lambda value: False if value is None else value)]
+
+# Cursor pagination envelope
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+# Batch Schemas: GET sub-requests of /api/batch and their responses, in request order
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    url: str
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem]
+
+class BatchResult(BaseModel):
+    id: Optional[str] = None
+    status: int
+    body: Any = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchResult]
+
+# Bulk Schemas
+class BulkRowError(BaseModel):
+    row: int
+    errors: Union[str, List[dict]]
+
+class BulkImportResult(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkRowError]
+
+class BulkIds(BaseModel):
+    ids: List[int]
+
+# Search Schemas
+class SearchHit(BaseModel):
+    type: str
+    id: int
+    title: str
+    snippet: str
+    score: float
+
+class SearchResults(BaseModel):
+    items: List[SearchHit]
+    next_skip: Optional[int] = None
+
+# Admin dashboard: row counts per value, e.g. projects["status"]["planned"]
+class Dashboard(BaseModel):
+    source: str
+    totals: Dict[str, int]
+    projects: Dict[str, Dict[str, int]]
+    requests: Dict[str, Dict[str, int]]
+    tasks: Dict[str, Dict[str, int]]
+
 # User Schemas
 class UserBase(BaseModel):
     username: str
@@ -23,7 +82,7 @@ class UserUpdate(BaseModel):
 
 class User(UserBase):
     id: int
-    is_superuser: bool = False
+    is_superuser: NullAsFalse = False
     
     class Config:
         from_attributes = True
@@ -67,6 +126,12 @@ class ProjectBase(BaseModel):
 class ProjectCreate(ProjectBase):
     pass
 
+class ProjectBulkUpdate(BulkIds):
+    status: Optional[str] = None
+    year: Optional[int] = None
+    category_id: Optional[int] = None
+    user_id: Optional[int] = None
+
 class Project(ProjectBase):
     id: int
     category: Optional[Category] = None
@@ -140,15 +205,23 @@ class ContactRequestBase(BaseModel):
 class ContactRequestCreate(ContactRequestBase):
     pass
 
+class ContactRequestReceipt(BaseModel):
+    receipt: str
+    status: str = "queued"
+
 class ContactRequestUpdate(BaseModel):
     status: Optional[str] = None
     message_admin: Optional[str] = None
 
+class ContactRequestBulkUpdate(ContactRequestUpdate, BulkIds):
+    pass
+
 class ContactRequest(ContactRequestBase):
     id: int
     status: str
     message_admin: Optional[str] = None
     created_at: datetime
+    receipt: Optional[str] = None
     category: Optional[Category] = None
     user: Optional[User] = None
 
@@ -0,0 +1,252 @@
+"""Full-text search over projects and contact requests.
+
+SQLite gets one external-content FTS5 table per entity, kept in sync with the
+base table by triggers. Postgres gets a generated `search_vector` tsvector
+column with a GIN index. Both are installed when the schema is created (an
+`after_create` hook on the metadata). An index created on a database that
+already has rows is filled right away. `python -m backend.search rebuild`
+rebuilds it from scratch.
+
+Search terms are matched as prefixes and must all occur. The database ranks
+the matches of both entities together and returns one page of ids. Titles and
+snippets are then built for that page only: HTML-escaped, with matching words
+wrapped in `<mark>`.
+"""
+from typing import List, Optional, Tuple
+import argparse
+import html
+import os
+import re
+import unicodedata
+
+from fastapi import HTTPException
+from sqlalchemy import event, select, text
+
+from .database import Base
+
+# Postgres text search configuration; "simple" does no stemming, which suits mixed German/English text
+SEARCH_TS_CONFIG = os.getenv("SEARCH_TS_CONFIG", "simple")
+
+# Words of context in a result snippet
+SNIPPET_WORDS = int(os.getenv("SEARCH_SNIPPET_WORDS", "24"))
+
+# Indexed columns per searchable entity; `weights` rank matches in earlier columns higher
+TARGETS = {
+    "project": {
+        "table": "admin_projects",
+        "columns": ("project_code", "name", "description"),
+        "weights": (4.0, 2.0, 1.0),
+        "pg_weights": ("A", "A", "C"),
+        "title": "name",
+    },
+    "request": {
+        "table": "contact_requests",
+        "columns": ("name", "email", "reason", "message"),
+        "weights": (2.0, 2.0, 2.0, 1.0),
+        "pg_weights": ("A", "A", "B", "C"),
+        "title": "name",
+    },
+}
+
+
+def _fts_table(target: dict) -> str:
+    return f"{target['table']}_fts"
+
+
+def _sqlite_ddl(target: dict) -> List[str]:
+    table, fts = target["table"], _fts_table(target)
+    columns = ", ".join(target["columns"])
+    new = ", ".join(f"new.{c}" for c in target["columns"])
+    old = ", ".join(f"old.{c}" for c in target["columns"])
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, content='{table}', "
+        f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old}); END",
+        # Only edits of indexed columns touch the index, so status changes stay cheap
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new}); END",
+    ]
+
+
+def _pg_vector(target: dict) -> str:
+    return " || ".join(
+        f"setweight(to_tsvector('{SEARCH_TS_CONFIG}'::regconfig, coalesce({column}, '')), '{weight}')"
+        for column, weight in zip(target["columns"], target["pg_weights"])
+    )
+
+
+def _pg_ddl(target: dict) -> List[str]:
+    table = target["table"]
+    return [
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({_pg_vector(target)}) STORED",
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING gin (search_vector)",
+    ]
+
+
+def _sqlite_rebuild(connection, target: dict):
+    fts = _fts_table(target)
+    connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+    connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('optimize')"))
+
+
+def install(connection):
+    """Create the search index, triggers and columns if missing; fill new SQLite indexes."""
+    dialect = connection.dialect.name
+    for target in TARGETS.values():
+        if dialect == "sqlite":
+            exists = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": _fts_table(target)},
+            ).first()
+            for statement in _sqlite_ddl(target):
+                connection.execute(text(statement))
+            if not exists:
+                _sqlite_rebuild(connection, target)
+        elif dialect == "postgresql":
+            # The generated column is computed for existing rows when it is added
+            for statement in _pg_ddl(target):
+                connection.execute(text(statement))
+
+
+def rebuild(connection):
+    """Re-index every row, e.g. after restoring a dump without the triggers."""
+    dialect = connection.dialect.name
+    install(connection)
+    for target in TARGETS.values():
+        if dialect == "sqlite":
+            _sqlite_rebuild(connection, target)
+        elif dialect == "postgresql":
+            connection.execute(text(f"REINDEX INDEX ix_{target['table']}_search"))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_after_create(target, connection, **kw):
+    install(connection)
+
+
+def _terms(query: str) -> List[str]:
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query has no searchable words")
+    return terms
+
+
+def _sqlite_arm(kind: str, target: dict) -> str:
+    fts = _fts_table(target)
+    weights = ", ".join(str(w) for w in target["weights"])
+    return f"SELECT '{kind}' AS type, rowid AS id, -bm25({fts}, {weights}) AS score FROM {fts} WHERE {fts} MATCH :query"
+
+
+def _pg_arm(kind: str, target: dict) -> str:
+    return (
+        f"SELECT '{kind}' AS type, id, ts_rank_cd(search_vector, q.tsq) AS score "
+        f"FROM {target['table']}, q WHERE search_vector @@ q.tsq"
+    )
+
+
+def search_statement(dialect_name: str, query: str, kinds: List[str], skip: int, limit: int):
+    """The ranked `(type, id, score)` page as `(text clause, params)`; one row beyond `limit` signals a next page."""
+    terms = _terms(query)
+    params = {"limit": limit + 1, "skip": skip}
+    if dialect_name == "postgresql":
+        params["query"] = " & ".join(f"{term}:*" for term in terms)
+        arms = " UNION ALL ".join(_pg_arm(kind, TARGETS[kind]) for kind in kinds)
+        sql = (
+            f"WITH q AS (SELECT to_tsquery('{SEARCH_TS_CONFIG}'::regconfig, :query) AS tsq) "
+            f"SELECT type, id, score FROM ({arms}) hits ORDER BY score DESC, type, id LIMIT :limit OFFSET :skip"
+        )
+        return text(sql), params
+    params["query"] = " ".join(f'"{term}"*' for term in terms)
+    arms = " UNION ALL ".join(_sqlite_arm(kind, TARGETS[kind]) for kind in kinds)
+    return text(f"{arms} ORDER BY score DESC, type, id LIMIT :limit OFFSET :skip"), params
+
+
+def _fold(word: str) -> str:
+    # Same matching rules as the index: case-insensitive, diacritics ignored
+    return "".join(c for c in unicodedata.normalize("NFKD", word) if not unicodedata.combining(c)).lower()
+
+
+def _highlight(value: Optional[str], terms: List[str], max_words: Optional[int] = None) -> Tuple[str, bool]:
+    """HTML-escape `value` and wrap words starting with a term in <mark>.
+
+    With `max_words`, only a window of that many words around the first match is kept.
+    """
+    # Odd positions hold words, even positions the text between them
+    parts = re.split(r"(\w+)", value or "")
+    matches = [i for i in range(1, len(parts), 2) if any(_fold(parts[i]).startswith(t) for t in terms)]
+    first, last, prefix, suffix = 0, len(parts), "", ""
+    if max_words is not None and len(parts) > 2 * max_words:
+        center = matches[0] if matches else 1
+        first = max(min(center - max_words // 4 * 2, len(parts) - 2 * max_words), 1)
+        last = first + 2 * max_words - 1
+        if last >= len(parts) - 1:
+            last = len(parts)
+        prefix = "… " if first > 1 else ""
+        suffix = " …" if last < len(parts) else ""
+    marked = set(matches)
+    body = "".join(
+        f"<mark>{html.escape(part)}</mark>" if i in marked else html.escape(part)
+        for i, part in enumerate(parts[first:last], start=first)
+    )
+    return prefix + body.strip() + suffix, bool(matches)
+
+
+def _snippet(row, target: dict, terms: List[str]) -> str:
+    candidates = [row._mapping[column] for column in target["columns"] if column != target["title"]]
+    fallback = ""
+    for value in candidates:
+        if not value:
+            continue
+        snippet, matched = _highlight(value, terms, SNIPPET_WORDS)
+        if matched:
+            return snippet
+        # Without a match in the body, show the start of the last (main text) column
+        fallback = snippet
+    return fallback
+
+
+async def search(db, query: str, kinds: List[str], skip: int, limit: int) -> dict:
+    stmt, params = search_statement(db.get_bind().dialect.name, query, kinds, skip, limit)
+    hits = (await db.execute(stmt, params)).all()
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+
+    # Highlights come from the page's rows only, however many rows matched
+    terms = [_fold(term) for term in _terms(query)]
+    texts = {}
+    for kind in {hit.type for hit in hits}:
+        target = TARGETS[kind]
+        table = Base.metadata.tables[target["table"]]
+        ids = [hit.id for hit in hits if hit.type == kind]
+        rows = (await db.execute(select(table.c.id, *(table.c[c] for c in target["columns"])).where(table.c.id.in_(ids)))).all()
+        texts.update({(kind, row.id): row for row in rows})
+
+    items = []
+    for hit in hits:
+        row, target = texts.get((hit.type, hit.id)), TARGETS[hit.type]
+        if row is None:
+            continue
+        items.append({
+            "type": hit.type,
+            "id": hit.id,
+            "title": _highlight(row._mapping[target["title"]], terms)[0],
+            "snippet": _snippet(row, target, terms),
+            "score": float(hit.score),
+        })
+    return {"items": items, "next_skip": skip + limit if has_more else None}
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    parser = argparse.ArgumentParser(description="Manage the full-text search index")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+    with engine.begin() as connection:
+        rebuild(connection)
+    print("Search index rebuilt.")
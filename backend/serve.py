@@ -0,0 +1,598 @@
+"""Multi-process server: `python -m backend.serve`.
+
+The supervisor binds the listening socket, imports the app once (preload)
+and forks WEB_CONCURRENCY workers, which default to the CPUs the container
+may use. Each worker runs uvicorn on the shared socket, so the kernel spreads
+connections across them, and a worker blocked on CPU only stalls its own
+requests. With preload the forked workers share the imported code, and the
+schema check runs once in the supervisor before they start.
+
+Every worker sends a heartbeat from its event loop once a second. The
+supervisor restarts workers that exit and kills ones whose heartbeat stops for
+SERVE_WORKER_TIMEOUT seconds. A worker that fails during startup is retried
+with backoff; if none has ever started, the supervisor exits with status 1.
+The supervisor writes its view of the workers to a JSON file, which every
+worker serves at `/api/health/workers`.
+
+Autoscaling: with SERVE_MIN_WORKERS below or SERVE_MAX_WORKERS above the
+starting count, the supervisor averages the requests in flight per worker
+from the heartbeats. One worker is added when the average stays at or above
+SERVE_SCALE_UP_LOAD for SCALE_UP_WINDOW seconds, and one is removed when it
+stays below SERVE_SCALE_DOWN_LOAD for SCALE_DOWN_WINDOW seconds. The
+supervisor only measures while every worker serves and no reload is under way.
+
+Cache invalidation reaches every worker: the supervisor creates the counter
+file of `backend.generations` before the workers start.
+
+Workers take the client address from `X-Forwarded-For` / `X-Forwarded-Proto`
+only for connections from FORWARDED_ALLOW_IPS (default 127.0.0.1). Behind a
+proxy at another address, set it to the proxy's address, or `*` if only the
+proxy can reach the workers. Otherwise every client has the proxy's address,
+and the per-IP rate limits put them all in one bucket.
+
+Signals to the supervisor:
+- SIGHUP: rolling reload. One at a time, a new worker is started, and its
+  predecessor is stopped once the new one serves. Without preload the new
+  workers import the code afresh.
+- SIGTTIN / SIGTTOU: one worker more / less.
+- SIGTERM / SIGINT: stop the workers gracefully, then exit. A second one kills them.
+"""
+from collections import deque
+from typing import Dict, Optional, Tuple
+import argparse
+import asyncio
+import json
+import math
+import os
+import selectors
+import signal
+import sys
+import tempfile
+import time
+import traceback
+
+import uvicorn
+from uvicorn.importer import import_from_string
+
+SERVE_HOST = os.getenv("SERVE_HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+SERVE_PRELOAD = os.getenv("SERVE_PRELOAD", "1") == "1"
+# Autoscaling bounds; both default to the starting worker count, which turns autoscaling off
+SERVE_MIN_WORKERS = int(os.getenv("SERVE_MIN_WORKERS", "0"))
+SERVE_MAX_WORKERS = int(os.getenv("SERVE_MAX_WORKERS", "0"))
+# Average requests in flight per worker that add / remove a worker
+SERVE_SCALE_UP_LOAD = float(os.getenv("SERVE_SCALE_UP_LOAD", "4"))
+SERVE_SCALE_DOWN_LOAD = float(os.getenv("SERVE_SCALE_DOWN_LOAD", "0.5"))
+# Comma-separated proxy addresses whose forwarded headers are trusted, "*" for any
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+# Seconds without a heartbeat before a serving worker counts as hung
+SERVE_WORKER_TIMEOUT = float(os.getenv("SERVE_WORKER_TIMEOUT", "30"))
+# Seconds a stopping worker gets for open requests and its shutdown hooks
+SERVE_GRACEFUL_TIMEOUT = int(os.getenv("SERVE_GRACEFUL_TIMEOUT", "30"))
+# Seconds a replacement worker gets to start serving before a reload is abandoned
+SERVE_BOOT_TIMEOUT = float(os.getenv("SERVE_BOOT_TIMEOUT", "120"))
+HEARTBEAT_INTERVAL = 1
+# Longest time a stopping worker waits for clients to drop their keep-alive connections
+DRAIN_TIMEOUT = 5.0
+# Longest delay before retrying a worker that keeps failing during startup
+MAX_RESTART_DELAY = 30.0
+# Seconds the load must stay beyond a threshold before the worker count changes
+SCALE_UP_WINDOW = 10.0
+SCALE_DOWN_WINDOW = 60.0
+APP = "backend.main:app"
+
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    """CPUs granted by a cgroup CPU quota, or None without a quota."""
+    try:
+        # cgroup v2: "<quota> <period>", quota is "max" when unlimited
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return quota / period if quota > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def cpu_limit() -> int:
+    """CPUs this process may run on, capped by the container's CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+def default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY", "0")) or cpu_limit()
+
+
+def worker_status() -> Optional[dict]:
+    """The supervisor's view of all workers, or None outside `python -m backend.serve`."""
+    path = os.getenv("SERVE_STATUS_FILE")
+    if not path:
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class _Draining:
+    """ASGI wrapper that answers with `Connection: close` once the worker stops.
+
+    Closing an idle keep-alive connection races with a client sending its next
+    request on it; telling the client instead lets it reconnect to another worker.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.draining = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_closing(message):
+            if self.draining and message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"connection", b"close")]
+            await send(message)
+
+        await self.app(scope, receive, send_closing)
+
+
+class _WorkerServer(uvicorn.Server):
+    def __init__(self, config, app: _Draining):
+        super().__init__(config)
+        self.draining_app = app
+
+    async def shutdown(self, sockets=None):
+        # Stop accepting, then give open connections one more response to learn they should close
+        for server in self.servers:
+            server.close()
+        self.draining_app.draining = True
+        deadline = time.monotonic() + DRAIN_TIMEOUT
+        while self.server_state.connections and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        await super().shutdown(sockets)
+
+
+def _serve_worker(app, sock, notify_fd: int, log_level: str, forwarded_allow_ips: str = FORWARDED_ALLOW_IPS) -> int:
+    """Run uvicorn on the inherited socket; the heartbeat goes to `notify_fd`."""
+    from . import metrics
+
+    server = None
+
+    async def heartbeat():
+        routes = metrics.metrics.routes.values()
+        beat = {"in_flight": metrics.metrics.in_flight,
+                "requests": sum(sum(stats.statuses.values()) for stats in routes)}
+        try:
+            os.write(notify_fd, json.dumps(beat).encode() + b"\n")
+        except BlockingIOError:
+            pass
+        except OSError:
+            # The supervisor is gone
+            server.should_exit = True
+
+    if isinstance(app, str):
+        app = import_from_string(app)
+    app = _Draining(app)
+    config = uvicorn.Config(app, lifespan="on", log_level=log_level, timeout_graceful_shutdown=SERVE_GRACEFUL_TIMEOUT,
+                            proxy_headers=True, forwarded_allow_ips=forwarded_allow_ips,
+                            callback_notify=heartbeat, timeout_notify=HEARTBEAT_INTERVAL)
+    server = _WorkerServer(config, app)
+    server.run(sockets=[sock])
+    # uvicorn's exit status for a failed startup
+    return 0 if server.started else 3
+
+
+class Worker:
+    def __init__(self, slot: int, generation: int, pid: int, fd: int):
+        self.slot = slot
+        self.generation = generation
+        self.pid = pid
+        self.fd = fd
+        self.started = time.monotonic()
+        self.ready_at: Optional[float] = None
+        self.last_heartbeat: Optional[float] = None
+        self.stopping_since: Optional[float] = None
+        self.in_flight = 0
+        self.requests = 0
+        self._buffer = b""
+
+    @property
+    def state(self) -> str:
+        if self.stopping_since is not None:
+            return "stopping"
+        return "ready" if self.ready_at is not None else "starting"
+
+    def feed(self, data: bytes):
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b"\n")
+        for line in lines:
+            try:
+                beat = json.loads(line)
+            except ValueError:
+                continue
+            self.last_heartbeat = time.monotonic()
+            if self.ready_at is None:
+                self.ready_at = self.last_heartbeat
+            self.in_flight = beat.get("in_flight", 0)
+            self.requests = beat.get("requests", 0)
+
+    def status(self, now: float) -> dict:
+        return {
+            "pid": self.pid,
+            "slot": self.slot,
+            "generation": self.generation,
+            "state": self.state,
+            "uptime_s": round(now - self.started, 1),
+            "heartbeat_age_s": round(now - self.last_heartbeat, 1) if self.last_heartbeat is not None else None,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+        }
+
+
+class Supervisor:
+    def __init__(self, app, sock, workers: int, status_file: str, log_level: str = "info",
+                 forwarded_allow_ips: str = FORWARDED_ALLOW_IPS, min_workers: Optional[int] = None,
+                 max_workers: Optional[int] = None):
+        # The app object when preloaded, its import string otherwise
+        self.app = app
+        self.sock = sock
+        self.log_level = log_level
+        self.forwarded_allow_ips = forwarded_allow_ips
+        self.min_workers = min(min_workers or workers, workers)
+        self.max_workers = max(max_workers or workers, workers)
+        self.target = workers
+        # (time, average requests in flight per worker), one sample per heartbeat interval
+        self._load: "deque[Tuple[float, float]]" = deque()
+        self.status_file = status_file
+        self.workers: Dict[int, Worker] = {}
+        self.generation = 0
+        self.restarts = 0
+        self.failures: Dict[int, int] = {}
+        self.retry_at: Dict[int, float] = {}
+        self.any_ready = False
+        self.stopping = False
+        self.exit_code = 0
+        self.selector = selectors.DefaultSelector()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        self._status_written = 0.0
+
+    def run(self) -> int:
+        for fd in (self._wakeup_r, self._wakeup_w):
+            os.set_blocking(fd, False)
+        self.selector.register(self._wakeup_r, selectors.EVENT_READ)
+        # The handlers do nothing; the signal numbers arrive on the wakeup pipe
+        signal.set_wakeup_fd(self._wakeup_w, warn_on_full_buffer=False)
+        for sig in (signal.SIGCHLD, signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(sig, lambda *_: None)
+
+        print(f"Supervisor {os.getpid()} starting {self.target} workers.")
+        while True:
+            for key, _ in self.selector.select(timeout=0.5):
+                if key.fd == self._wakeup_r:
+                    self._handle_signals()
+                else:
+                    self._read(key.data)
+            self._reap()
+            if self.stopping and not self.workers:
+                break
+            self._supervise()
+            self._autoscale()
+            self._write_status()
+
+        self.selector.close()
+        for path in (self.status_file, os.getenv("SERVE_GENERATIONS_FILE")):
+            try:
+                os.unlink(path)
+            except (OSError, TypeError):
+                pass
+        return self.exit_code
+
+    def _handle_signals(self):
+        try:
+            signals = os.read(self._wakeup_r, 512)
+        except BlockingIOError:
+            return
+        for sig in signals:
+            if sig in (signal.SIGTERM, signal.SIGINT):
+                if self.stopping:
+                    self._kill_all()
+                else:
+                    print("Supervisor stopping workers.")
+                    self._stop_all()
+            elif self.stopping:
+                continue
+            elif sig == signal.SIGHUP:
+                self.generation += 1
+                print(f"Rolling reload to generation {self.generation}.")
+            elif sig == signal.SIGTTIN:
+                self.target += 1
+                # Widen the autoscaling range, so the change is not undone right away
+                self.max_workers = max(self.max_workers, self.target)
+                self._load.clear()
+                print(f"Scaling up to {self.target} workers.")
+            elif sig == signal.SIGTTOU and self.target > 1:
+                self.target -= 1
+                self.min_workers = min(self.min_workers, self.target)
+                self._load.clear()
+                print(f"Scaling down to {self.target} workers.")
+
+    def _read(self, worker: Worker):
+        try:
+            data = os.read(worker.fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if data:
+            starting = worker.ready_at is None
+            worker.feed(data)
+            if starting and worker.ready_at is not None:
+                self.any_ready = True
+                self.failures.pop(worker.slot, None)
+                print(f"Worker {worker.pid} (slot {worker.slot}) is serving.")
+        else:
+            self.selector.unregister(worker.fd)
+            os.close(worker.fd)
+            worker.fd = -1
+
+    def _spawn(self, slot: int):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                os.close(read_fd)
+                self._prepare_child()
+                os.set_blocking(write_fd, False)
+                code = _serve_worker(self.app, self.sock, write_fd, self.log_level, self.forwarded_allow_ips)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        os.close(write_fd)
+        os.set_blocking(read_fd, False)
+        worker = self.workers[pid] = Worker(slot, self.generation, pid, read_fd)
+        self.selector.register(read_fd, selectors.EVENT_READ, worker)
+
+    def _prepare_child(self):
+        signal.set_wakeup_fd(-1)
+        for sig in (signal.SIGCHLD, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(sig, signal.SIG_DFL)
+        self.selector.close()
+        for fd in [self._wakeup_r, self._wakeup_w] + [w.fd for w in self.workers.values() if w.fd >= 0]:
+            os.close(fd)
+        if not isinstance(self.app, str):
+            from . import database
+            database.reset_after_fork()
+
+    def _reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            if worker.fd >= 0:
+                self.selector.unregister(worker.fd)
+                os.close(worker.fd)
+            if worker.stopping_since is not None or self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if worker.ready_at is not None:
+                print(f"Worker {pid} (slot {worker.slot}) exited with status {code}, restarting.")
+                self.restarts += 1
+                continue
+            failures = self.failures[worker.slot] = self.failures.get(worker.slot, 0) + 1
+            if not self.any_ready:
+                print(f"Worker {pid} failed to start (status {code}), stopping.")
+                self.exit_code = 1
+                self._stop_all()
+                return
+            delay = min(0.5 * 2 ** (failures - 1), MAX_RESTART_DELAY)
+            print(f"Worker {pid} (slot {worker.slot}) failed to start (status {code}), retrying in {delay:.1f}s.")
+            self.retry_at[worker.slot] = time.monotonic() + delay
+            self.restarts += 1
+
+    def _stop(self, worker: Worker, sig=signal.SIGTERM):
+        if worker.stopping_since is None:
+            worker.stopping_since = time.monotonic()
+        try:
+            os.kill(worker.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _stop_all(self):
+        self.stopping = True
+        for worker in self.workers.values():
+            self._stop(worker)
+
+    def _kill_all(self):
+        for worker in self.workers.values():
+            self._stop(worker, signal.SIGKILL)
+
+    def _supervise(self):
+        now = time.monotonic()
+        for worker in list(self.workers.values()):
+            if worker.stopping_since is not None:
+                # Graceful shutdown, then the lifespan hooks
+                if now - worker.stopping_since > SERVE_GRACEFUL_TIMEOUT + 10:
+                    self._stop(worker, signal.SIGKILL)
+            elif worker.ready_at is not None and now - worker.last_heartbeat > SERVE_WORKER_TIMEOUT:
+                print(f"Worker {worker.pid} (slot {worker.slot}) sent no heartbeat for "
+                      f"{SERVE_WORKER_TIMEOUT:.0f}s, restarting it.")
+                self._stop(worker, signal.SIGKILL)
+                self.restarts += 1
+            elif worker.slot >= self.target:
+                self._stop(worker)
+        if self.stopping:
+            return
+
+        replacing = False
+        for slot in range(self.target):
+            live = [w for w in self.workers.values() if w.slot == slot and w.stopping_since is None]
+            current = [w for w in live if w.generation == self.generation]
+            outdated = [w for w in live if w.generation != self.generation]
+            if not live:
+                if now >= self.retry_at.get(slot, 0):
+                    self._spawn(slot)
+            elif not outdated:
+                continue
+            elif not current:
+                # One replacement at a time keeps the other workers serving
+                if not replacing:
+                    self._spawn(slot)
+                    replacing = True
+            elif current[0].ready_at is not None:
+                for worker in outdated:
+                    self._stop(worker)
+            elif now - current[0].started > SERVE_BOOT_TIMEOUT:
+                print(f"Worker {current[0].pid} did not start within {SERVE_BOOT_TIMEOUT:.0f}s, abandoning the reload.")
+                self._stop(current[0], signal.SIGKILL)
+                for worker in self.workers.values():
+                    worker.generation = self.generation
+            else:
+                replacing = True
+
+    def _average_load(self, now: float, window: float) -> Optional[float]:
+        """Average load over the last `window` seconds, or None before the samples span it."""
+        if not self._load or now - self._load[0][0] < window - HEARTBEAT_INTERVAL:
+            return None
+        samples = [load for at, load in self._load if now - at <= window]
+        return sum(samples) / len(samples)
+
+    def _autoscale(self):
+        if self.stopping or self.min_workers >= self.max_workers:
+            return
+        now = time.monotonic()
+        if self._load and now - self._load[-1][0] < HEARTBEAT_INTERVAL:
+            return
+        live = [w for w in self.workers.values() if w.stopping_since is None]
+        settled = (len(live) == self.target and all(w.ready_at is not None for w in live)
+                   and all(w.generation == self.generation for w in live))
+        if not settled:
+            # Starting workers, reloads and restarts would skew the average; measure afresh afterwards
+            self._load.clear()
+            return
+        self._load.append((now, sum(w.in_flight for w in live) / len(live)))
+        while now - self._load[0][0] > SCALE_DOWN_WINDOW:
+            self._load.popleft()
+
+        load = self._average_load(now, SCALE_UP_WINDOW)
+        if load is not None and load >= SERVE_SCALE_UP_LOAD and self.target < self.max_workers:
+            self.target += 1
+            self._load.clear()
+            print(f"{load:.1f} requests in flight per worker, scaling up to {self.target} workers.")
+            return
+        load = self._average_load(now, SCALE_DOWN_WINDOW)
+        if load is not None and load < SERVE_SCALE_DOWN_LOAD and self.target > self.min_workers:
+            self.target -= 1
+            self._load.clear()
+            print(f"{load:.1f} requests in flight per worker, scaling down to {self.target} workers.")
+
+    def _write_status(self):
+        now = time.monotonic()
+        if now - self._status_written < HEARTBEAT_INTERVAL:
+            return
+        self._status_written = now
+        workers = sorted(self.workers.values(), key=lambda w: (w.slot, w.started))
+        ready = sum(1 for w in workers if w.state == "ready")
+        status = {
+            "status": "ok" if ready >= self.target and not self.stopping else "degraded",
+            "supervisor_pid": os.getpid(),
+            "workers_target": self.target,
+            "workers_min": self.min_workers,
+            "workers_max": self.max_workers,
+            "load": round(self._load[-1][1], 2) if self._load else None,
+            "workers_ready": ready,
+            "generation": self.generation,
+            "preload": not isinstance(self.app, str),
+            "restarts": self.restarts,
+            "workers": [worker.status(now) for worker in workers],
+        }
+        tmp = f"{self.status_file}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(status, f)
+            os.replace(tmp, self.status_file)
+        except OSError as e:
+            print(f"Error writing worker status: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the app with a supervised pool of uvicorn workers")
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=None, help="Default: WEB_CONCURRENCY, else the usable CPUs")
+    parser.add_argument("--min-workers", type=int, default=SERVE_MIN_WORKERS, help="Autoscaling lower bound")
+    parser.add_argument("--max-workers", type=int, default=SERVE_MAX_WORKERS, help="Autoscaling upper bound")
+    parser.add_argument("--no-preload", dest="preload", action="store_false", default=SERVE_PRELOAD,
+                        help="Import the app in every worker instead of once in the supervisor")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--forwarded-allow-ips", default=FORWARDED_ALLOW_IPS,
+                        help="Proxy addresses whose X-Forwarded-For is trusted, '*' for any")
+    args = parser.parse_args()
+
+    workers = args.workers or default_workers()
+    if args.min_workers:
+        workers = max(workers, args.min_workers)
+    if args.max_workers:
+        workers = min(workers, args.max_workers)
+    cpus = cpu_limit()
+    # Share the CPUs between the workers' password hashing and report pools, sized for the most workers
+    most = max(workers, args.max_workers)
+    os.environ.setdefault("HASH_POOL_SIZE", str(max(1, cpus // most)))
+    os.environ.setdefault("REPORT_POOL_SIZE", str(max(1, min(cpus // most, 2))))
+    status_file = os.environ.setdefault(
+        "SERVE_STATUS_FILE", os.path.join(tempfile.gettempdir(), f"backend-serve-{os.getpid()}.json"))
+    # Before the app is imported, which reads the path
+    generations_file = os.environ.setdefault(
+        "SERVE_GENERATIONS_FILE", os.path.join(tempfile.gettempdir(), f"backend-serve-{os.getpid()}.generations"))
+    if generations_file:
+        from . import generations
+        generations.create_file(generations_file)
+    if args.forwarded_allow_ips != FORWARDED_ALLOW_IPS:
+        # The rate limiter only applies its default rules once the proxies are configured
+        os.environ["FORWARDED_ALLOW_IPS"] = args.forwarded_allow_ips
+
+    from . import database
+    if database.IS_MEMORY_SQLITE and max(workers, args.max_workers) > 1:
+        print("An in-memory SQLite database cannot be shared between processes, using 1 worker.")
+        workers = 1
+        args.min_workers = args.max_workers = 0
+
+    app = APP
+    if args.preload:
+        from . import migrations
+        from .main import app
+        if not database.IS_MEMORY_SQLITE:
+            migrations.ensure_schema()
+
+    sock = uvicorn.Config(APP, host=args.host, port=args.port, log_level=args.log_level).bind_socket()
+    sys.exit(Supervisor(app, sock, workers, status_file, args.log_level, args.forwarded_allow_ips,
+                        args.min_workers, args.max_workers).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""Serving the built frontend (the Vite `dist/` copied to STATIC_DIR).
+
+`StaticFrontend.load()` runs at startup. It writes `.gz` and, when the
+`brotli` package is installed, `.br` files next to every compressible asset,
+unless they are already up to date. `python -m backend.static_files precompress`
+does the same at build time. It then indexes the directory in memory, so a
+request costs a dict lookup instead of a stat. Each request gets the smallest
+variant its `Accept-Encoding` allows.
+
+Files under `assets/` carry a content hash in their name, so they are cached
+as `immutable` for a year; everything else is revalidated with its ETag.
+`index.html` is held in memory with its compressed variants and served for
+every path that is not a file, so client-side routes work on reload. Other
+files are sent with `FileResponse`, which hands the path to the server's
+sendfile (`http.response.pathsend`) when the server supports it.
+"""
+from email.utils import formatdate
+from typing import Dict, Optional, Tuple
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response
+
+from .response_cache import etag_matches
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.getenv("STATIC_DIR", "static")
+# Compress assets at startup; off when the build step already did it or the directory is read-only
+STATIC_PRECOMPRESS = os.getenv("STATIC_PRECOMPRESS", "1") == "1"
+# Smaller files are not worth a Content-Encoding
+STATIC_COMPRESS_MIN_SIZE = int(os.getenv("STATIC_COMPRESS_MIN_SIZE", "1024"))
+# Chunk size for servers without sendfile support
+STATIC_CHUNK_SIZE = 256 * 1024
+
+COMPRESSIBLE = {".html", ".js", ".mjs", ".css", ".json", ".map", ".svg", ".txt", ".xml", ".ico", ".wasm",
+                ".webmanifest", ".ttf", ".otf", ".eot"}
+# Best first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# Vite writes `assets/<name>-<hash>.<ext>`
+HASHED_ASSET = re.compile(r"^assets/.+[-.][A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+def _compress(encoding: str, data: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    # mtime=0 keeps the output identical across builds
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _available_encodings():
+    return [(encoding, suffix) for encoding, suffix in ENCODINGS if encoding != "br" or brotli is not None]
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def precompress(directory: str) -> int:
+    """Write missing or stale compressed variants; returns the number of files written."""
+    written = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE:
+                continue
+            source = os.stat(path)
+            if source.st_size < STATIC_COMPRESS_MIN_SIZE:
+                continue
+            data = None
+            for encoding, suffix in _available_encodings():
+                target = path + suffix
+                if os.path.exists(target) and os.stat(target).st_mtime >= source.st_mtime:
+                    continue
+                if data is None:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                compressed = _compress(encoding, data)
+                # Incompressible content is served as is
+                if len(compressed) < len(data):
+                    _write_atomic(target, compressed)
+                    written += 1
+    return written
+
+
+def _etag(stat_result: os.stat_result, encoding: Optional[str]) -> str:
+    base = hashlib.md5(f"{stat_result.st_mtime}-{stat_result.st_size}".encode()).hexdigest()
+    return f'"{base}-{encoding}"' if encoding else f'"{base}"'
+
+
+def accepted_encodings(header: Optional[str]) -> set:
+    """Codings of an Accept-Encoding header with a non-zero q-value."""
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class _FileResponse(FileResponse):
+    chunk_size = STATIC_CHUNK_SIZE
+
+
+class StaticFile:
+    def __init__(self, path: str, stat_result: os.stat_result, media_type: str, cache_control: str):
+        self.path = path
+        self.stat = stat_result
+        self.media_type = media_type
+        self.cache_control = cache_control
+        # encoding -> (path, stat)
+        self.variants: Dict[str, Tuple[str, os.stat_result]] = {}
+
+    def select(self, accepted: set) -> Tuple[Optional[str], str, os.stat_result]:
+        for encoding, _ in ENCODINGS:
+            if encoding in self.variants and encoding in accepted:
+                return (encoding, *self.variants[encoding])
+        return None, self.path, self.stat
+
+
+class StaticFrontend:
+    """ASGI app for the frontend build, mounted at `/` after the API routes."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.files: Dict[str, StaticFile] = {}
+        # encoding (None = identity) -> body, plus the ETag of each
+        self.index: Dict[Optional[str], Tuple[bytes, str]] = {}
+        self.index_modified = ""
+        self.loaded = False
+
+    def load(self):
+        if STATIC_PRECOMPRESS:
+            try:
+                written = precompress(self.directory)
+                if written:
+                    print(f"Precompressed {written} static files.")
+            except OSError as e:
+                print(f"Error precompressing static files: {e}")
+        files = {}
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                if name.endswith(".tmp") or any(name.endswith(suffix) for _, suffix in ENCODINGS):
+                    continue
+                media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                cache_control = IMMUTABLE if HASHED_ASSET.match(rel) else REVALIDATE
+                entry = files[rel] = StaticFile(path, os.stat(path), media_type, cache_control)
+                for encoding, suffix in ENCODINGS:
+                    if os.path.exists(path + suffix):
+                        variant = os.stat(path + suffix)
+                        # A variant older than its source is stale and ignored
+                        if variant.st_mtime >= entry.stat.st_mtime:
+                            entry.variants[encoding] = (path + suffix, variant)
+        self.files = files
+        self._load_index()
+        self.loaded = True
+
+    def _load_index(self):
+        path = os.path.join(self.directory, "index.html")
+        if not os.path.exists(path):
+            self.index = {}
+            return
+        with open(path, "rb") as f:
+            body = f.read()
+        base = hashlib.sha256(body).hexdigest()[:32]
+        self.index = {None: (body, f'"{base}"')}
+        for encoding, _ in _available_encodings():
+            self.index[encoding] = (_compress(encoding, body), f'"{base}-{encoding}"')
+        self.index_modified = formatdate(os.stat(path).st_mtime, usegmt=True)
+
+    def _serve_index(self, request_headers: dict) -> Response:
+        if not self.index:
+            return PlainTextResponse("Not Found", status_code=404)
+        accepted = accepted_encodings(request_headers.get("accept-encoding"))
+        encoding = next((e for e, _ in ENCODINGS if e in accepted and e in self.index), None)
+        body, etag = self.index[encoding]
+        headers = {"ETag": etag, "Cache-Control": REVALIDATE, "Vary": "Accept-Encoding",
+                   "Last-Modified": self.index_modified}
+        if etag_matches(request_headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(body, media_type="text/html", headers=headers)
+
+    def _serve_file(self, entry: StaticFile, request_headers: dict) -> Response:
+        encoding, path, stat_result = entry.select(accepted_encodings(request_headers.get("accept-encoding")))
+        etag = _etag(stat_result, encoding)
+        headers = {"ETag": etag, "Cache-Control": entry.cache_control}
+        if entry.variants:
+            headers["Vary"] = "Accept-Encoding"
+        if etag_matches(request_headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return _FileResponse(path, headers=headers, media_type=entry.media_type, stat_result=stat_result)
+
+    async def __call__(self, scope, receive, send):
+        if not self.loaded:
+            self.load()
+        rel = scope["path"].lstrip("/")
+        if rel == "api" or rel.startswith("api/"):
+            response = JSONResponse({"detail": "Not Found"}, status_code=404)
+        elif scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+        else:
+            headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+            entry = self.files.get(rel)
+            if rel == "index.html":
+                response = self._serve_index(headers)
+            elif entry is not None:
+                response = self._serve_file(entry, headers)
+            elif "." in rel.rsplit("/", 1)[-1]:
+                # A missing asset; answering with index.html would get HTML cached under a .js URL
+                response = PlainTextResponse("Not Found", status_code=404)
+            else:
+                response = self._serve_index(headers)
+        await response(scope, receive, send)
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self.files),
+            "precompressed": sum(1 for entry in self.files.values() if entry.variants),
+            "immutable": sum(1 for entry in self.files.values() if entry.cache_control == IMMUTABLE),
+            "brotli": brotli is not None,
+        }
+
+
+frontend = StaticFrontend(STATIC_DIR)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the static frontend build")
+    parser.add_argument("command", choices=["precompress"])
+    parser.add_argument("directory", nargs="?", default=STATIC_DIR)
+    args = parser.parse_args()
+    print(f"Precompressed {precompress(args.directory)} files in {args.directory}.")
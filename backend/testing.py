@@ -0,0 +1,76 @@
+"""Helpers for tests that exercise the app against a real database.
+
+`assert_max_queries` pins the statements a block issues, and
+`assert_index_backed` the SQLite query plan of a statement; see `tests/`.
+"""
+from contextlib import contextmanager
+from typing import List
+
+from sqlalchemy import event
+
+from . import database
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+def _default_engines():
+    engines = [database.engine, database.writer_engine]
+    engines += [e.sync_engine for e in (database.async_engine, database.async_writer_engine) if e is not None]
+    return [e for e in engines if e is not None]
+
+
+@contextmanager
+def count_queries(engine=None):
+    """Record every statement executed inside the block (both app engines by default)."""
+    engines = [engine] if engine is not None else _default_engines()
+    counter = QueryCounter()
+    for target in engines:
+        event.listen(target, "before_cursor_execute", counter._record)
+    try:
+        yield counter
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", counter._record)
+
+
+@contextmanager
+def assert_max_queries(max_count: int, engine=None):
+    """Fail if the block issues more than `max_count` SQL statements.
+
+        with assert_max_queries(3):
+            client.get("/api/public/projects")
+    """
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > max_count:
+        listing = "\n".join(f"  {i + 1}. {sql}" for i, sql in enumerate(counter.statements))
+        raise AssertionError(f"Expected at most {max_count} queries, got {counter.count}:\n{listing}")
+
+
+def query_plan(stmt, engine=None) -> List[str]:
+    """The `EXPLAIN QUERY PLAN` detail lines of `stmt` on a SQLite engine."""
+    engine = engine or database.engine
+    sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def assert_index_backed(stmt, table: str, engine=None):
+    """Fail unless `table` is read through an index search rather than a scan."""
+    plan = query_plan(stmt, engine)
+    searches = [line for line in plan if line.startswith(f"SEARCH {table} ") and "INDEX" in line]
+    if not searches:
+        listing = "\n".join(f"  {line}" for line in plan)
+        raise AssertionError(f"Expected an index search on {table}:\n{listing}")
+    return plan
+
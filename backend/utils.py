@@ -2,11 +2,21 @@ from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+from starlette.concurrency import run_in_threadpool
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+import asyncio
 import os
+import threading
+import time
 from . import models, database
+from .generations import generations
 
 # Config
 SECRET_KEY = os.getenv("SECRET_KEY", "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7")
@@ -22,6 +32,101 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# Password hashing executor
+# bcrypt is deliberately slow, so hashing runs in a dedicated process pool instead of
+# the request threadpool. HASH_POOL_SIZE=0 falls back to the threadpool.
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", str(min(os.cpu_count() or 1, 4))))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", "64"))
+
+class BoundedProcessPool:
+    """A lazily started process pool that answers 503 once workers and queue are full."""
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.restarts = 0
+
+    @property
+    def capacity(self) -> int:
+        return max(self.max_workers, 1) + self.max_queue
+
+    def _acquire(self):
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is busy, please retry",
+                    headers={"Retry-After": "1"},
+                )
+            self.in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _replace_pool(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._pool is broken:
+                self._pool = None
+                self.restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func, *args):
+        self._acquire()
+        try:
+            if self.max_workers <= 0:
+                return await run_in_threadpool(func, *args)
+            loop = asyncio.get_running_loop()
+            for attempt in range(2):
+                pool = self._get_pool()
+                try:
+                    return await loop.run_in_executor(pool, func, *args)
+                except BrokenProcessPool as e:
+                    # A worker died (e.g. OOM-killed); the pool refuses all further work, so start a new one
+                    print(f"Error in process pool, restarting it: {e}")
+                    self._replace_pool(pool)
+                    if attempt:
+                        raise
+        finally:
+            self._release()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "queue_size": self.max_queue,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+hash_executor = BoundedProcessPool(HASH_POOL_SIZE, HASH_QUEUE_SIZE)
+
+async def verify_password_async(plain_password, hashed_password):
+    return await hash_executor.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await hash_executor.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -32,24 +137,164 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    credentials_exception = HTTPException(
+# Authenticated principal cache
+# Maps token subject -> User column values so get_current_user can skip the lookup query.
+# Committing an update or delete of a User row bumps its generation in `generations`,
+# which every worker of backend.serve sees; other servers (replicas) may serve a stale
+# principal for up to PRINCIPAL_CACHE_TTL seconds (0 = disabled).
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "0"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+
+class PrincipalCache:
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_size > 0
+
+    def generation(self, username: str) -> int:
+        return generations.get(f"principal:{username}")
+
+    def get(self, username: str) -> Optional[dict]:
+        generation = self.generation(username)
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[0] < time.monotonic() or entry[2] != generation:
+                if entry is not None:
+                    del self._entries[username]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, username: str, values: dict, generation: int):
+        """Cache `values`, read from the database after `generation` was taken."""
+        with self._lock:
+            self._entries[username] = (time.monotonic() + self.ttl, values, generation)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, username: Optional[str] = None):
+        """Drop `username` in every worker, or everything cached in this process."""
+        if username is not None:
+            generations.bump(f"principal:{username}")
+        with self._lock:
+            if username is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(username, None)
+
+    def stats(self) -> dict:
+        return {
+            "ttl": self.ttl,
+            "max_size": self.max_size,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_TTL, PRINCIPAL_CACHE_SIZE)
+
+_user_columns = [attr.key for attr in inspect(models.User).column_attrs]
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _collect_principal(mapper, connection, target):
+    # Invalidated once committed: before that, other requests would re-cache the old row
+    usernames = object_session(target).info.setdefault("principal_invalidations", set())
+    usernames.add(target.username)
+    usernames.update(inspect(target).attrs.username.history.deleted or ())
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_principals(session):
+    for username in session.info.pop("principal_invalidations", ()):
+        principal_cache.invalidate(username)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_principals(session):
+    session.info.pop("principal_invalidations", None)
+
+def _attach_principal(db: AsyncSession, values: dict) -> models.User:
+    # Attach a persistent User to this session without emitting a SELECT
+    user = models.User(**values)
+    make_transient_to_detached(user)
+    db.add(user)
+    return user
+
+async def _load_principal(db: AsyncSession, username: str) -> Optional[models.User]:
+    if principal_cache.enabled:
+        values = principal_cache.get(username)
+        if values is not None:
+            return _attach_principal(db, values)
+        # Taken before the SELECT, so a commit that lands in between invalidates what it read
+        generation = principal_cache.generation(username)
+    user = (await db.execute(select(models.User).where(models.User.username == username))).scalars().first()
+    if user is not None and principal_cache.enabled:
+        principal_cache.put(username, {key: getattr(user, key) for key in _user_columns}, generation)
+    return user
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _token_subject(token: str) -> str:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == username).first()
+        raise _credentials_exception()
+    return username
+
+async def get_current_user(
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    # Sub-requests of /api/batch carry the principal the batch already authenticated
+    values = getattr(request.state, "batch_principal", None)
+    if values is not None:
+        return _attach_principal(db, values)
+    user = await _load_principal(db, _token_subject(token))
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
+async def authenticate(token: str) -> dict:
+    """Column values of the user `token` belongs to, read in a session closed before returning; 401 otherwise."""
+    async with database.async_session() as db:
+        user = await _load_principal(db, _token_subject(token))
+        if user is None:
+            raise _credentials_exception()
+        return {key: getattr(user, key) for key in _user_columns}
+
+async def is_superuser_token(token: str) -> bool:
+    """Whether `token` belongs to an active superuser, for checks outside route dependencies."""
+    try:
+        username = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return False
+    if username is None:
+        return False
+    async with database.async_session() as db:
+        user = await _load_principal(db, username)
+        return user is not None and user.is_active and user.is_superuser
+
 async def get_current_active_user(current_user: models.User = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
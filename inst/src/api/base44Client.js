@@ -37,6 +37,19 @@ const createEntityClient = (endpoint) => ({
 
 // Mock the base44 SDK structure
 export const base44 = {
+  // Several GET requests (paths below /api) in one round-trip; resolves to their bodies
+  // in order and, like Promise.all, rejects if any of them failed
+  batch: async (urls) => {
+    const response = await api.post('/batch', { requests: urls.map((url) => ({ url: `/api${url}` })) });
+    return response.data.responses.map(({ status, body }, i) => {
+      if (status >= 400) {
+        const error = new Error(`GET ${urls[i]} failed with status ${status}`);
+        error.response = { status, data: body };
+        throw error;
+      }
+      return body;
+    });
+  },
   auth: {
     me: async () => {
       const response = await api.get('/auth/me');
@@ -68,12 +68,13 @@ export default function Dashboard() {
 
   const loadData = async () => {
     try {
-      const [projekteData, benutzerData, warenData, aufgabenData, dokumenteData] = await Promise.all([
-        base44.entities.Projekt.list(),
-        base44.entities.Benutzer.list(),
-        base44.entities.Ware.list(),
-        base44.entities.Aufgabe.list("-created_date", 20),
-        base44.entities.Dokument.list("-created_date", 10)
+      // One round-trip instead of five
+      const [projekteData, benutzerData, warenData, aufgabenData, dokumenteData] = await base44.batch([
+        "/admin/projects",
+        "/auth/users",
+        "/admin/products",
+        "/admin/tasks",
+        "/admin/documents"
       ]);
 
       setProjekte(projekteData);
@@ -0,0 +1,33 @@
+"""The app on a throwaway SQLite database, migrated once per test session.
+
+The backend reads its settings when it is imported, so they are set here
+first. DATABASE_MODE and the other settings can still be given from outside,
+e.g. `DATABASE_MODE=sync python -m pytest`.
+"""
+import os
+import tempfile
+
+_database_dir = tempfile.mkdtemp(prefix="deiw-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_database_dir, 'test.db')}")
+# Hash and render reports in the threadpool; a process pool per test session is slow to start
+os.environ.setdefault("HASH_POOL_SIZE", "0")
+os.environ.setdefault("REPORT_POOL_SIZE", "0")
+os.environ.setdefault("REPORT_CACHE_DIR", os.path.join(_database_dir, "reports"))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    response = client.post("/api/auth/login", data={"username": "root", "password": "root"})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
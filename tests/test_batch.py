@@ -0,0 +1,32 @@
+"""`POST /api/batch`: sub-requests answered like direct requests, each with its own status."""
+
+
+def batch(client, headers, *requests):
+    response = client.post("/api/batch", json={"requests": list(requests)}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["responses"]
+
+
+def test_sub_requests_match_direct_requests(client, admin_headers):
+    urls = ["/api/admin/categories", "/api/auth/users?limit=2", "/api/auth/me"]
+    responses = batch(client, admin_headers, *({"id": str(i), "url": url} for i, url in enumerate(urls)))
+    assert [response["id"] for response in responses] == ["0", "1", "2"]
+    for url, response in zip(urls, responses):
+        direct = client.get(url, headers=admin_headers)
+        assert direct.status_code == 200
+        assert (response["status"], response["body"]) == (200, direct.json())
+
+
+def test_failures_stay_per_item(client, admin_headers):
+    responses = batch(client, admin_headers,
+                      {"id": "missing", "url": "/api/does-not-exist"},
+                      {"id": "outside", "url": "https://example.com/api/admin/categories"},
+                      {"id": "bad", "url": "/api/admin/tasks?cursor=not-a-cursor"},
+                      {"id": "ok", "url": "/api/admin/categories"})
+    assert [(response["id"], response["status"]) for response in responses] == [
+        ("missing", 404), ("outside", 400), ("bad", 400), ("ok", 200)]
+
+
+def test_batch_needs_a_token(client):
+    response = client.post("/api/batch", json={"requests": [{"url": "/api/admin/categories"}]})
+    assert response.status_code == 401
@@ -0,0 +1,89 @@
+"""Bulk imports: CSV parsing of the streamed body, and rows the database rejects."""
+import pytest
+from sqlalchemy import delete, event, select
+
+from backend import database, models
+
+CSV = (
+    '\ufefftitel,status,prioritaet\r\n'
+    '"Dach prüfen\r\nund ""Rinne"" reinigen",open,high\r\n'
+    '\r\n'
+    'Fenster,done,low\r\n'
+).encode("utf-8")
+
+
+def import_tasks(client, headers, chunks):
+    response = client.post("/api/admin/tasks/bulk", content=iter(chunks),
+                           headers={**headers, "Content-Type": "text/csv"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def task_titles():
+    with database.SessionLocal() as db:
+        return db.scalars(select(models.Aufgabe.titel).order_by(models.Aufgabe.id)).all()
+
+
+def setup_function():
+    with database.SessionLocal() as db:
+        db.execute(delete(models.Aufgabe))
+        db.execute(delete(models.AdminProject))
+        db.commit()
+
+
+@pytest.fixture
+def foreign_keys():
+    """Enforce foreign keys, as Postgres does; SQLite leaves them off by default."""
+    engines = [database.engine, database.writer_engine, database.async_engine, database.async_writer_engine]
+    engines = [getattr(engine, "sync_engine", engine) for engine in engines if engine is not None]
+
+    def pragma(value):
+        def listener(dbapi_connection, *args):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"PRAGMA foreign_keys={value}")
+            cursor.close()
+        return listener
+
+    listeners = [("checkout", pragma("ON")), ("checkin", pragma("OFF"))]
+    for engine in engines:
+        for name, listener in listeners:
+            event.listen(engine.pool, name, listener)
+    yield
+    for engine in engines:
+        for name, listener in listeners:
+            event.remove(engine.pool, name, listener)
+
+
+def test_quoted_line_breaks_across_chunks(client, admin_headers):
+    # Chunk boundaries inside the BOM, a multi-byte character and the quoted field
+    chunks = [CSV[i:i + 7] for i in range(0, len(CSV), 7)]
+    result = import_tasks(client, admin_headers, chunks)
+    assert result == {"inserted": 2, "failed": 0, "errors": []}
+    assert task_titles() == ['Dach prüfen\r\nund "Rinne" reinigen', "Fenster"]
+
+
+def test_unterminated_quote_is_a_row_error(client, admin_headers):
+    body = b'titel,status,prioritaet\nFenster,done,low\n"Dach,open,high\n'
+    result = import_tasks(client, admin_headers, [body])
+    assert result["inserted"] == 1
+    assert result["failed"] == 1
+    assert result["errors"][0]["row"] == 2
+    assert task_titles() == ["Fenster"]
+
+
+def test_constraint_violation_skips_only_that_row(client, admin_headers, foreign_keys):
+    projects = [
+        {"project_code": f"FK{i}", "name": f"Project {i}", "status": "planned", "year": 2024, "type": "Neubau"}
+        for i in range(5)
+    ]
+    projects[2]["category_id"] = 999999
+    response = client.post("/api/admin/projects/bulk?batch_size=2", json=projects, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["inserted"] == 4
+    assert result["failed"] == 1
+    assert result["errors"][0]["row"] == 3
+    assert "FOREIGN KEY" in result["errors"][0]["errors"]
+    with database.SessionLocal() as db:
+        codes = db.scalars(select(models.AdminProject.project_code).order_by(models.AdminProject.id)).all()
+    assert codes == ["FK0", "FK1", "FK3", "FK4"]
@@ -0,0 +1,48 @@
+"""Dashboard counters: off by default, and equal to the GROUP BY counts once installed."""
+import pytest
+
+from backend import dashboard, database
+
+
+def configure(enabled):
+    with (database.writer_engine or database.engine).begin() as connection:
+        dashboard.configure(connection, enabled)
+
+
+def installed():
+    with database.engine.connect() as connection:
+        return dashboard._installed(connection)
+
+
+@pytest.fixture
+def counters(monkeypatch, client):
+    configure(True)
+    monkeypatch.setattr(dashboard, "DASHBOARD_COUNTERS", True)
+    yield
+    configure(False)
+
+
+def read(client, headers, source=None):
+    response = client.get("/api/admin/dashboard", params={"source": source} if source else {}, headers=headers)
+    return response.status_code, response.json()
+
+
+def test_counters_are_off_by_default(client, admin_headers):
+    assert not installed()
+    assert read(client, admin_headers, "counters")[0] == 400
+    status, body = read(client, admin_headers)
+    assert (status, body["source"]) == (200, "query")
+
+
+def test_counters_follow_writes(client, admin_headers, counters):
+    project = {"project_code": "DASH1", "name": "Dashboard", "status": "planned", "year": 2031, "type": "Neubau"}
+    response = client.post("/api/admin/projects", json=project, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    client.put(f"/api/admin/projects/{response.json()['id']}", json={**project, "status": "completed"},
+               headers=admin_headers)
+    _, from_counters = read(client, admin_headers, "counters")
+    _, from_query = read(client, admin_headers, "query")
+    assert from_counters.pop("source") == "counters"
+    from_query.pop("source")
+    assert from_counters == from_query
+    assert from_counters["projects"]["year"]["2031"] == 1
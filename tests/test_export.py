@@ -0,0 +1,63 @@
+"""Streaming exports: every matching row across chunks, as CSV, NDJSON and gzip."""
+import csv
+import gzip
+import io
+import json
+
+import pytest
+from sqlalchemy import delete, insert
+
+from backend import database, export, models
+
+ROWS = 5
+
+
+@pytest.fixture(scope="module")
+def exported_projects(client):
+    with database.SessionLocal() as db:
+        db.execute(delete(models.AdminProject).where(models.AdminProject.status == "export-test"))
+        db.execute(insert(models.AdminProject.__table__), [
+            {"project_code": f"EXP{i}", "name": f"Export, \"{i}\"", "status": "export-test", "year": 2020 + i,
+             "type": "Neubau"}
+            for i in range(ROWS)
+        ])
+        db.commit()
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_CHUNK_SIZE", 2)
+
+
+def get_export(client, headers, **params):
+    response = client.get("/api/admin/projects/export", params={"status": "export-test", **params},
+                          headers={**headers, "Accept-Encoding": "identity"})
+    assert response.status_code == 200, response.text
+    return response
+
+
+def test_csv(client, admin_headers, exported_projects):
+    response = get_export(client, admin_headers)
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(row["project_code"], row["name"]) for row in rows] == [(f"EXP{i}", f"Export, \"{i}\"") for i in range(ROWS)]
+
+
+def test_ndjson(client, admin_headers, exported_projects):
+    lines = get_export(client, admin_headers, format="ndjson").text.splitlines()
+    assert [json.loads(line)["year"] for line in lines] == [2020 + i for i in range(ROWS)]
+
+
+def test_gzip(client, admin_headers, exported_projects):
+    plain = get_export(client, admin_headers).content
+    with client.stream("GET", "/api/admin/projects/export", params={"status": "export-test"},
+                       headers={**admin_headers, "Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        raw = b"".join(response.iter_raw())
+    assert gzip.decompress(raw) == plain
+
+
+def test_no_matching_rows_still_has_a_header(client, admin_headers):
+    response = get_export(client, admin_headers, status="no-such-status")
+    assert response.text.splitlines()[0].startswith("id,")
+    assert len(response.text.splitlines()) == 1
@@ -0,0 +1,43 @@
+"""Sparse fieldsets: items carry the requested fields plus id, and unknown names are rejected."""
+import pytest
+
+from backend import serialization
+
+
+@pytest.fixture(params=[True, False], ids=["fast-path", "orm-path"])
+def fast_path(request, monkeypatch):
+    monkeypatch.setattr(serialization, "JSON_FAST_PATH", request.param)
+
+
+@pytest.fixture(scope="module")
+def projects(client, admin_headers):
+    category = client.post("/api/admin/categories", json={"name": "Fieldsets"}, headers=admin_headers).json()
+    body = {"project_code": "FIELDS1", "name": "Fields", "status": "planned", "year": 2024, "type": "Neubau",
+            "color": "#123456", "category_id": category["id"]}
+    project = client.post("/api/admin/projects", json=body, headers=admin_headers).json()
+    yield project
+    client.delete(f"/api/admin/projects/{project['id']}", headers=admin_headers)
+
+
+def find(items, project):
+    return next(item for item in items if item["id"] == project["id"])
+
+
+def test_requested_fields_only(client, admin_headers, projects, fast_path):
+    items = client.get("/api/admin/projects", params={"fields": "name,color"}, headers=admin_headers).json()
+    assert find(items, projects) == {"id": projects["id"], "name": "Fields", "color": "#123456"}
+
+
+def test_include_embeds_the_relationship(client, admin_headers, projects, fast_path):
+    params = {"fields": "name", "include": "category", "cursor": "", "sort": "-id"}
+    response = client.get("/api/admin/projects", params=params, headers=admin_headers)
+    item = find(response.json()["items"], projects)
+    assert set(item) == {"id", "name", "category"}
+    assert item["category"]["name"] == "Fieldsets"
+
+
+@pytest.mark.parametrize("params", [{"fields": "name,secret"}, {"include": "owner"}])
+def test_unknown_names_are_rejected(client, admin_headers, params):
+    response = client.get("/api/admin/projects", params=params, headers=admin_headers)
+    assert response.status_code == 400
+    assert "use any of" in response.json()["detail"]
@@ -0,0 +1,68 @@
+"""The contact-request write-behind queue: receipts, and a shutdown that does not hang."""
+import asyncio
+import time
+
+import pytest
+
+from backend import ingest, models
+
+ROW = {"name": "Kunde", "email": "kunde@example.com", "reason": "Anfrage", "message": "Hallo"}
+
+
+def new_queue():
+    return ingest.WriteBehindQueue(models.ContactRequest, batch_size=10, flush_ms=1, max_queue=10)
+
+
+def test_stop_returns_when_drain_task_died():
+    async def scenario():
+        queue = new_queue()
+        queue.start()
+        queue._task.cancel()
+        await asyncio.sleep(0)
+        queue.submit(ROW)
+        await asyncio.wait_for(queue.stop(timeout=60), 1)
+        assert queue.stats()["queued"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_stop_gives_up_after_timeout():
+    async def scenario():
+        queue = new_queue()
+
+        async def stuck_insert(rows):
+            await asyncio.sleep(60)
+
+        queue._insert = stuck_insert
+        queue.start()
+        queue.submit(ROW)
+        await asyncio.wait_for(queue.stop(timeout=0.1), 1)
+        assert queue.stats()["enabled"] is False
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def write_behind(client, monkeypatch):
+    """A write-behind queue running on the test client's event loop."""
+    queue = new_queue()
+
+    async def start():
+        queue.start()
+
+    client.portal.call(start)
+    monkeypatch.setattr(ingest, "CONTACT_WRITE_BEHIND", True)
+    monkeypatch.setattr(ingest, "contact_queue", queue)
+    yield queue
+    client.portal.call(queue.stop)
+
+
+def test_receipt_finds_the_stored_request(client, admin_headers, write_behind):
+    response = client.post("/api/contact/requests", json=ROW)
+    assert response.status_code == 202
+    receipt = response.json()["receipt"]
+    deadline = time.monotonic() + 5
+    while write_behind.stats()["written"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stored = client.get("/api/contact/requests", params={"receipt": receipt}, headers=admin_headers).json()
+    assert [(request["receipt"], request["email"]) for request in stored] == [(receipt, ROW["email"])]
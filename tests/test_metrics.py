@@ -0,0 +1,34 @@
+"""`/api/metrics` is only readable with the metrics token or, without one, by a superuser."""
+import pytest
+
+from backend import metrics
+
+
+@pytest.fixture
+def metrics_token(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "scrape-secret")
+    return "scrape-secret"
+
+
+def test_anonymous_is_rejected(client):
+    assert client.get("/api/metrics").status_code == 401
+
+
+def test_superuser_without_metrics_token(client, admin_headers):
+    response = client.get("/api/metrics", headers=admin_headers)
+    assert response.status_code == 200
+    assert "http_requests_total" in response.text
+
+
+def test_non_superuser_without_metrics_token(client):
+    user = {"username": "metrics-reader", "email": "metrics-reader@example.com", "password": "secret-password"}
+    client.post("/api/auth/register", json=user)
+    response = client.post("/api/auth/login", data={"username": user["username"], "password": user["password"]})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert client.get("/api/metrics", headers=headers).status_code == 401
+
+
+def test_metrics_token(client, admin_headers, metrics_token):
+    assert client.get("/api/metrics", headers={"Authorization": f"Bearer {metrics_token}"}).status_code == 200
+    # Once a token is configured, it is the only way in
+    assert client.get("/api/metrics", headers=admin_headers).status_code == 401
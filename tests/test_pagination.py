@@ -0,0 +1,69 @@
+"""Cursor pages: following next_cursor visits every row once, and bad cursors are a 400."""
+from base64 import urlsafe_b64encode
+import json
+
+import pytest
+from sqlalchemy import delete, text, update
+
+from backend import database, models
+from backend.pagination import encode_cursor
+
+ROWS = 23
+
+
+@pytest.fixture(scope="module")
+def task_ids():
+    with database.SessionLocal() as db:
+        db.execute(delete(models.Aufgabe))
+        # Few distinct statuses and dates, so pages end inside runs of equal sort keys
+        tasks = [
+            models.Aufgabe(titel=f"Task {i}", status=("open", "done", "blocked")[i % 3], prioritaet="low")
+            for i in range(ROWS)
+        ]
+        db.add_all(tasks)
+        db.flush()
+        # In the server_default format, as every other writer stores timestamps on SQLite
+        db.execute(update(models.Aufgabe).values(created_date=text("datetime('2024-01-01', (id % 6) || ' days')")))
+        db.commit()
+        return [task.id for task in tasks]
+
+
+def raw_cursor(*parts) -> str:
+    return urlsafe_b64encode(json.dumps(list(parts)).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("sort", ["id", "-id", "status", "-status", "created_date", "-created_date"])
+@pytest.mark.parametrize("limit", [1, 5, ROWS])
+def test_cursor_pages_visit_every_row_once(client, task_ids, sort, limit):
+    seen, cursor = [], ""
+    for _ in range(ROWS + 1):
+        if cursor is None:
+            break
+        response = client.get("/api/admin/tasks", params={"sort": sort, "limit": limit, "cursor": cursor})
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page["items"]) <= limit
+        seen += page["items"]
+        cursor = page["next_cursor"]
+    assert sorted(task["id"] for task in seen) == sorted(task_ids)
+    key = sort.lstrip("-")
+    expected = sorted(seen, key=lambda task: (task[key], task["id"]), reverse=sort.startswith("-"))
+    assert seen == expected
+
+
+@pytest.mark.parametrize("sort, cursor", [
+    ("id", "not a cursor!"),
+    ("id", raw_cursor("id", 1)),
+    ("created_date", raw_cursor("created_date", {"dt": "x"}, 1)),
+    ("created_date", raw_cursor("created_date", {"dt": 5}, 1)),
+    ("created_date", raw_cursor("created_date", {"d": "2024-01-01"}, 1)),
+    ("created_date", raw_cursor("created_date", "2024-01-01", 1)),
+    ("status", raw_cursor("status", {"x": 1}, 1)),
+    ("status", raw_cursor("status", ["open"], 1)),
+    ("status", raw_cursor("status", "open", True)),
+    ("id", raw_cursor("id", "1", 1)),
+    ("-status", encode_cursor("status", "open", 1)),
+])
+def test_bad_cursor_is_rejected(client, task_ids, sort, cursor):
+    response = client.get("/api/admin/tasks", params={"sort": sort, "cursor": cursor})
+    assert response.status_code == 400, response.text
@@ -0,0 +1,63 @@
+"""The principal cache forgets a user once a change to the row is committed, not before."""
+import pytest
+from sqlalchemy import delete, select
+
+from backend import database, models, utils
+
+
+@pytest.fixture
+def cache(monkeypatch, client):
+    cache = utils.PrincipalCache(ttl=60, max_size=10)
+    monkeypatch.setattr(utils, "principal_cache", cache)
+    with database.SessionLocal() as db:
+        db.execute(delete(models.User).where(models.User.username.in_(["cached", "renamed"])))
+        db.add(models.User(username="cached", email="cached@example.com", hashed_password="x"))
+        db.commit()
+    return cache
+
+
+def cache_user(cache, username):
+    generation = cache.generation(username)
+    cache.put(username, {"username": username}, generation)
+
+
+def load(db, username):
+    return db.scalars(select(models.User).where(models.User.username == username)).one()
+
+
+def test_flush_keeps_and_commit_drops_the_entry(cache):
+    cache_user(cache, "cached")
+    with database.SessionLocal() as db:
+        load(db, "cached").vorname = "Neu"
+        db.flush()
+        assert cache.get("cached") is not None
+        db.commit()
+    assert cache.get("cached") is None
+
+
+def test_rollback_keeps_the_entry(cache):
+    cache_user(cache, "cached")
+    with database.SessionLocal() as db:
+        load(db, "cached").vorname = "Verworfen"
+        db.flush()
+        db.rollback()
+        db.commit()
+    assert cache.get("cached") is not None
+
+
+def test_row_read_before_a_commit_is_not_cached(cache):
+    generation = cache.generation("cached")
+    with database.SessionLocal() as db:
+        load(db, "cached").is_active = False
+        db.commit()
+    # A request that read the old row before the commit caches it only now
+    cache.put("cached", {"username": "cached", "is_active": True}, generation)
+    assert cache.get("cached") is None
+
+
+def test_rename_drops_the_old_username(cache):
+    cache_user(cache, "cached")
+    with database.SessionLocal() as db:
+        load(db, "cached").username = "renamed"
+        db.commit()
+    assert cache.get("cached") is None
@@ -0,0 +1,39 @@
+"""The bounded process pool replaces itself after a worker dies."""
+import asyncio
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from backend import utils
+
+
+def exit_worker_once(marker: str) -> str:
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return "done"
+
+
+def exit_worker() -> str:
+    os._exit(1)
+
+
+@pytest.fixture
+def pool():
+    pool = utils.BoundedProcessPool(max_workers=1, max_queue=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_task_is_retried_in_a_new_pool(pool, tmp_path):
+    assert asyncio.run(pool.run(exit_worker_once, str(tmp_path / "exited"))) == "done"
+    assert pool.stats()["restarts"] == 1
+
+
+def test_second_failure_is_raised_and_the_pool_still_recovers(pool):
+    with pytest.raises(BrokenProcessPool):
+        asyncio.run(pool.run(exit_worker))
+    assert pool.stats()["restarts"] == 2
+    assert asyncio.run(pool.run(abs, -3)) == 3
+    assert pool.stats()["in_flight"] == 0
@@ -0,0 +1,64 @@
+"""List routes issue the same number of queries for one row as for many.
+
+Every project and contact request has its own category and owner, so a
+relationship loaded per row (an N+1) shows up as a higher count at ROWS rows.
+"""
+import pytest
+from sqlalchemy import delete
+
+from backend import database, models, serialization
+from backend.response_cache import response_cache
+from backend.testing import assert_max_queries
+
+ROWS = 25
+
+# (path, headers fixture, queries with JSON_FAST_PATH on, queries with it off).
+# Contact requests read the user first; the ORM path loads each relationship with one selectin query.
+ROUTES = [
+    ("/api/admin/projects", None, 1, 2),
+    ("/api/public/projects", None, 2, 2),
+    ("/api/contact/requests", "admin_headers", 2, 4),
+    ("/api/admin/tasks", None, 1, 1),
+]
+
+
+def seed(count: int):
+    """Replace the listed rows with `count` of each, every one with its own category and owner."""
+    with database.SessionLocal() as db:
+        for model in (models.ContactRequest, models.AdminProject, models.Aufgabe, models.Category):
+            db.execute(delete(model))
+        db.execute(delete(models.User).where(models.User.username != "root"))
+        for i in range(count):
+            category = models.Category(name=f"Category {i}", name_en=f"Category {i}", name_de=f"Kategorie {i}")
+            owner = models.User(username=f"owner{i}", email=f"owner{i}@example.com", hashed_password="-")
+            db.add_all([category, owner])
+            db.flush()
+            db.add_all([
+                models.AdminProject(project_code=f"P{i}", name=f"Project {i}", status="planned", year=2024,
+                                    type="Neubau", category_id=category.id, user_id=owner.id),
+                models.ContactRequest(name=f"Kunde {i}", email=f"kunde{i}@example.com", reason="Anfrage",
+                                      message="Hallo", category_id=category.id, user_id=owner.id),
+                models.Aufgabe(titel=f"Task {i}", status="open", prioritaet="high"),
+            ])
+        db.commit()
+    response_cache.bump("projects", "categories")
+
+
+@pytest.fixture(params=[True, False], ids=["rows", "orm"])
+def fast_path(request, monkeypatch):
+    monkeypatch.setattr(serialization, "JSON_FAST_PATH", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize("path, headers, rows_queries, orm_queries", ROUTES, ids=[route[0] for route in ROUTES])
+@pytest.mark.parametrize("rows", [1, ROWS])
+def test_list_query_count_is_fixed(request, client, fast_path, path, headers, rows_queries, orm_queries, rows):
+    headers = request.getfixturevalue(headers) if headers else {}
+    seed(rows)
+    expected = rows_queries if fast_path else orm_queries
+    with assert_max_queries(expected) as counter:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == rows
+    # Fewer would mean the route stopped loading something it returns
+    assert counter.count == expected
@@ -0,0 +1,40 @@
+"""Rate limits: default rules only with trusted proxies, and one bucket per forwarded client."""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+from backend import ratelimit
+
+
+def test_default_rules_wait_for_trusted_proxies(monkeypatch):
+    monkeypatch.delenv("RATE_LIMITS", raising=False)
+    monkeypatch.delenv("FORWARDED_ALLOW_IPS", raising=False)
+    assert ratelimit.configured_rules() == ""
+    monkeypatch.setenv("FORWARDED_ALLOW_IPS", "10.0.0.1")
+    assert ratelimit.configured_rules() == ratelimit.DEFAULT_RATE_LIMITS
+    monkeypatch.setenv("RATE_LIMITS", "POST /x ip=1/60")
+    assert ratelimit.configured_rules() == "POST /x ip=1/60"
+
+
+def test_forwarded_clients_get_separate_buckets():
+    app = FastAPI()
+
+    @app.post("/limited")
+    def limited():
+        return {}
+
+    limiter = ratelimit.RateLimiter(ratelimit.parse_rules("POST /limited ip=2/60"),
+                                    ratelimit.MemoryBackend(shards=1, max_keys=100))
+    proxied = ProxyHeadersMiddleware(ratelimit.RateLimitMiddleware(app, limiter), trusted_hosts="10.0.0.1")
+
+    async def from_proxy(scope, receive, send):
+        await proxied({**scope, "client": ("10.0.0.1", 443)}, receive, send)
+
+    client = TestClient(from_proxy)
+
+    def post(ip):
+        return client.post("/limited", headers={"X-Forwarded-For": ip}).status_code
+
+    assert [post("203.0.113.1") for _ in range(3)] == [200, 200, 429]
+    assert [post("203.0.113.2") for _ in range(2)] == [200, 200]
+    assert post("203.0.113.1") == 429
@@ -0,0 +1,48 @@
+"""Project reports: one render per content, served from the cache afterwards."""
+from sqlalchemy import delete
+
+from backend import database, models, reports
+
+PROJECT = {"project_code": "R-1", "name": "Rathaus", "status": "planned", "year": 2024, "type": "Neubau",
+           "description": "Erste Zeile\nZweite Zeile"}
+
+
+def create_project(client, admin_headers, **values):
+    with database.SessionLocal() as db:
+        db.execute(delete(models.AdminProject))
+        db.commit()
+    response = client.post("/api/admin/projects", json={**PROJECT, **values}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def test_equal_keys_render_equal_bytes(tmp_path):
+    data = {**PROJECT, "id": 1, "size": None, "color": None, "end_date": None, "category": None,
+            "category_id": None, "user_id": None, "owner": "Admin Root"}
+    first, second = tmp_path / "first.pdf", tmp_path / "second.pdf"
+    reports.render_report(data, str(first))
+    reports.render_report(data, str(second))
+    assert first.read_bytes() == second.read_bytes()
+
+
+def test_unchanged_project_is_served_from_the_cache(client, admin_headers):
+    project_id = create_project(client, admin_headers)
+    url = f"/api/admin/projects/{project_id}/report"
+    renders = reports.report_cache.renders
+    hits = reports.report_cache.hits
+
+    first = client.get(url, headers=admin_headers)
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "application/pdf"
+    second = client.get(url, headers=admin_headers)
+    assert second.content == first.content
+    assert (reports.report_cache.renders, reports.report_cache.hits) == (renders + 1, hits + 1)
+
+    not_modified = client.get(url, headers={**admin_headers, "If-None-Match": first.headers["etag"]})
+    assert not_modified.status_code == 304
+
+    # An edit changes the key, so the next download renders again
+    client.put(f"/api/admin/projects/{project_id}", json={**PROJECT, "name": "Rathaus Nord"}, headers=admin_headers)
+    third = client.get(url, headers=admin_headers)
+    assert third.headers["etag"] != first.headers["etag"]
+    assert reports.report_cache.renders == renders + 2
@@ -0,0 +1,29 @@
+"""Public landing lists: served from cache with ETags, and rebuilt after admin writes."""
+from backend.response_cache import response_cache
+
+
+def test_cached_response_and_not_modified(client):
+    first = client.get("/api/public/categories")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    hits = response_cache.hits
+    again = client.get("/api/public/categories")
+    assert (again.content, again.headers["etag"]) == (first.content, etag)
+    assert response_cache.hits == hits + 1
+    not_modified = client.get("/api/public/categories", headers={"If-None-Match": etag})
+    assert (not_modified.status_code, not_modified.content) == (304, b"")
+    assert not_modified.headers["etag"] == etag
+
+
+def test_admin_write_invalidates(client, admin_headers):
+    stale = client.get("/api/public/categories")
+    projects = client.get("/api/public/projects")
+    response = client.post("/api/admin/categories", json={"name": "Cache-Test"}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+
+    fresh = client.get("/api/public/categories", headers={"If-None-Match": stale.headers["etag"]})
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != stale.headers["etag"]
+    assert "Cache-Test" in [category["name"] for category in fresh.json()]
+    # Other namespaces keep their entries
+    assert client.get("/api/public/projects", headers={"If-None-Match": projects.headers["etag"]}).status_code == 304
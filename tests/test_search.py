@@ -0,0 +1,36 @@
+"""Full-text search: prefix matches of every term, escaped snippets, and an index that follows writes."""
+import pytest
+
+
+def search(client, headers, q, **params):
+    response = client.get("/api/admin/search", params={"q": q, **params}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["items"]
+
+
+@pytest.fixture(scope="module")
+def project(client, admin_headers):
+    body = {"project_code": "FTS1", "name": "Zaunbau <Nord>", "description": "Holzzaun am Weinberghang",
+            "status": "planned", "year": 2024, "type": "Neubau"}
+    response = client.post("/api/admin/projects", json=body, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    yield response.json()
+    client.delete(f"/api/admin/projects/{response.json()['id']}", headers=admin_headers)
+
+
+def test_prefixes_of_all_terms_match(client, admin_headers, project):
+    hits = search(client, admin_headers, "weinberg zaun", type="project")
+    assert [(hit["type"], hit["id"]) for hit in hits] == [("project", project["id"])]
+    assert search(client, admin_headers, "weinberg dachrinne") == []
+
+
+def test_title_and_snippet_are_escaped(client, admin_headers, project):
+    hit = search(client, admin_headers, "nord", type="project")[0]
+    assert hit["title"] == "Zaunbau &lt;<mark>Nord</mark>&gt;"
+
+
+def test_index_follows_updates(client, admin_headers, project):
+    client.put(f"/api/admin/projects/{project['id']}", json={**project, "description": "Steinmauer"},
+               headers=admin_headers)
+    assert search(client, admin_headers, "weinberghang") == []
+    assert [hit["id"] for hit in search(client, admin_headers, "steinmauer")] == [project["id"]]
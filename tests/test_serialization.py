@@ -0,0 +1,56 @@
+"""The list fast path gives the same JSON as the ORM path, also for rows with NULL columns."""
+import pytest
+from sqlalchemy import delete, insert
+
+from backend import database, models, serialization
+
+ROUTES = [
+    ("/api/auth/users", {}),
+    ("/api/auth/users", {"limit": 2}),
+    ("/api/auth/users", {"fields": "username,is_superuser"}),
+    ("/api/admin/projects", {}),
+    ("/api/admin/projects", {"limit": 2, "sort": "-id"}),
+    ("/api/contact/requests", {}),
+    ("/api/admin/tasks", {}),
+]
+
+
+@pytest.fixture(scope="module")
+def null_rows(client):
+    with database.SessionLocal() as db:
+        db.execute(delete(models.User).where(models.User.username.like("nulls%")))
+        db.execute(delete(models.AdminProject).where(models.AdminProject.project_code.like("NULL%")))
+        db.execute(delete(models.ContactRequest).where(models.ContactRequest.name == "Nulls"))
+        # NULLs the ORM would never write, as rows imported by other tools may have them
+        db.execute(insert(models.User.__table__), [
+            {"username": "nulls", "hashed_password": "x", "is_active": True, "is_superuser": None, "position": None},
+            {"username": "nulls-admin", "hashed_password": "x", "is_active": None, "is_superuser": True,
+             "position": "Chef"},
+        ])
+        category = models.Category(name="Nulls")
+        db.add(category)
+        db.flush()
+        db.execute(insert(models.AdminProject.__table__), [
+            {"project_code": "NULL1", "name": "Ohne", "status": "planned", "year": 2024, "type": "Neubau"},
+            {"project_code": "NULL2", "name": "Mit", "status": "planned", "year": 2024, "type": "Neubau",
+             "category_id": category.id},
+        ])
+        db.execute(insert(models.ContactRequest.__table__),
+                   [{"name": "Nulls", "email": "nulls@example.com", "reason": "Anfrage", "message": "Hallo"}])
+        db.commit()
+
+
+@pytest.mark.parametrize("path,params", ROUTES)
+def test_fast_path_matches_orm_path(client, admin_headers, null_rows, monkeypatch, path, params):
+    answers = []
+    for fast_path in (True, False):
+        monkeypatch.setattr(serialization, "JSON_FAST_PATH", fast_path)
+        response = client.get(path, params=params, headers=admin_headers)
+        assert response.status_code == 200, response.text
+        answers.append(response.json())
+    assert answers[0] == answers[1]
+
+
+def test_null_flag_gets_the_schema_default(client, admin_headers, null_rows):
+    users = client.get("/api/auth/users", headers=admin_headers).json()
+    assert next(user for user in users if user["username"] == "nulls")["is_superuser"] is False
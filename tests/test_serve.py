@@ -0,0 +1,82 @@
+"""The multi-process server: load-based autoscaling, and invalidations shared between workers."""
+import os
+
+import pytest
+
+from backend import generations, serve
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(serve.time, "monotonic", clock)
+    return clock
+
+
+def supervisor(workers, min_workers, max_workers, in_flight):
+    sup = serve.Supervisor("backend.main:app", None, workers, "/nonexistent", min_workers=min_workers,
+                           max_workers=max_workers)
+    for slot in range(workers):
+        worker = sup.workers[slot] = serve.Worker(slot, 0, slot, -1)
+        worker.ready_at = 0.0
+        worker.in_flight = in_flight
+    return sup
+
+
+def run_for(sup, clock, seconds):
+    for _ in range(int(seconds / serve.HEARTBEAT_INTERVAL)):
+        clock.now += serve.HEARTBEAT_INTERVAL
+        sup._autoscale()
+
+
+def test_sustained_load_adds_one_worker(clock):
+    sup = supervisor(2, 1, 4, in_flight=serve.SERVE_SCALE_UP_LOAD)
+    run_for(sup, clock, serve.SCALE_UP_WINDOW / 2)
+    assert sup.target == 2
+    run_for(sup, clock, serve.SCALE_UP_WINDOW)
+    assert sup.target == 3
+    # Until the new worker serves, the load is not measured
+    run_for(sup, clock, serve.SCALE_UP_WINDOW * 2)
+    assert sup.target == 3
+
+
+def test_idle_pool_shrinks_to_the_minimum(clock):
+    sup = supervisor(3, 2, 4, in_flight=0)
+    run_for(sup, clock, serve.SCALE_DOWN_WINDOW + serve.HEARTBEAT_INTERVAL)
+    assert sup.target == 2
+    sup.workers.pop(2)
+    run_for(sup, clock, serve.SCALE_DOWN_WINDOW * 2)
+    assert sup.target == 2
+
+
+def test_fixed_pool_does_not_scale(clock):
+    sup = supervisor(2, None, None, in_flight=serve.SERVE_SCALE_UP_LOAD * 2)
+    run_for(sup, clock, serve.SCALE_UP_WINDOW * 2)
+    assert sup.target == 2
+
+
+def test_bump_in_one_process_is_seen_by_another(tmp_path):
+    path = str(tmp_path / "generations")
+    generations.create_file(path)
+    shared = generations.Generations(path)
+    before = shared.get("response:projects")
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            shared.bump("response:projects")
+            code = 0
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert shared.shared
+    assert shared.get("response:projects") == before + 1